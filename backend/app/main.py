@@ -1,10 +1,48 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import List
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from .routers import match
+from starlette.datastructures import MutableHeaders
+from .routers import match, jobs, candidates
+from .services.extract import shutdown_extraction_pool, prewarm_extraction_pool, PARSER_MODULES
+from .services.lazy_imports import module_available, module_status, prewarm_modules, prewarm_names
+from .services.providers import get_provider
+from .services.ai_client import ai_circuit_state
+from .services.jobs import get_job_queue
+from .services import metrics
 from dotenv import load_dotenv
 load_dotenv()
 
-app = FastAPI(title="Recruitment AI Agent", version="1.0.0")
+logger = logging.getLogger(__name__)
+
+async def _prewarm(names: List[str]) -> None:
+    """Import PREWARM_MODULES in the background; parsers are imported in the extraction workers, where they run."""
+    try:
+        await asyncio.to_thread(prewarm_modules, [n for n in names if n not in PARSER_MODULES])
+        parsers = [n for n in names if n in PARSER_MODULES and module_available(n)]
+        if parsers:
+            await prewarm_extraction_pool(parsers)
+    except Exception as e:
+        logger.warning(f"Pre-warming failed: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    job_queue = get_job_queue()
+    await job_queue.start()
+    # Serving starts right away; the heavy imports finish behind it
+    names = prewarm_names()
+    prewarm = asyncio.ensure_future(_prewarm(names)) if names else None
+    yield
+    if prewarm is not None and not prewarm.done():
+        prewarm.cancel()
+    await job_queue.stop()
+    await get_provider().aclose()
+    shutdown_extraction_pool()
+
+app = FastAPI(title="Recruitment AI Agent", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -14,8 +52,76 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def _route_template(request: Request) -> str:
+    """Path template of the matched route with its router prefix (e.g. /api/candidates/{candidate_id})."""
+    route = request.scope.get("route")
+    template = getattr(route, "path_format", None)
+    if template is None:
+        return "unmatched"
+    try:
+        concrete = template.format(**request.path_params)
+    except (KeyError, IndexError, ValueError):
+        return template
+    path = request.url.path
+    return path[:len(path) - len(concrete)] + template if path.endswith(concrete) else template
+
+class RequestMetricsMiddleware:
+    """
+    Request latency by route template and status, measured until the response is
+    fully sent. With METRICS_TIMING_HEADER the response carries a Server-Timing header
+    with the stages timed while handling it (streamed responses only include what ran
+    before their headers were sent). Plain ASGI, so bodies pass through untouched.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timings = metrics.start_request_timings()
+        start = time.perf_counter()
+        status = 500
+
+        async def _send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if metrics.METRICS_TIMING_HEADER:
+                    timings["total"] = (time.perf_counter() - start) * 1000
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", metrics.server_timing_header(timings))
+                    headers.append("Timing-Allow-Origin", "*")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            metrics.http_request_seconds.observe(
+                time.perf_counter() - start,
+                method=scope["method"], route=_route_template(Request(scope)), status=str(status),
+            )
+
+app.add_middleware(RequestMetricsMiddleware)
+
 app.include_router(match.router, prefix="/api")
+app.include_router(jobs.router, prefix="/api")
+app.include_router(candidates.router, prefix="/api")
 
 @app.get("/health")
 def health():
-    return {"status": "ok"}
+    provider = get_provider()
+    return {
+        "status": "ok",
+        "ai_provider": provider.name,
+        "ai_client": provider.status(),
+        "ai_circuit": ai_circuit_state(),
+        "modules": module_status(),
+    }
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    if not metrics.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
@@ -114,3 +114,25 @@ CANDIDATE RESUME:
 
 Generate a professional rejection email."""
 
+
+BATCH_EMAIL_INSTRUCTIONS = """BATCH MODE: You will receive ONE job description and SEVERAL candidates.
+
+- Write one separate email per candidate, each following the structure above.
+- Personalize every email with that candidate's own resume; never mix details between candidates.
+- Return a JSON array with exactly one object per candidate:
+  {"filename": "<exact filename as given>", "subject": "...", "body": "..."}
+- Copy each filename exactly as written. Do not skip, merge or add candidates."""
+
+BATCH_EMAIL_USER_TEMPLATE = """Generate {email_kind} emails for each of the candidates below.
+
+JOB DETAILS:
+- Title: {job_title}
+- Company: {company_name}
+
+JOB DESCRIPTION CONTEXT:
+{jd_summary}
+
+CANDIDATES:
+{candidates}
+
+Generate one professional {email_kind} email per candidate."""
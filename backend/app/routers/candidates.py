@@ -0,0 +1,92 @@
+from fastapi import APIRouter, Form, HTTPException, Query, Request
+from ..services.candidates import CandidateStore, get_candidate_store, jd_query_terms, CANDIDATE_RANK_POOL
+from ..services.jd_profile import get_jd_profile
+from ..services.pipeline import match_texts, get_prerank
+from .match import _run_until_disconnect, _match_error
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["candidates"])
+
+def _store() -> CandidateStore:
+    store = get_candidate_store()
+    if store is None:
+        raise HTTPException(status_code=404, detail="Candidate store is disabled")
+    return store
+
+@router.get("/candidates/search")
+async def api_search_candidates(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(default=20, ge=1, le=200),
+    match_all: bool = Query(default=True),
+):
+    """Full-text search of stored resumes (all words, or any with match_all=false), most relevant first."""
+    store = _store()
+    results = store.search(q.split(), limit, match_all)
+    return {"query": q, "total": store.count(), "results": results}
+
+@router.get("/candidates/{candidate_id}")
+async def api_get_candidate(candidate_id: int):
+    """A stored candidate's extracted text, skills and match history."""
+    candidate = _store().get(candidate_id)
+    if candidate is None:
+        raise HTTPException(status_code=404, detail="Candidate not found")
+    return candidate
+
+@router.post("/candidates/rank")
+async def api_rank_candidates(
+    request: Request,
+    jd_text: str = Form(...),
+    top_k: int = Form(default=50),
+    use_ai: bool = Form(default=False),
+):
+    """
+    Rank the stored candidate pool against a new JD without re-uploading resumes.
+    The CANDIDATE_RANK_POOL most relevant candidates are retrieved by full-text search
+    on the JD's skills and terms and scored locally (the /match pre-screen); the best
+    `top_k` are returned. With use_ai=true those top_k go through the full /match
+    pipeline (AI scoring and emails) and its response is returned instead.
+    """
+    store = _store()
+    jd = get_jd_profile(jd_text)
+    pool = store.pool(jd_query_terms(jd), CANDIDATE_RANK_POOL)
+    logger.info(f"Ranking {len(pool)} stored candidates against JD '{jd.job_title}'")
+    if not pool:
+        return {"jd_text": jd_text, "pool_size": store.count(), "retrieved": 0, "candidates": []}
+
+    ids = [row[0] for row in pool]
+    filenames = [row[1] for row in pool]
+    texts = [row[2] for row in pool]
+    order, items = await get_prerank()(jd_text, texts, max(1, top_k), jd_skills=jd.skills)
+
+    if use_ai:
+        try:
+            result = await _run_until_disconnect(
+                request, match_texts(jd_text, [texts[i] for i in order], [filenames[i] for i in order])
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            status_code, detail = _match_error(e)
+            if status_code == 500:
+                logger.error(f"Error in candidate rank endpoint: {e}", exc_info=True)
+            raise HTTPException(status_code=status_code, detail=detail)
+        return {**result, "pool_size": store.count(), "retrieved": len(pool)}
+
+    return {
+        "jd_text": jd_text,
+        "pool_size": store.count(),
+        "retrieved": len(pool),
+        "candidates": [
+            {
+                "candidate_id": ids[i],
+                "filename": filenames[i],
+                "score": items[i].score,
+                "missing_skills": items[i].missing_skills,
+                "remarks": items[i].remarks,
+                "rank": rank,
+            }
+            for rank, i in enumerate(order, start=1)
+        ],
+    }
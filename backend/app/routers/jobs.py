@@ -0,0 +1,70 @@
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, List, Optional
+from ..services.extract import DocumentTooLargeError, read_upload_bytes
+from ..services.jobs import get_job_queue, STATUS_SUCCEEDED, STATUS_FAILED
+from .match import ResumeUploadRoute, _validate_match_input
+import asyncio
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["jobs"], route_class=ResumeUploadRoute)
+
+# How often the events stream checks the job store for new events
+EVENTS_POLL_SECONDS = 0.5
+
+@router.post("/match/jobs", status_code=202)
+async def api_submit_match_job(
+    jd_text: Optional[str] = Form(default=None),
+    jd_file: Optional[UploadFile] = File(default=None),
+    resumes: List[UploadFile] = File(default=[]),
+):
+    """
+    Queue a screening run in the background and return its job_id immediately.
+    Takes the same form fields as /match; poll /match/jobs/{job_id} for the result.
+    """
+    logger.info(f"Received match job with {len(resumes)} resumes")
+    _validate_match_input(jd_text, jd_file, resumes)
+    try:
+        jd = (jd_file.filename or "jd", await read_upload_bytes(jd_file)) if jd_file else None
+        files = [(f.filename or f"resume_{i}", await read_upload_bytes(f)) for i, f in enumerate(resumes)]
+    except DocumentTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    job_id = await get_job_queue().submit(jd_text, jd, files)
+    return {"job_id": job_id, "status": "queued"}
+
+@router.get("/match/jobs/{job_id}")
+async def api_get_match_job(job_id: str):
+    """Job status, attempt count, progress counters, last error and (once succeeded) the /match result."""
+    job = await asyncio.to_thread(get_job_queue().store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/match/jobs/{job_id}/events")
+async def api_match_job_events(job_id: str):
+    """
+    Stream the job's stored progress as NDJSON (the /match/stream events, with an
+    "attempt" event opening each try and an "error" event after a failed one)
+    until the job succeeds or fails for good.
+    """
+    store = get_job_queue().store
+    if await asyncio.to_thread(store.get, job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def _ndjson() -> AsyncIterator[str]:
+        seq = 0
+        while True:
+            for seq, event in await asyncio.to_thread(store.events, job_id, seq):
+                yield json.dumps(event) + "\n"
+            job = await asyncio.to_thread(store.get, job_id)
+            if job is None or job["status"] in (STATUS_SUCCEEDED, STATUS_FAILED):
+                # Pick up events written between the last read and the status change
+                for seq, event in await asyncio.to_thread(store.events, job_id, seq):
+                    yield json.dumps(event) + "\n"
+                return
+            await asyncio.sleep(EVENTS_POLL_SECONDS)
+
+    return StreamingResponse(_ndjson(), media_type="application/x-ndjson")
@@ -1,13 +1,71 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from fastapi.routing import APIRoute
 from pydantic import BaseModel
-from typing import List, Optional
-from ..services.extract import extract_text_from_upload
-from ..services.ai_client import generate_jd, ai_match_resumes, generate_interview_email, generate_rejection_email
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional, Tuple
+from ..services.extract import ExtractionError, DocumentTooLargeError
+from ..services.ai_client import generate_jd, generate_jd_stream, ai_cache_bypass
+from ..services.pipeline import run_match_pipeline, stream_match_events
+from ..services.metrics import stage
+import asyncio
+import json
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(tags=["match"])
+# How often to check whether the HTTP client has gone away
+DISCONNECT_POLL_SECONDS = 0.5
+# Upper bound on resumes accepted by one /match request
+MAX_RESUMES_PER_REQUEST = int(os.getenv("MAX_RESUMES_PER_REQUEST", "2000"))
+# Request header that forces fresh AI responses instead of cached ones
+CACHE_BYPASS_HEADER = "X-Cache-Bypass"
+
+class ResumeUploadRoute(APIRoute):
+    """
+    Route whose multipart form is parsed with room for MAX_RESUMES_PER_REQUEST
+    resumes plus a JD file. Starlette's parser otherwise rejects forms of more than
+    1000 files before the endpoint can apply its own limit.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Awaitable[Response]]:
+        handler = super().get_route_handler()
+
+        async def _handler(request: Request) -> Response:
+            if request.headers.get("content-type", "").startswith("multipart/form-data"):
+                # The form is cached on the request, so FastAPI's own parse reuses it
+                await request.form(max_files=MAX_RESUMES_PER_REQUEST + 1)
+            return await handler(request)
+
+        return _handler
+
+router = APIRouter(tags=["match"], route_class=ResumeUploadRoute)
+
+def _wants_cache_bypass(request: Request) -> bool:
+    value = request.headers.get(CACHE_BYPASS_HEADER, "").strip().lower()
+    return value in ("1", "true", "yes") or "no-cache" in request.headers.get("Cache-Control", "").lower()
+
+async def _run_until_disconnect(request: Request, work: Awaitable[Any]) -> Any:
+    """
+    Run `work` while watching the client connection.
+    If the client disconnects first, the work task is cancelled so any in-flight
+    AI calls are aborted instead of running to completion for nobody.
+    """
+    # The task copies the current context, so set request-scoped flags first
+    ai_cache_bypass.set(_wants_cache_bypass(request))
+    task = asyncio.ensure_future(work)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                logger.warning(f"Client disconnected from {request.url.path}, cancelling work")
+                task.cancel()
+                raise HTTPException(status_code=499, detail="Client closed request")
+    finally:
+        if not task.done():
+            task.cancel()
 
 class GenerateJDRequest(BaseModel):
     job_title: str
@@ -29,6 +87,8 @@ class CandidateResult(BaseModel):
     remarks: str
     email: EmailData
     is_selected: bool
+    rank: int
+    candidate_id: Optional[int] = None
 
 class MatchResponse(BaseModel):
     jd_text: str
@@ -36,75 +96,120 @@ class MatchResponse(BaseModel):
     best_index: int
 
 @router.post("/generate_jd")
-async def api_generate_jd(payload: GenerateJDRequest):
+async def api_generate_jd(payload: GenerateJDRequest, request: Request):
     logger.info(f"Received JD generation request for {payload.job_title}")
     try:
-        jd_text = await generate_jd(payload)
+        jd_text = await _run_until_disconnect(request, generate_jd(payload))
         logger.info(f"JD generated successfully")
         return {"jd_text": jd_text}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to generate JD: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to generate JD: {str(e)}")
+
+@router.post("/generate_jd/stream")
+async def api_generate_jd_stream(payload: GenerateJDRequest, request: Request):
+    """
+    Stream the generated JD as NDJSON while the model writes it: a "chunk" event
+    (with "text") per piece of markdown, then "done". The first chunk is awaited
+    before responding, so failures before any output still return a regular HTTP 500;
+    later failures end the stream with an "error" event carrying status_code and detail.
+    """
+    logger.info(f"Received streaming JD generation request for {payload.job_title}")
+    ai_cache_bypass.set(_wants_cache_bypass(request))
+    chunks = generate_jd_stream(payload)
+    try:
+        first = await chunks.__anext__()
+    except StopAsyncIteration:
+        first = ""
     except Exception as e:
         logger.error(f"Failed to generate JD: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to generate JD: {str(e)}")
+    
+    async def _ndjson() -> AsyncIterator[str]:
+        try:
+            if first:
+                yield json.dumps({"event": "chunk", "text": first}) + "\n"
+            async for chunk in chunks:
+                yield json.dumps({"event": "chunk", "text": chunk}) + "\n"
+            yield json.dumps({"event": "done"}) + "\n"
+        except Exception as e:
+            # Headers are already sent; tell the client the JD is incomplete
+            logger.error(f"JD stream failed after partial output: {e}")
+            yield json.dumps({"event": "error", "status_code": 500, "detail": f"Failed to generate JD: {str(e)}"}) + "\n"
+        finally:
+            await chunks.aclose()
+    
+    return StreamingResponse(_ndjson(), media_type="application/x-ndjson")
+
+def _validate_match_input(jd_text: Optional[str], jd_file: Optional[UploadFile], resumes: List[UploadFile]) -> None:
+    if not jd_text and not jd_file:
+        raise HTTPException(status_code=400, detail="Provide jd_text or jd_file")
+    if not resumes:
+        raise HTTPException(status_code=400, detail="Provide at least one resume")
+    if len(resumes) > MAX_RESUMES_PER_REQUEST:
+        raise HTTPException(status_code=400, detail=f"Too many resumes: {len(resumes)} (limit {MAX_RESUMES_PER_REQUEST})")
+
+def _match_error(e: Exception) -> Tuple[int, str]:
+    """HTTP status and detail for an exception raised by the match pipeline."""
+    if isinstance(e, DocumentTooLargeError):
+        return 413, str(e)
+    if isinstance(e, ExtractionError):
+        return 422, f"Failed to extract text: {e}"
+    return 500, f"Failed to process: {str(e)}"
 
 @router.post("/match", response_model=MatchResponse)
 async def api_match(
+    request: Request,
     jd_text: Optional[str] = Form(default=None),
     jd_file: Optional[UploadFile] = File(default=None),
     resumes: List[UploadFile] = File(default=[]),
 ):
     logger.info(f"Received match request with {len(resumes)} resumes")
-    
-    if not jd_text and not jd_file:
-        raise HTTPException(status_code=400, detail="Provide jd_text or jd_file")
-    if not resumes:
-        raise HTTPException(status_code=400, detail="Provide at least one resume")
-    
+    _validate_match_input(jd_text, jd_file, resumes)
+    return await _run_until_disconnect(request, _match_pipeline(jd_text, jd_file, resumes))
+
+async def _match_pipeline(
+    jd_text: Optional[str],
+    jd_file: Optional[UploadFile],
+    resumes: List[UploadFile],
+) -> MatchResponse:
     try:
-        if jd_file:
-            logger.info(f"Extracting text from JD file: {jd_file.filename}")
-            jd_text = await extract_text_from_upload(jd_file)
-            logger.info(f"Extracted {len(jd_text)} characters from JD")
-        
-        texts = []
-        filenames = []
-        for f in resumes[:10]:
-            logger.info(f"Extracting text from resume: {f.filename}")
-            filenames.append(f.filename)
-            resume_text = await extract_text_from_upload(f)
-            texts.append(resume_text)
-            logger.info(f"Extracted {len(resume_text)} characters from {f.filename}")
-        
-        logger.info("Starting AI matching process")
-        ai_results = await ai_match_resumes(jd_text or "", texts, filenames)
-        logger.info(f"AI matching completed with {len(ai_results)} results")
-        
-        best_index = max(range(len(ai_results)), key=lambda i: ai_results[i].score)
-        logger.info(f"Best candidate index: {best_index} with score {ai_results[best_index].score}")
-        
-        candidates = []
-        for i, r in enumerate(ai_results):
-            is_selected = r.score >= 50
-            logger.info(f"Generating email for candidate {i}: {filenames[i]} (score: {r.score}, selected: {is_selected})")
-            
-            if is_selected:
-                email = await generate_interview_email(jd_text or "", texts[i], filenames[i])
-            else:
-                email = await generate_rejection_email(jd_text or "", texts[i], filenames[i])
-            
-            candidates.append(
-                CandidateResult(
-                    filename=r.filename or filenames[i],
-                    score=r.score,
-                    missing_skills=r.missing_skills,
-                    remarks=r.remarks,
-                    email=email,
-                    is_selected=is_selected,
-                )
-            )
-        
-        logger.info("Match process completed successfully")
-        return MatchResponse(jd_text=jd_text or "", candidates=candidates, best_index=best_index)
-        
+        result = await run_match_pipeline(jd_text, jd_file, resumes)
+        with stage("response"):
+            return MatchResponse(**result)
     except Exception as e:
-        logger.error(f"Error in match endpoint: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Failed to process: {str(e)}")
+        status_code, detail = _match_error(e)
+        if status_code == 500:
+            logger.error(f"Error in match endpoint: {e}", exc_info=True)
+        raise HTTPException(status_code=status_code, detail=detail)
+
+@router.post("/match/stream")
+async def api_match_stream(
+    request: Request,
+    jd_text: Optional[str] = Form(default=None),
+    jd_file: Optional[UploadFile] = File(default=None),
+    resumes: List[UploadFile] = File(default=[]),
+):
+    """
+    Same pipeline as /match, streamed as NDJSON: one JSON object per line for
+    "extracted", then "score" and "email" per candidate as they finish, and a final
+    "result" (the /match response body plus "event"). Failures end the stream with
+    an "error" event carrying status_code and detail.
+    """
+    logger.info(f"Received streaming match request with {len(resumes)} resumes")
+    _validate_match_input(jd_text, jd_file, resumes)
+    ai_cache_bypass.set(_wants_cache_bypass(request))
+    
+    async def _ndjson() -> AsyncIterator[str]:
+        try:
+            async for event in stream_match_events(jd_text, jd_file, resumes):
+                yield json.dumps(event) + "\n"
+        except Exception as e:
+            status_code, detail = _match_error(e)
+            if status_code == 500:
+                logger.error(f"Error in streaming match endpoint: {e}", exc_info=True)
+            yield json.dumps({"event": "error", "status_code": status_code, "detail": detail}) + "\n"
+    
+    return StreamingResponse(_ndjson(), media_type="application/x-ndjson")
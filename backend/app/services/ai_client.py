@@ -1,6 +1,10 @@
+import asyncio
+import hashlib
 import os
-from typing import List, Optional, Dict, Any
-from pydantic import BaseModel
+import time
+from contextvars import ContextVar
+from typing import List, Optional, Dict, Any, AsyncIterator, Awaitable, Callable, Tuple, get_args, get_origin
+from pydantic import BaseModel, TypeAdapter
 import json
 import logging
 import re
@@ -8,14 +12,34 @@ from ..prompts.jd_generation import JD_GENERATION_SYSTEM, JD_GENERATION_USER_TEM
 from ..prompts.resume_matching import RESUME_MATCHING_SYSTEM, RESUME_MATCHING_USER_TEMPLATE
 from ..prompts.email_generation import (
     INTERVIEW_EMAIL_SYSTEM, INTERVIEW_EMAIL_USER_TEMPLATE,
-    REJECTION_EMAIL_SYSTEM, REJECTION_EMAIL_USER_TEMPLATE
+    REJECTION_EMAIL_SYSTEM, REJECTION_EMAIL_USER_TEMPLATE,
+    BATCH_EMAIL_INSTRUCTIONS, BATCH_EMAIL_USER_TEMPLATE
 )
+from .scheduler import get_rate_limiter, get_circuit_breaker, backoff_delay, run_bounded
+from .cache import LRUCache, SQLiteCache
+from .prompt_budget import estimate_tokens, fit_text, PROMPT_TOKENS_MATCH_JD, PROMPT_TOKENS_MATCH_RESUME
+from .jd_profile import JDProfile
+from .json_stream import JSONStreamParser, parse_json, parse_json_array
+from .providers import get_provider, ProviderResponse, AI_PROVIDER, AI_MODEL
+from .metrics import ai_call_seconds, ai_errors, ai_retries, ai_tokens, fallbacks, record_cache_lookup
 
 logger = logging.getLogger(__name__)
 
-# AI Service Configuration
-AI_MODEL_NAME = "gemini-2.5-flash"
-AI_API_KEY_ENV = "GEMINI_API_KEY"
+# AI Service Configuration (AI_PROVIDER / AI_MODEL, see providers.py)
+AI_PROVIDER_NAME = AI_PROVIDER
+AI_MODEL_NAME = AI_MODEL
+AI_REQUESTS_PER_MINUTE = float(os.getenv("AI_REQUESTS_PER_MINUTE", "0"))  # 0 = unlimited
+AI_TOKENS_PER_MINUTE = float(os.getenv("AI_TOKENS_PER_MINUTE", "0"))  # prompt + output tokens, 0 = unlimited
+
+# Retries of rate-limited / transient failures, with full-jitter exponential backoff
+AI_MAX_RETRIES = int(os.getenv("AI_MAX_RETRIES", "3"))
+AI_RETRY_BASE_SECONDS = float(os.getenv("AI_RETRY_BASE_SECONDS", "1"))
+AI_RETRY_MAX_SECONDS = float(os.getenv("AI_RETRY_MAX_SECONDS", "30"))
+# Circuit breaker: after this many consecutive failures calls queue for AI_BREAKER_RESET_SECONDS
+AI_BREAKER_FAILURE_THRESHOLD = int(os.getenv("AI_BREAKER_FAILURE_THRESHOLD", "5"))  # 0 = disabled
+AI_BREAKER_RESET_SECONDS = float(os.getenv("AI_BREAKER_RESET_SECONDS", "30"))
+# Longest a call waits in the queue (open circuit) before giving up
+AI_MAX_QUEUE_WAIT_SECONDS = float(os.getenv("AI_MAX_QUEUE_WAIT_SECONDS", "120"))
 
 # Generation Configuration
 DEFAULT_TEMPERATURE = 0.01
@@ -25,14 +49,31 @@ MAX_TOKENS_MATCHING = 3000  # Increased for better responses
 MAX_TOKENS_EMAIL = 700
 MAX_TOKENS_REJECTION = 500
 
-# Initialize AI service
-try:
-    from google import genai
-    AI_SERVICE_AVAILABLE = True
-except ImportError as e:
-    logger.error(f"Failed to import Google GenAI: {e}")
-    genai = None
-    AI_SERVICE_AVAILABLE = False
+# Per-call timeouts (seconds); AI_CALL_TIMEOUT_SECONDS overrides the default
+AI_CALL_TIMEOUT_SECONDS = float(os.getenv("AI_CALL_TIMEOUT_SECONDS", "60"))
+TIMEOUT_JD = AI_CALL_TIMEOUT_SECONDS
+TIMEOUT_MATCHING = AI_CALL_TIMEOUT_SECONDS * 2  # Larger prompts, larger outputs
+TIMEOUT_EMAIL = AI_CALL_TIMEOUT_SECONDS
+
+# Chunked matching: resumes are split into batches that fit both budgets below
+MATCH_BATCH_INPUT_TOKENS = int(os.getenv("MATCH_BATCH_INPUT_TOKENS", "20000"))  # resume text per call
+MATCH_OUTPUT_TOKENS_PER_CANDIDATE = 150  # Rough size of one MatchResult in the response
+MATCH_CONCURRENCY = int(os.getenv("MATCH_CONCURRENCY", "4"))
+# Stream matching responses and report each candidate as soon as its result is complete
+MATCH_STREAM_RESULTS = os.getenv("MATCH_STREAM_RESULTS", "0").lower() in ("1", "true", "yes")
+
+# Email fan-out configuration
+EMAIL_CONCURRENCY = int(os.getenv("EMAIL_CONCURRENCY", "5"))
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", "0"))  # 0/1 = one AI call per candidate
+
+# Response cache for deterministic calls (matching, JD generation)
+AI_CACHE_BACKEND = os.getenv("AI_CACHE_BACKEND", "memory").lower()  # memory | sqlite | none
+AI_CACHE_PATH = os.getenv("AI_CACHE_PATH", "ai_cache.sqlite3")
+AI_CACHE_TTL_SECONDS = float(os.getenv("AI_CACHE_TTL_SECONDS", str(24 * 3600)))
+AI_CACHE_MAX_BYTES = int(os.getenv("AI_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# Set per request (e.g. from the X-Cache-Bypass header) to skip cache reads
+ai_cache_bypass: ContextVar[bool] = ContextVar("ai_cache_bypass", default=False)
 
 class GenerateJDInput(BaseModel):
     job_title: str
@@ -53,69 +94,317 @@ class EmailResult(BaseModel):
     subject: str
     body: str
 
+class BatchEmailResult(BaseModel):
+    filename: str
+    subject: str
+    body: str
+
 def _get_ai_client() -> Optional[Any]:
     """
-    Initialize and return AI client instance.
-    Returns None if service is not available or API key is missing.
+    Return the process-wide AI provider.
+    Returns None if it is not usable (e.g. SDK or API key missing).
     """
-    if not AI_SERVICE_AVAILABLE:
-        logger.warning("AI service not available - SDK not installed")
-        return None
+    provider = get_provider()
+    return provider if provider.available() else None
+
+_response_cache: Optional[Any] = None
+
+def _get_response_cache() -> Optional[Any]:
+    global _response_cache
+    if _response_cache is None and AI_CACHE_BACKEND != "none":
+        if AI_CACHE_BACKEND == "sqlite":
+            _response_cache = SQLiteCache(AI_CACHE_PATH, AI_CACHE_MAX_BYTES, AI_CACHE_TTL_SECONDS)
+        else:
+            _response_cache = LRUCache(AI_CACHE_MAX_BYTES, AI_CACHE_TTL_SECONDS)
+        logger.info(f"AI response cache enabled ({AI_CACHE_BACKEND})")
+    return _response_cache
+
+async def _cache_get(cache: Any, key: str, name: str) -> Optional[str]:
+    """cache.get(key) off the event loop, recorded as a hit or miss of the cache called `name`."""
+    start = time.perf_counter()
+    value = await cache.get_async(key)
+    record_cache_lookup(name, value is not None, time.perf_counter() - start)
+    return value
+
+async def _cache_get_many(cache: Any, keys: List[str], name: str) -> Dict[str, str]:
+    """
+    cache.get_many(keys) in one call off the event loop. Each key is recorded as a
+    hit or miss of the cache called `name`, with an equal share of the lookup time.
+    """
+    start = time.perf_counter()
+    found = await cache.get_many_async(keys)
+    share = (time.perf_counter() - start) / max(1, len(keys))
+    for key in keys:
+        record_cache_lookup(name, key in found, share)
+    return found
+
+def _response_cache_key(prompt: str, config: Optional[Dict[str, Any]]) -> str:
+    config_repr = ""
+    if config:
+        schema = config.get("response_schema")
+        rest = {k: v for k, v in config.items() if k != "response_schema"}
+        config_repr = json.dumps(rest, sort_keys=True, default=str)
+        if schema is not None:
+            config_repr += json.dumps(TypeAdapter(schema).json_schema(), sort_keys=True)
+    raw = "\x00".join([AI_MODEL_NAME, hashlib.sha256(prompt.encode("utf-8")).hexdigest(), config_repr])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+async def _generate_content(client: Any, prompt: str, config: Optional[Dict[str, Any]] = None,
+                            timeout: float = AI_CALL_TIMEOUT_SECONDS, cacheable: bool = False,
+                            call: str = "other") -> Any:
+    """
+    Model call with an optional response cache in front of the transport.
+    Only deterministic calls should pass `cacheable=True`. Hits are rebuilt from the
+    cached text (re-validated against the response schema); ai_cache_bypass skips
+    the lookup but still stores the fresh response. Structured responses the SDK
+    could not parse are recovered with the JSON repair parser (and never cached).
+    `call` names the call type in metrics (jd, match, interview_email, ...).
+    """
+    schema = (config or {}).get("response_schema")
+    cache = _get_response_cache() if cacheable else None
+    if cache is None:
+        return _with_recovered_json(await _call_model(client, prompt, config, timeout, call), schema)
     
-    api_key = os.getenv(AI_API_KEY_ENV, "")
-    if not api_key:
-        logger.warning(f"{AI_API_KEY_ENV} not set in environment")
-        return None
+    key = _response_cache_key(prompt, config)
+    if not ai_cache_bypass.get():
+        cached = await _cache_get(cache, key, "ai_response")
+        if cached is not None:
+            logger.info("AI response cache hit")
+            parsed = TypeAdapter(schema).validate_json(cached) if schema is not None else None
+            return ProviderResponse(cached, parsed)
     
+    response = await _call_model(client, prompt, config, timeout, call)
+    if response.text and (schema is None or response.parsed is not None):
+        await cache.set_async(key, response.text)
+    return _with_recovered_json(response, schema)
+
+def _recover_parsed(text: str, schema: Any) -> Any:
+    """
+    Schema-valid value recovered from malformed or truncated response text, or None.
+    For list schemas each element is validated on its own and invalid ones are dropped.
+    """
+    if get_origin(schema) is list:
+        adapter = TypeAdapter(get_args(schema)[0])
+        items = []
+        for value in parse_json_array(text):
+            try:
+                items.append(adapter.validate_python(value))
+            except ValueError:
+                continue
+        return items or None
     try:
-        # The client gets the API key from the environment variable automatically
-        client = genai.Client()
-        logger.info("AI client initialized successfully")
-        return client
-    except Exception as e:
-        logger.error(f"Failed to initialize AI client: {e}")
+        return TypeAdapter(schema).validate_python(parse_json(text))
+    except ValueError:
         return None
 
-async def generate_jd(payload: GenerateJDInput) -> str:
-    logger.info(f"Generating JD for {payload.job_title} at {payload.company_name}")
-    client = _get_ai_client()
-    
-    if client is None:
-        logger.warning("No AI client available, using fallback JD generation")
-        lines = []
-        lines.append(f"# {payload.job_title}")
-        lines.append(f"**{payload.company_name}**")
-        lines.append("")
-        lines.append(f"📍 {payload.location} | 💼 {payload.employment_type} | 🏢 {payload.industry}")
-        lines.append("")
-        lines.append("## Overview")
-        lines.append(f"We are seeking a {payload.job_title} with {payload.years_experience}+ years of experience to join {payload.company_name}. The ideal candidate demonstrates strong ownership and collaboration across cross-functional teams.")
-        lines.append("")
-        lines.append("## Responsibilities")
-        lines.append("- Deliver high-quality work aligned with product goals")
-        lines.append("- Collaborate with stakeholders to refine requirements and scope")
-        lines.append("- Write clean, reliable, and testable code")
-        lines.append("- Participate in code reviews and continuous improvement")
-        lines.append("")
-        lines.append("## Requirements")
-        lines.append(f"- {payload.years_experience}+ years relevant professional experience")
-        lines.append("- Proven problem-solving and communication skills")
-        for skill in [s.strip() for s in payload.must_have_skills.split(',') if s.strip()]:
-            lines.append(f"- {skill}")
-        lines.append("")
-        lines.append("## Nice to Have")
-        lines.append("- Exposure to adjacent tools and ecosystems")
-        lines.append("- Experience in high-growth environments")
-        lines.append("")
-        lines.append("## Benefits")
-        lines.append("- Competitive compensation and benefits")
-        lines.append("- Flexible work environment")
-        lines.append("- Learning stipend and growth opportunities")
-        lines.append("")
-        lines.append("## How to Apply")
-        lines.append("Please submit your resume highlighting relevant experience.")
-        return "\n".join(lines)
-    
+def _with_recovered_json(response: Any, schema: Any) -> Any:
+    if schema is None or response.parsed is not None or not response.text:
+        return response
+    parsed = _recover_parsed(response.text, schema)
+    if parsed is not None:
+        logger.warning("Structured output was malformed, recovered it from the response text")
+        fallbacks.inc(reason="json_repaired")
+    return ProviderResponse(response.text, parsed)
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Server-suggested delay (Retry-After, or Gemini's RetryInfo.retryDelay, e.g. "27s") from a rate-limit error, if any."""
+    if getattr(error, "retry_after", None) is not None:
+        return error.retry_after
+    match = re.search(r"'retryDelay': '(\d+(?:\.\d+)?)s'", str(getattr(error, "details", "")))
+    return float(match.group(1)) if match else None
+
+def _error_label(error: Exception) -> str:
+    """HTTP-like status code of a failed call, else the exception type, for metrics labels."""
+    code = getattr(error, "code", None)
+    return str(code) if isinstance(code, int) else type(error).__name__
+
+def _is_retryable(error: Exception) -> bool:
+    """Rate limits, server errors, timeouts and dropped connections are worth retrying."""
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        return code in (408, 429) or code >= 500
+    try:
+        import httpx
+    except ImportError:
+        return False
+    return isinstance(error, httpx.TransportError)
+
+async def _with_retries(start: Callable[[], Awaitable[Any]], tokens: int) -> Any:
+    """
+    Run one provider call behind the shared rate limiter and circuit breaker.
+    Transient failures are retried up to AI_MAX_RETRIES times with jittered backoff.
+    Rate-limit (429) errors are retried for as long as AI_MAX_QUEUE_WAIT_SECONDS
+    allows and pause every other caller for the delay the provider asked for, so a
+    burst queues up instead of failing. Raises the last error, or CircuitOpenError
+    when the circuit stays open past the wait budget.
+    """
+    limiter = get_rate_limiter(AI_PROVIDER_NAME, AI_REQUESTS_PER_MINUTE, AI_TOKENS_PER_MINUTE)
+    breaker = get_circuit_breaker(AI_PROVIDER_NAME, AI_BREAKER_FAILURE_THRESHOLD, AI_BREAKER_RESET_SECONDS)
+    deadline = time.monotonic() + AI_MAX_QUEUE_WAIT_SECONDS
+    attempt = 0
+    while True:
+        await breaker.wait(max(0.0, deadline - time.monotonic()))
+        try:
+            await limiter.acquire(tokens)
+            result = await start()
+        except asyncio.CancelledError:
+            breaker.release_probe()
+            raise
+        except Exception as e:
+            if not _is_retryable(e):
+                breaker.release_probe()
+                raise
+            breaker.record_failure()
+            delay = backoff_delay(attempt, AI_RETRY_BASE_SECONDS, AI_RETRY_MAX_SECONDS)
+            suggested = _retry_after(e)
+            if suggested is not None:
+                limiter.pause(suggested)
+                delay = max(delay, suggested)
+            attempt += 1
+            ai_retries.inc(error=_error_label(e))
+            # Quota errors keep queueing until the wait budget runs out; other errors get AI_MAX_RETRIES
+            rate_limited = getattr(e, "code", None) == 429
+            if time.monotonic() + delay > deadline or (attempt > AI_MAX_RETRIES and not rate_limited):
+                raise
+            logger.warning(f"AI call failed ({type(e).__name__}: {str(e)[:200]}), retry {attempt} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            continue
+        breaker.record_success()
+        return result
+
+def ai_circuit_state() -> str:
+    """State of the provider circuit breaker (closed, open or half_open), for health checks."""
+    return get_circuit_breaker(AI_PROVIDER_NAME, AI_BREAKER_FAILURE_THRESHOLD, AI_BREAKER_RESET_SECONDS).state
+
+def _call_tokens(prompt: str, config: Optional[Dict[str, Any]]) -> int:
+    """
+    Tokens a call counts against AI_TOKENS_PER_MINUTE: the prompt plus its output
+    budget (max_output_tokens, or an email-sized reply when the config sets none).
+    """
+    return estimate_tokens(prompt) + int((config or {}).get("max_output_tokens", MAX_TOKENS_EMAIL))
+
+def _usage_tokens(prompt: str, response: Any) -> Tuple[int, int]:
+    """(prompt, response) tokens of a call: the provider's usage report if it has one, else estimated."""
+    usage = getattr(response, "usage_metadata", None)  # Gemini SDK responses
+    if usage is not None and getattr(usage, "prompt_token_count", None) is not None:
+        return usage.prompt_token_count, usage.candidates_token_count or 0
+    prompt_tokens = getattr(response, "prompt_tokens", None)
+    response_tokens = getattr(response, "response_tokens", None)
+    return (
+        prompt_tokens if prompt_tokens is not None else estimate_tokens(prompt),
+        response_tokens if response_tokens is not None else estimate_tokens(response.text or ""),
+    )
+
+def _record_call(call: str, outcome: str, start: float, tokens: Optional[Tuple[int, int]] = None) -> None:
+    ai_call_seconds.observe(time.perf_counter() - start, call=call, outcome=outcome)
+    if tokens is not None:
+        ai_tokens.inc(tokens[0], call=call, kind="prompt")
+        ai_tokens.inc(tokens[1], call=call, kind="response")
+
+async def _call_model(provider: Any, prompt: str, config: Optional[Dict[str, Any]] = None,
+                      timeout: float = AI_CALL_TIMEOUT_SECONDS, call: str = "other") -> Any:
+    """
+    Single async transport for every model call, sent to the configured provider
+    (providers.py) so a slow call never blocks the event loop.
+    Goes through _with_retries (rate limits, backoff, circuit breaker); the timeout
+    covers each attempt of the call itself, not the time spent queued.
+    Raises asyncio.TimeoutError after `timeout` seconds; cancelling the awaiting
+    task (e.g. on client disconnect) cancels the in-flight HTTP request.
+    Latency, tokens and failures are recorded in metrics under `call`.
+    """
+    start = time.perf_counter()
+    try:
+        response = await _with_retries(
+            lambda: asyncio.wait_for(provider.generate(prompt, config), timeout=timeout),
+            _call_tokens(prompt, config),
+        )
+    except asyncio.CancelledError:
+        _record_call(call, "cancelled", start)
+        raise
+    except Exception as e:
+        _record_call(call, "error", start)
+        ai_errors.inc(call=call, error=_error_label(e))
+        raise
+    _record_call(call, "ok", start, _usage_tokens(prompt, response))
+    return response
+
+async def _stream_model(provider: Any, prompt: str, timeout: float = AI_CALL_TIMEOUT_SECONDS,
+                        config: Optional[Dict[str, Any]] = None, call: str = "other") -> AsyncIterator[str]:
+    """
+    Streaming counterpart of _call_model, yielding text chunks as they arrive.
+    Only opening the stream is retried; `timeout` bounds the wait for each chunk
+    rather than the whole stream. Metrics cover the whole stream, with tokens
+    estimated from the prompt and the text received.
+    """
+    start = time.perf_counter()
+    received: Optional[List[str]] = None
+    outcome = "ok"
+    try:
+        stream = await _with_retries(
+            lambda: asyncio.wait_for(provider.open_stream(prompt, config), timeout=timeout),
+            _call_tokens(prompt, config or {"max_output_tokens": MAX_TOKENS_JD}),
+        )
+        received = []
+        iterator = stream.__aiter__()
+        while True:
+            try:
+                chunk = await asyncio.wait_for(iterator.__anext__(), timeout=timeout)
+            except StopAsyncIteration:
+                return
+            received.append(chunk)
+            yield chunk
+    except (asyncio.CancelledError, GeneratorExit):
+        outcome = "cancelled"
+        raise
+    except Exception as e:
+        outcome = "error"
+        ai_errors.inc(call=call, error=_error_label(e))
+        raise
+    finally:
+        tokens = None
+        if received is not None:
+            tokens = (estimate_tokens(prompt), estimate_tokens("".join(received)))
+        _record_call(call, outcome, start, tokens)
+
+def _template_jd(payload: GenerateJDInput) -> str:
+    """Job description built from the form fields alone, used when no AI client is available."""
+    lines = []
+    lines.append(f"# {payload.job_title}")
+    lines.append(f"**{payload.company_name}**")
+    lines.append("")
+    lines.append(f"📍 {payload.location} | 💼 {payload.employment_type} | 🏢 {payload.industry}")
+    lines.append("")
+    lines.append("## Overview")
+    lines.append(f"We are seeking a {payload.job_title} with {payload.years_experience}+ years of experience to join {payload.company_name}. The ideal candidate demonstrates strong ownership and collaboration across cross-functional teams.")
+    lines.append("")
+    lines.append("## Responsibilities")
+    lines.append("- Deliver high-quality work aligned with product goals")
+    lines.append("- Collaborate with stakeholders to refine requirements and scope")
+    lines.append("- Write clean, reliable, and testable code")
+    lines.append("- Participate in code reviews and continuous improvement")
+    lines.append("")
+    lines.append("## Requirements")
+    lines.append(f"- {payload.years_experience}+ years relevant professional experience")
+    lines.append("- Proven problem-solving and communication skills")
+    for skill in [s.strip() for s in payload.must_have_skills.split(',') if s.strip()]:
+        lines.append(f"- {skill}")
+    lines.append("")
+    lines.append("## Nice to Have")
+    lines.append("- Exposure to adjacent tools and ecosystems")
+    lines.append("- Experience in high-growth environments")
+    lines.append("")
+    lines.append("## Benefits")
+    lines.append("- Competitive compensation and benefits")
+    lines.append("- Flexible work environment")
+    lines.append("- Learning stipend and growth opportunities")
+    lines.append("")
+    lines.append("## How to Apply")
+    lines.append("Please submit your resume highlighting relevant experience.")
+    return "\n".join(lines)
+
+def _jd_prompt(payload: GenerateJDInput) -> str:
     system = JD_GENERATION_SYSTEM
     user = JD_GENERATION_USER_TEMPLATE.format(
         job_title=payload.job_title,
@@ -126,14 +415,21 @@ async def generate_jd(payload: GenerateJDInput) -> str:
         industry=payload.industry,
         location=payload.location
     )
+    return f"{system}\n\n{user}"
+
+async def generate_jd(payload: GenerateJDInput) -> str:
+    logger.info(f"Generating JD for {payload.job_title} at {payload.company_name}")
+    client = _get_ai_client()
+    
+    if client is None:
+        logger.warning("No AI client available, using fallback JD generation")
+        fallbacks.inc(reason="jd_template")
+        return _template_jd(payload)
     
     try:
         logger.info(f"Calling AI API with model {AI_MODEL_NAME} for JD generation")
-        prompt = f"{system}\n\n{user}"
-        response = client.models.generate_content(
-            model=AI_MODEL_NAME,
-            contents=prompt
-        )
+        prompt = _jd_prompt(payload)
+        response = await _generate_content(client, prompt, timeout=TIMEOUT_JD, cacheable=True, call="jd")
         result = response.text.strip()
         logger.info(f"Successfully generated JD with {len(result)} characters")
         return result
@@ -141,149 +437,177 @@ async def generate_jd(payload: GenerateJDInput) -> str:
         logger.error(f"Error generating JD with AI: {e}")
         raise
 
+async def generate_jd_stream(payload: GenerateJDInput) -> AsyncIterator[str]:
+    """
+    Yield the JD markdown in chunks as the model produces them.
+    Without an AI client the template JD is yielded in one chunk. A cached JD (same
+    key as generate_jd) is replayed at once, and a completed stream is cached.
+    """
+    logger.info(f"Streaming JD for {payload.job_title} at {payload.company_name}")
+    client = _get_ai_client()
+    if client is None:
+        logger.warning("No AI client available, using fallback JD generation")
+        fallbacks.inc(reason="jd_template")
+        yield _template_jd(payload)
+        return
+    
+    prompt = _jd_prompt(payload)
+    cache = _get_response_cache()
+    key = _response_cache_key(prompt, None)
+    if cache is not None and not ai_cache_bypass.get():
+        cached = await _cache_get(cache, key, "ai_response")
+        if cached is not None:
+            logger.info("AI response cache hit")
+            yield cached.strip()
+            return
+    
+    logger.info(f"Streaming from AI API with model {AI_MODEL_NAME} for JD generation")
+    parts: List[str] = []
+    async for chunk in _stream_model(client, prompt, timeout=TIMEOUT_JD, call="jd"):
+        # Leading whitespace is dropped, matching generate_jd's strip()
+        if not parts:
+            chunk = chunk.lstrip()
+            if not chunk:
+                continue
+        parts.append(chunk)
+        yield chunk
+    text = "".join(parts)
+    logger.info(f"Successfully streamed JD with {len(text)} characters")
+    if cache is not None and text:
+        await cache.set_async(key, text)
+
+# Remarks of the placeholder result given to a resume the model failed to score
+AI_ERROR_REMARKS = "Unable to analyze - API error"
+
 class MatchAIItem(BaseModel):
     filename: str
     score: float
     missing_skills: List[str]
     remarks: str
 
-def _extract_json_from_text(text: str) -> str:
+def _plan_match_batches(resumes_text: List[str]) -> List[List[int]]:
     """
-    Extract clean JSON from AI response text.
-    Handles various formats and malformed responses.
+    Split resume indices into consecutive batches whose (already budget-trimmed) resume
+    text fits MATCH_BATCH_INPUT_TOKENS and whose expected output fits MAX_TOKENS_MATCHING.
+    A single oversized resume still gets a batch of its own.
     """
-    text = text.strip()
-    
-    # Remove markdown code blocks
-    if '```json' in text:
-        match = re.search(r'```json\s*([\[\{].*?[\]\}])\s*```', text, re.DOTALL)
-        if match:
-            text = match.group(1)
-    elif text.startswith('```'):
-        text = re.sub(r'^```[a-z]*\n', '', text)
-        text = re.sub(r'\n```$', '', text)
-    
-    # Find JSON array (preferred for matching results)
-    # Look for complete JSON array with proper closing
-    array_match = re.search(r'(\[.*?\])', text, re.DOTALL)
-    if array_match:
-        text = array_match.group(1)
-    else:
-        # Try to find incomplete array and complete it
-        incomplete_match = re.search(r'(\[.*)', text, re.DOTALL)
-        if incomplete_match:
-            # Try to complete the array
-            incomplete_text = incomplete_match.group(1)
-            if not incomplete_text.endswith(']'):
-                # Count open brackets and close them
-                open_brackets = incomplete_text.count('[') - incomplete_text.count(']')
-                if open_brackets > 0:
-                    incomplete_text += ']' * open_brackets
-                text = incomplete_text
-        else:
-            # Fallback to object
-            object_match = re.search(r'(\{.*?\})', text, re.DOTALL)
-            if object_match:
-                text = object_match.group(1)
-    
-    # Clean up common JSON issues
-    text = re.sub(r'"([^"]+)"\s+is\s+(?:not\s+)?(?:missing|present)[^,\n\]]*,?', r'"\1",', text)
-    text = re.sub(r'"\s*,\s*\n\s*"', '",\n"', text)
-    text = re.sub(r'"\s*\n\s*"', '",\n"', text)
-    text = re.sub(r',\s*([}\]])', r'\1', text)
-    
-    # Fix unquoted values
-    text = re.sub(r':\s*([^",\{\[\s][^,\}\]]*?)(?=\s*[,\}])', r': "\1"', text)
-    
-    # Remove any trailing content after the JSON
-    # Find the end of the JSON structure
-    if text.startswith('['):
-        bracket_count = 0
-        for i, char in enumerate(text):
-            if char == '[':
-                bracket_count += 1
-            elif char == ']':
-                bracket_count -= 1
-                if bracket_count == 0:
-                    text = text[:i+1]
-                    break
-    elif text.startswith('{'):
-        brace_count = 0
-        for i, char in enumerate(text):
-            if char == '{':
-                brace_count += 1
-            elif char == '}':
-                brace_count -= 1
-                if brace_count == 0:
-                    text = text[:i+1]
-                    break
-    
-    return text.strip()
-
-def _tokenize(text: str) -> List[str]:
-    return [t for t in re.split(r"[^a-zA-Z0-9+#\.]+", text.lower()) if t]
-
-def _canonical_skills(text: str) -> List[str]:
-    keywords = [
-        "python","java","javascript","typescript","react","node","fastapi","django","flask",
-        "aws","gcp","azure","docker","kubernetes","sql","nosql","postgres","mysql","mongodb",
-        "nlp","ml","ai","pytorch","tensorflow","sklearn","spacy","transformers","langchain",
-        "llm","genai","huggingface","openai","groq","llama","whisper","opencv","computer","vision",
-        "data","engineering","mle","mlops","airflow","kubeflow","ray","pandas","numpy","scipy",
-        "c++","c#","go","rust","php","html","css","tailwind","next.js","nextjs","redux","jest"
-    ]
-    set_kw = set(keywords)
-    seen = set()
-    out: List[str] = []
-    for tok in _tokenize(text):
-        if tok in set_kw and tok not in seen:
-            seen.add(tok)
-            out.append(tok)
-    return out
+    max_per_batch = max(1, MAX_TOKENS_MATCHING // MATCH_OUTPUT_TOKENS_PER_CANDIDATE)
+    batches: List[List[int]] = []
+    current: List[int] = []
+    used = 0
+    for i, txt in enumerate(resumes_text):
+        tokens = estimate_tokens(txt)
+        if current and (used + tokens > MATCH_BATCH_INPUT_TOKENS or len(current) >= max_per_batch):
+            batches.append(current)
+            current, used = [], 0
+        current.append(i)
+        used += tokens
+    if current:
+        batches.append(current)
+    return batches
 
-def _extract_jd_metadata(jd_text: str) -> dict:
-    lines = jd_text.split('\n')
-    job_title = "Position"
-    company_name = "Our Company"
-    
-    for i, line in enumerate(lines[:15]):
-        line_clean = line.strip().replace('#', '').strip()
-        
-        if i == 0 and line_clean and len(line_clean) < 100:
-            job_title = line_clean
-        
-        if any(keyword in line_clean.lower() for keyword in ['company:', 'at ', 'join ']):
-            words = line_clean.split()
-            for j, word in enumerate(words):
-                if word.lower() in ['at', 'join', 'company:'] and j + 1 < len(words):
-                    company_name = ' '.join(words[j+1:j+4]).strip('.,')
-                    break
-        
-        if '**' in line and i < 5:
-            match = re.search(r'\*\*([^*]+)\*\*', line)
-            if match:
-                potential_company = match.group(1).strip()
-                if len(potential_company) < 50 and not any(x in potential_company.lower() for x in ['overview', 'description', 'responsibilities']):
-                    company_name = potential_company
-    
-    return {"job_title": job_title, "company_name": company_name}
+def rank_candidates(scores: List[float], tiers: Optional[List[int]] = None) -> List[int]:
+    """
+    1-based rank for every score (highest first). Ties keep upload order,
+    so the ranking is stable no matter how resumes were batched.
+    With `tiers`, every candidate in a lower tier ranks above all higher tiers.
+    """
+    tiers = tiers or [0] * len(scores)
+    order = sorted(range(len(scores)), key=lambda i: (tiers[i], -scores[i], i))
+    ranks = [0] * len(scores)
+    for rank, i in enumerate(order, start=1):
+        ranks[i] = rank
+    return ranks
+
+def _match_item_key(jd: JDProfile, resume_text: str) -> str:
+    """Memoization key for one resume's score against one JD (and the current prompt/model)."""
+    prompt_fp = hashlib.sha256(
+        f"{RESUME_MATCHING_SYSTEM}{RESUME_MATCHING_USER_TEMPLATE}{PROMPT_TOKENS_MATCH_JD}:{PROMPT_TOKENS_MATCH_RESUME}".encode("utf-8")
+    ).hexdigest()[:16]
+    resume_fp = hashlib.sha256(resume_text.encode("utf-8")).hexdigest()
+    return f"match-item:{AI_MODEL_NAME}:{prompt_fp}:{jd.digest}:{resume_fp}"
 
-async def ai_match_resumes(jd_text: str, resumes_text: List[str], filenames: List[str]) -> List[MatchAIItem]:
+async def ai_match_resumes(jd: JDProfile, resumes_text: List[str], filenames: List[str],
+                           on_result: Optional[Callable[[int, MatchAIItem], None]] = None) -> List[MatchAIItem]:
+    """
+    Score every resume against the JD; results are returned in the order of `filenames`.
+    Scores are memoized per (JD, resume) content, so only resumes not seen before
+    for this JD are sent to the model and cached items are merged back in.
+    Uncached resumes are split into token-budgeted batches scored concurrently.
+    `on_result(index, item)` is called for each resume as soon as its score is known.
+    """
     logger.info(f"AI matching {len(resumes_text)} resumes against JD")
     client = _get_ai_client()
     
     if client is None:
         logger.error("No AI client available for matching")
-        raise Exception(f"AI service not available - {AI_API_KEY_ENV} not configured")
+        raise Exception(f"AI service not available - {get_provider().unavailable_reason()}")
+    
+    cache = _get_response_cache()
+    keys = [_match_item_key(jd, txt) for txt in resumes_text]
+    results: List[Optional[MatchAIItem]] = [None] * len(resumes_text)
     
-    jd_skills = _canonical_skills(jd_text)
-    system = RESUME_MATCHING_SYSTEM
+    if cache is not None and not ai_cache_bypass.get():
+        cached = await _cache_get_many(cache, keys, "match_item")
+        for i, key in enumerate(keys):
+            if key in cached:
+                results[i] = MatchAIItem.model_validate_json(cached[key]).model_copy(update={"filename": filenames[i]})
+                if on_result is not None:
+                    on_result(i, results[i])
     
+    pending = [i for i, r in enumerate(results) if r is None]
+    logger.info(f"{len(resumes_text) - len(pending)} resumes scored from cache, {len(pending)} to score with AI")
+    if pending:
+        # Each resume is trimmed to its prompt budget before batching
+        fitted = {i: fit_text(resumes_text[i], PROMPT_TOKENS_MATCH_RESUME) for i in pending}
+        batches = [[pending[j] for j in batch] for batch in _plan_match_batches([fitted[i] for i in pending])]
+        logger.info(f"Scoring {len(pending)} resumes in {len(batches)} batches")
+        
+        def _finish(i: int, item: MatchAIItem) -> None:
+            results[i] = item
+            if on_result is not None:
+                on_result(i, item)
+        
+        async def _score_batch(batch: List[int]) -> None:
+            scored = await _score_resumes(
+                client, jd,
+                [fitted[i] for i in batch],
+                [filenames[i] for i in batch],
+                on_item=lambda j, item: _finish(batch[j], item),
+            )
+            for i, item in zip(batch, scored):
+                if item is None:
+                    # Create fallback result when the model gave nothing usable for this resume
+                    fallbacks.inc(reason="match_placeholder")
+                    _finish(i, MatchAIItem(
+                        filename=filenames[i],
+                        score=0.0,
+                        missing_skills=list(jd.skills),
+                        remarks=AI_ERROR_REMARKS
+                    ))
+            if cache is not None:
+                # The batch's scores are stored together, off the event loop
+                await cache.set_many_async([(keys[i], results[i].model_dump_json()) for i in batch
+                                            if results[i].remarks != AI_ERROR_REMARKS])
+        
+        await run_bounded([lambda batch=batch: _score_batch(batch) for batch in batches], MATCH_CONCURRENCY)
+    return results
+
+async def _score_resumes(client: Any, jd: JDProfile, resumes_text: List[str], filenames: List[str],
+                         on_item: Optional[Callable[[int, MatchAIItem], None]] = None) -> List[Optional[MatchAIItem]]:
+    """
+    One model call scoring `resumes_text` (already trimmed to their prompt budget)
+    with the JD's precomputed matching prompt. Results are matched back to `filenames`
+    (aligned with the input); entries are None where the call failed or the model
+    omitted a candidate. With MATCH_STREAM_RESULTS the response is streamed and
+    `on_item(index, item)` fires as each candidate's JSON object completes; results
+    already received survive a failure later in the stream.
+    """
     candidates_data = []
     for i, txt in enumerate(resumes_text):
         candidates_data.append({
             "filename": filenames[i],
-            "resume_text": txt[:6000]
+            "resume_text": txt
         })
     
     rubric = {
@@ -302,74 +626,90 @@ async def ai_match_resumes(jd_text: str, resumes_text: List[str], filenames: Lis
         candidates_text += f"Filename: {candidate['filename']}\n"
         candidates_text += f"Resume: {candidate['resume_text']}\n\n"
     
-    user = RESUME_MATCHING_USER_TEMPLATE.format(
-        jd_full_content=jd_text,
-        jd_skills=jd_skills,
-        candidates=candidates_text
-    )
+    out: List[Optional[MatchAIItem]] = [None] * len(filenames)
+    positions: Dict[str, List[int]] = {}
+    for i, filename in enumerate(filenames):
+        positions.setdefault(filename.strip(), []).append(i)
     
-    try:
-        logger.info(f"Calling AI API for resume matching with structured output")
-        prompt = f"{system}\n\n{user}"
-        response = client.models.generate_content(
-            model=AI_MODEL_NAME,
-            contents=prompt,
-            config={
-                "response_mime_type": "application/json",
-                "response_schema": list[MatchResult],
-            }
+    def _assign(result: MatchResult) -> None:
+        pending = positions.get(result.filename.strip())
+        if not pending:
+            logger.warning(f"AI matching returned an unexpected or duplicate result for {result.filename}")
+            return
+        i = pending.pop(0)
+        out[i] = MatchAIItem(
+            filename=filenames[i],
+            score=float(result.score),
+            missing_skills=result.missing_skills,
+            remarks=result.remarks,
         )
-        
-        # Use the structured response
-        results: list[MatchResult] = response.parsed
-        logger.info(f"Successfully parsed {len(results)} results")
-        
-        out: List[MatchAIItem] = []
-        for result in results:
-            out.append(
-                MatchAIItem(
-                    filename=result.filename,
-                    score=float(result.score),
-                    missing_skills=result.missing_skills,
-                    remarks=result.remarks,
-                )
+        if on_item is not None:
+            on_item(i, out[i])
+    
+    config = {
+        "response_mime_type": "application/json",
+        "response_schema": list[MatchResult],
+    }
+    try:
+        prompt = jd.match_prompt(candidates_text)
+        if MATCH_STREAM_RESULTS:
+            logger.info(f"Calling AI API for resume matching with streamed structured output")
+            parser = JSONStreamParser()
+            adapter = TypeAdapter(MatchResult)
+            
+            def _take(values: List[Any]) -> None:
+                for value in values:
+                    try:
+                        _assign(adapter.validate_python(value))
+                    except ValueError as e:
+                        logger.warning(f"Skipping malformed match result: {e}")
+            
+            async for chunk in _stream_model(client, prompt, TIMEOUT_MATCHING, config, call="match"):
+                _take(parser.feed(chunk))
+            _take(parser.close())
+        else:
+            logger.info(f"Calling AI API for resume matching with structured output")
+            response = await _generate_content(
+                client, prompt, config=config, timeout=TIMEOUT_MATCHING, cacheable=True, call="match"
             )
-        return out
-        
+            # Use the structured response
+            results: list[MatchResult] = response.parsed or []
+            logger.info(f"Successfully parsed {len(results)} results")
+            for result in results:
+                _assign(result)
     except Exception as e:
         logger.error(f"AI matching failed: {e}")
-        # Create fallback results when API call fails
         logger.warning("Creating fallback results due to API error")
-        fallback_results = []
-        for i, filename in enumerate(filenames):
-            fallback_results.append(
-                MatchAIItem(
-                    filename=filename,
-                    score=0.0,
-                    missing_skills=jd_skills,
-                    remarks="Unable to analyze - API error"
-                )
-            )
-        return fallback_results
+    
+    for i, filename in enumerate(filenames):
+        if out[i] is None:
+            logger.warning(f"AI matching returned no result for {filename}")
+    return out
 
-async def generate_interview_email(jd_text: str, resume_text: str, filename: str) -> dict:
+def _email_prompt_parts(jd: JDProfile, resumes_text: List[str], selected: bool) -> Tuple[str, List[str]]:
+    """
+    JD and resume text for an interview (`selected`) or rejection email prompt, trimmed
+    so the prompt fits that call type's token budget. Each resume gets the tokens the
+    JD's precomputed email text leaves over.
+    """
+    jd_text, resume_tokens = jd.email_parts(selected)
+    return jd_text, [fit_text(r, resume_tokens) for r in resumes_text]
+
+async def generate_interview_email(jd: JDProfile, resume_text: str, filename: str) -> dict:
     logger.info(f"Generating interview email for {filename}")
     client = _get_ai_client()
     name = os.path.splitext(os.path.basename(filename))[0].replace("_", " ").title()
-    
-    metadata = _extract_jd_metadata(jd_text)
-    job_title = metadata["job_title"].replace("*", "").strip()
-    company_name = metadata["company_name"].replace("*", "").strip()
+    job_title, company_name = jd.job_title, jd.company_name
     
     if client is None:
         logger.warning("No AI client, using fallback interview email")
+        fallbacks.inc(reason="interview_email_template")
         return {
             "subject": f"Interview Invitation - {job_title}",
             "body": f"Dear {name},\n\nWe are impressed with your qualifications for the {job_title} position. We would like to invite you for an interview.\n\nPlease share your availability for next week.\n\nBest regards,\nHiring Team"
         }
     
-    clean_jd = jd_text.replace("*", "").replace("#", "")[:4000]  # Increased for better context
-    clean_resume = resume_text[:2000]
+    clean_jd, (clean_resume,) = _email_prompt_parts(jd, [resume_text], True)
     
     system = INTERVIEW_EMAIL_SYSTEM
     user = INTERVIEW_EMAIL_USER_TEMPLATE.format(
@@ -382,13 +722,15 @@ async def generate_interview_email(jd_text: str, resume_text: str, filename: str
     
     try:
         prompt = f"{system}\n\n{user}"
-        response = client.models.generate_content(
-            model=AI_MODEL_NAME,
-            contents=prompt,
+        response = await _generate_content(
+            client,
+            prompt,
             config={
                 "response_mime_type": "application/json",
                 "response_schema": EmailResult,
-            }
+            },
+            timeout=TIMEOUT_EMAIL,
+            call="interview_email",
         )
         
         # Use the structured response
@@ -397,28 +739,27 @@ async def generate_interview_email(jd_text: str, resume_text: str, filename: str
         return {"subject": email_result.subject, "body": email_result.body}
     except Exception as e:
         logger.warning(f"Email generation failed: {e}")
+        fallbacks.inc(reason="interview_email_template")
         return {
             "subject": f"Interview Invitation - {job_title} at {company_name}",
             "body": f"Dear {name},\n\nWe are impressed with your qualifications for the {job_title} position at {company_name}. We would like to invite you for an interview.\n\nPlease share your availability for next week.\n\nBest regards,\nHiring Team"
         }
 
-async def generate_rejection_email(jd_text: str, resume_text: str, filename: str) -> dict:
+async def generate_rejection_email(jd: JDProfile, resume_text: str, filename: str) -> dict:
     logger.info(f"Generating rejection email for {filename}")
     client = _get_ai_client()
     name = os.path.splitext(os.path.basename(filename))[0].replace("_", " ").title()
-    
-    metadata = _extract_jd_metadata(jd_text)
-    job_title = metadata["job_title"].replace("*", "").strip()
-    company_name = metadata["company_name"].replace("*", "").strip()
+    job_title, company_name = jd.job_title, jd.company_name
     
     if client is None:
         logger.warning("No AI client, using fallback rejection email")
+        fallbacks.inc(reason="rejection_email_template")
         return {
             "subject": f"Application Status - {job_title}",
             "body": f"Dear {name},\n\nThank you for your interest in the {job_title} position. We have decided to move forward with other candidates.\n\nWe wish you success in your job search.\n\nBest regards,\nHiring Team"
         }
     
-    clean_jd = jd_text.replace("*", "").replace("#", "")[:4000]  # Match interview email
+    clean_jd, (clean_resume,) = _email_prompt_parts(jd, [resume_text], False)
     
     system = REJECTION_EMAIL_SYSTEM
     user = REJECTION_EMAIL_USER_TEMPLATE.format(
@@ -426,18 +767,20 @@ async def generate_rejection_email(jd_text: str, resume_text: str, filename: str
         company_name=company_name,
         candidate_name=name,
         jd_summary=clean_jd,
-        resume_summary=resume_text[:500] + "..." if len(resume_text) > 500 else resume_text
+        resume_summary=clean_resume
     )
     
     try:
         prompt = f"{system}\n\n{user}"
-        response = client.models.generate_content(
-            model=AI_MODEL_NAME,
-            contents=prompt,
+        response = await _generate_content(
+            client,
+            prompt,
             config={
                 "response_mime_type": "application/json",
                 "response_schema": EmailResult,
-            }
+            },
+            timeout=TIMEOUT_EMAIL,
+            call="rejection_email",
         )
         
         # Use the structured response
@@ -446,7 +789,144 @@ async def generate_rejection_email(jd_text: str, resume_text: str, filename: str
         return {"subject": email_result.subject, "body": email_result.body}
     except Exception as e:
         logger.warning(f"Rejection email generation failed: {e}")
+        fallbacks.inc(reason="rejection_email_template")
         return {
             "subject": f"Application Status - {job_title} at {company_name}",
             "body": f"Dear {name},\n\nThank you for your interest in the {job_title} position at {company_name}. After careful review, we have decided to move forward with other candidates.\n\nWe wish you the best in your job search.\n\nBest regards,\nHiring Team"
         }
+
+def template_rejection_email(jd: JDProfile, filename: str) -> dict:
+    """Rejection email built without any AI call, for candidates screened out locally."""
+    name = os.path.splitext(os.path.basename(filename))[0].replace("_", " ").title()
+    job_title, company_name = jd.job_title, jd.company_name
+    return {
+        "subject": f"Application Status - {job_title} at {company_name}",
+        "body": f"Dear {name},\n\nThank you for your interest in the {job_title} position at {company_name}. After careful review, we have decided to move forward with other candidates.\n\nWe wish you the best in your job search.\n\nBest regards,\nHiring Team"
+    }
+
+def _filename_key(filename: str) -> str:
+    """Filenames as compared between a batch request and the model's response."""
+    return filename.strip()
+
+async def generate_emails_batch(jd: JDProfile, resumes_text: List[str], filenames: List[str], selected: bool,
+                                semaphore: Optional[asyncio.Semaphore] = None) -> List[dict]:
+    """
+    Generate emails of one kind (interview if `selected`, else rejection) for several
+    candidates in a single AI call, sending the JD context only once.
+    The response is validated against the requested filenames; any candidate that is
+    missing, duplicated or empty falls back to its own single-candidate call.
+    Each model call holds a slot of `semaphore` (EMAIL_CONCURRENCY slots if not given),
+    so callers running several batches can share one cap.
+    Returns emails in the same order as `filenames`.
+    """
+    kind = "interview" if selected else "rejection"
+    single = generate_interview_email if selected else generate_rejection_email
+    logger.info(f"Generating {len(filenames)} {kind} emails in one batch")
+    client = _get_ai_client()
+    semaphore = semaphore or asyncio.Semaphore(max(1, EMAIL_CONCURRENCY))
+    
+    results: Dict[int, dict] = {}
+    keys = [_filename_key(f) for f in filenames]
+    unique = [i for i, k in enumerate(keys) if keys.count(k) == 1]
+    
+    if client is not None and len(unique) > 1:
+        clean_jd, resumes = _email_prompt_parts(jd, [resumes_text[i] for i in unique], selected)
+        
+        candidates_text = ""
+        for i, resume in zip(unique, resumes):
+            name = os.path.splitext(os.path.basename(filenames[i]))[0].replace("_", " ").title()
+            candidates_text += f"Filename: {filenames[i]}\n"
+            candidates_text += f"Candidate: {name}\n"
+            candidates_text += f"Resume: {resume}\n\n"
+        
+        system = (INTERVIEW_EMAIL_SYSTEM if selected else REJECTION_EMAIL_SYSTEM) + "\n\n" + BATCH_EMAIL_INSTRUCTIONS
+        user = BATCH_EMAIL_USER_TEMPLATE.format(
+            email_kind=kind,
+            job_title=jd.job_title,
+            company_name=jd.company_name,
+            jd_summary=clean_jd,
+            candidates=candidates_text
+        )
+        
+        try:
+            prompt = f"{system}\n\n{user}"
+            async with semaphore:
+                response = await _generate_content(
+                    client,
+                    prompt,
+                    config={
+                        "response_mime_type": "application/json",
+                        "response_schema": list[BatchEmailResult],
+                    },
+                    timeout=TIMEOUT_EMAIL * 2,
+                    call=f"{kind}_email_batch",
+                )
+            batch: list[BatchEmailResult] = response.parsed or []
+            by_filename: Dict[str, List[BatchEmailResult]] = {}
+            for item in batch:
+                by_filename.setdefault(_filename_key(item.filename), []).append(item)
+            for i in unique:
+                items = by_filename.get(keys[i], [])
+                if len(items) == 1 and items[0].subject.strip() and items[0].body.strip():
+                    results[i] = {"subject": items[0].subject, "body": items[0].body}
+            logger.info(f"Batch returned usable {kind} emails for {len(results)}/{len(filenames)} candidates")
+        except Exception as e:
+            logger.warning(f"Batch {kind} email generation failed: {e}")
+    
+    missing = [i for i in range(len(filenames)) if i not in results]
+    if missing:
+        logger.info(f"Falling back to single {kind} emails for {len(missing)} candidates")
+        fallbacks.inc(len(missing), reason=f"{kind}_email_unbatched")
+        emails = await run_bounded(
+            [lambda i=i: single(jd, resumes_text[i], filenames[i]) for i in missing],
+            semaphore,
+        )
+        results.update(zip(missing, emails))
+    return [results[i] for i in range(len(filenames))]
+
+async def generate_candidate_emails(jd: JDProfile, resumes_text: List[str], filenames: List[str],
+                                    selections: List[bool],
+                                    on_email: Optional[Callable[[int, dict], None]] = None) -> List[dict]:
+    """
+    Generate the interview or rejection email for every candidate.
+    With EMAIL_BATCH_SIZE > 1, candidates of the same kind are grouped into batched
+    calls; otherwise each candidate gets its own call. Calls run concurrently, and
+    every model call (batched, single, or a batch's per-candidate fallback) takes a
+    slot of one semaphore, so at most EMAIL_CONCURRENCY are in flight.
+    Returns emails in the same order as `filenames`; `on_email(index, email)` is
+    called as soon as each one is ready.
+    """
+    semaphore = asyncio.Semaphore(max(1, EMAIL_CONCURRENCY))
+    jobs = []
+    slots: List[List[int]] = []
+    if EMAIL_BATCH_SIZE > 1:
+        for selected in (True, False):
+            indices = [i for i, s in enumerate(selections) if s == selected]
+            for start in range(0, len(indices), EMAIL_BATCH_SIZE):
+                chunk = indices[start:start + EMAIL_BATCH_SIZE]
+                slots.append(chunk)
+                jobs.append(lambda chunk=chunk, selected=selected: generate_emails_batch(
+                    jd,
+                    [resumes_text[i] for i in chunk],
+                    [filenames[i] for i in chunk],
+                    selected,
+                    semaphore,
+                ))
+    else:
+        for i, selected in enumerate(selections):
+            single = generate_interview_email if selected else generate_rejection_email
+            slots.append([i])
+            jobs.append(lambda i=i, single=single: run_bounded([lambda: single(jd, resumes_text[i], filenames[i])], semaphore))
+    
+    emails: List[dict] = [{} for _ in filenames]
+    
+    async def _run_chunk(chunk: List[int], job: Callable[[], Any]) -> None:
+        for i, email in zip(chunk, await job()):
+            emails[i] = email
+            if on_email is not None:
+                on_email(i, email)
+    
+    # The jobs' model calls are bounded by `semaphore`; holding a slot per job here
+    # would leave a batch's fallbacks waiting on slots held by other batches
+    await run_bounded([lambda chunk=chunk, job=job: _run_chunk(chunk, job) for chunk, job in zip(slots, jobs)], len(slots))
+    return emails
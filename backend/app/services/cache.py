@@ -0,0 +1,368 @@
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Size-bounded on-disk caches evict down to this share of their limit, so a full
+# cache does not evict again on every insert
+EVICT_LOW_WATER = 0.9
+# Rows deleted per statement when the SQLite cache evicts
+EVICT_BATCH_ROWS = 256
+# Keys per statement in batched SQLite lookups (below SQLite's bound-parameter limit)
+LOOKUP_BATCH_KEYS = 500
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return asdict(self)
+
+class LRUCache:
+    """
+    In-memory string cache bounded by the total size of its values (in bytes).
+    Least recently used entries are evicted first; with `ttl_seconds`, entries
+    older than that are treated as missing.
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: Optional[float] = None):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.stats = CacheStats()
+        self._data: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and self.ttl_seconds is not None and time.time() - entry[1] > self.ttl_seconds:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.stats.hits += 1
+            return entry[0]
+
+    def set(self, key: str, value: str) -> None:
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, time.time())
+            self._size += size
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._data)))
+                self.stats.evictions += 1
+
+    def get_many(self, keys: List[str]) -> Dict[str, str]:
+        """Values of the `keys` that are cached; missing keys are left out."""
+        return {key: value for key in keys if (value := self.get(key)) is not None}
+
+    def set_many(self, items: Iterable[Tuple[str, str]]) -> None:
+        for key, value in items:
+            self.set(key, value)
+
+    # In memory, so the async variants run inline; they mirror SQLiteCache's
+    async def get_async(self, key: str) -> Optional[str]:
+        return self.get(key)
+
+    async def set_async(self, key: str, value: str) -> None:
+        self.set(key, value)
+
+    async def get_many_async(self, keys: List[str]) -> Dict[str, str]:
+        return self.get_many(keys)
+
+    async def set_many_async(self, items: Iterable[Tuple[str, str]]) -> None:
+        self.set_many(items)
+
+    def _remove(self, key: str) -> None:
+        value, _ = self._data.pop(key)
+        self._size -= len(value.encode("utf-8"))
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+class DiskBlobCache:
+    """
+    Directory of zlib-compressed blobs, one file per key, bounded by total size on disk.
+    Sizes and last-use times are kept in an in-memory index (built by one directory
+    walk when the cache is opened), so eviction removes the least recently used blobs
+    down to EVICT_LOW_WATER without touching the directory. Blobs written by other
+    processes are indexed the next time the cache is opened.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._index: Dict[str, Tuple[int, float]] = {}  # path -> (size, last use)
+        os.makedirs(directory, exist_ok=True)
+        for path in self._blob_paths():
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            self._index[path] = (st.st_size, st.st_mtime)
+        self._size = sum(size for size, _ in self._index.values())
+
+    def _path(self, key: str) -> str:
+        name = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, name[:2], f"{name}.z")
+
+    def _blob_paths(self):
+        for root, _, files in os.walk(self.directory):
+            for f in files:
+                if f.endswith(".z"):
+                    yield os.path.join(root, f)
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as fh:
+                blob = fh.read()
+            value = zlib.decompress(blob).decode("utf-8")
+            os.utime(path)
+        except (OSError, zlib.error):
+            self.stats.misses += 1
+            return None
+        with self._lock:
+            if path not in self._index:
+                self._size += len(blob)
+            self._index[path] = (len(blob), time.time())
+        self.stats.hits += 1
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        blob = zlib.compress(value.encode("utf-8"))
+        if len(blob) > self.max_bytes:
+            return
+        path = self._path(key)
+        with self._lock:
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = f"{path}.tmp"
+                with open(tmp, "wb") as fh:
+                    fh.write(blob)
+                os.replace(tmp, path)
+            except OSError as e:
+                logger.warning(f"Failed to write cache blob {path}: {e}")
+                return
+            old_size, _ = self._index.get(path, (0, 0.0))
+            self._index[path] = (len(blob), time.time())
+            self._size += len(blob) - old_size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        target = self.max_bytes * EVICT_LOW_WATER
+        for path, (size, _) in sorted(self._index.items(), key=lambda item: item[1][1]):
+            if self._size <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                continue
+            del self._index[path]
+            self._size -= size
+            self.stats.evictions += 1
+
+    async def get_async(self, key: str) -> Optional[str]:
+        return await asyncio.to_thread(self.get, key)
+
+    async def set_async(self, key: str, value: str) -> None:
+        await asyncio.to_thread(self.set, key, value)
+
+class SQLiteCache:
+    """
+    String cache in a single SQLite file, shared by every worker process on the host.
+    Bounded by the total size of its values with LRU eviction in batches down to
+    EVICT_LOW_WATER; optional TTL. The total is tracked in memory and re-read from
+    the file (other processes write to it too) only when it crosses the limit.
+    """
+
+    def __init__(self, path: str, max_bytes: int, ttl_seconds: Optional[float] = None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # A lost write after a power failure is only a cache miss
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache(accessed_at)")
+        self._size = self._total_size()
+
+    def _total_size(self) -> int:
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+
+    def get(self, key: str) -> Optional[str]:
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: List[str]) -> Dict[str, str]:
+        """
+        Values of the `keys` that are cached, looked up in one transaction; missing
+        and expired keys are left out. Every hit has its access time bumped.
+        """
+        keys = list(dict.fromkeys(keys))
+        now = time.time()
+        found: Dict[str, str] = {}
+        expired: List[Tuple[str, int]] = []
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for start in range(0, len(keys), LOOKUP_BATCH_KEYS):
+                    chunk = keys[start:start + LOOKUP_BATCH_KEYS]
+                    rows = self._conn.execute(
+                        f"SELECT key, value, created_at, size FROM cache WHERE key IN ({','.join('?' * len(chunk))})",
+                        chunk,
+                    ).fetchall()
+                    for key, value, created_at, size in rows:
+                        if self.ttl_seconds is not None and now - created_at > self.ttl_seconds:
+                            expired.append((key, size))
+                        else:
+                            found[key] = value
+                if expired:
+                    self._conn.executemany("DELETE FROM cache WHERE key = ?", [(key,) for key, _ in expired])
+                if found:
+                    self._conn.executemany("UPDATE cache SET accessed_at = ? WHERE key = ?",
+                                           [(now, key) for key in found])
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            self._size -= sum(size for _, size in expired)
+        self.stats.hits += len(found)
+        self.stats.misses += len(keys) - len(found)
+        return found
+
+    def set(self, key: str, value: str) -> None:
+        self.set_many([(key, value)])
+
+    def set_many(self, items: Iterable[Tuple[str, str]]) -> None:
+        """Store every (key, value) pair in one transaction."""
+        items = [(key, value, len(value.encode("utf-8"))) for key, value in items]
+        items = [item for item in items if item[2] <= self.max_bytes]
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            added = 0
+            try:
+                for key, value, size in items:
+                    old = self._conn.execute("SELECT size FROM cache WHERE key = ?", (key,)).fetchone()
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO cache (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                        (key, value, size, now, now),
+                    )
+                    added += size - (old[0] if old else 0)
+                if self._size + added > self.max_bytes:
+                    # Re-reads the total, which already includes this transaction's rows
+                    self._evict()
+                    added = 0
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                self._size = self._total_size()
+                raise
+            self._conn.execute("COMMIT")
+            self._size += added
+
+    async def get_async(self, key: str) -> Optional[str]:
+        return await asyncio.to_thread(self.get, key)
+
+    async def set_async(self, key: str, value: str) -> None:
+        await asyncio.to_thread(self.set, key, value)
+
+    async def get_many_async(self, keys: List[str]) -> Dict[str, str]:
+        return await asyncio.to_thread(self.get_many, keys)
+
+    async def set_many_async(self, items: Iterable[Tuple[str, str]]) -> None:
+        await asyncio.to_thread(self.set_many, list(items))
+
+    def _evict(self) -> None:
+        self._size = self._total_size()
+        target = self.max_bytes * EVICT_LOW_WATER
+        oldest = "SELECT key, size FROM cache ORDER BY accessed_at LIMIT ?"
+        while self._size > target:
+            freed, count = self._conn.execute(
+                f"SELECT COALESCE(SUM(size), 0), COUNT(*) FROM ({oldest})", (EVICT_BATCH_ROWS,)
+            ).fetchone()
+            if not count:
+                break
+            self._conn.execute(f"DELETE FROM cache WHERE key IN (SELECT key FROM ({oldest}))", (EVICT_BATCH_ROWS,))
+            self._size -= freed
+            self.stats.evictions += count
+
+    def close(self) -> None:
+        self._conn.close()
+
+class TieredCache:
+    """Memory LRU in front of an optional on-disk tier; disk hits are promoted to memory."""
+
+    def __init__(self, memory: LRUCache, disk: Optional[DiskBlobCache] = None):
+        self.memory = memory
+        self.disk = disk
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    async def get_async(self, key: str) -> Optional[str]:
+        """get() with the disk tier read in a thread, off the event loop."""
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = await self.disk.get_async(key)
+            if value is not None:
+                self.memory.set(key, value)
+        return value
+
+    async def set_async(self, key: str, value: str) -> None:
+        """set() with the disk tier written in a thread, off the event loop."""
+        self.memory.set(key, value)
+        if self.disk is not None:
+            await self.disk.set_async(key, value)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        out = {"memory": self.memory.stats.as_dict()}
+        if self.disk is not None:
+            out["disk"] = self.disk.stats.as_dict()
+        return out
@@ -0,0 +1,225 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from .cache import content_hash
+from .jd_profile import JDProfile
+from .matching import _STOPWORDS, _tokenize_skills
+from .skills import extract_skills
+
+logger = logging.getLogger(__name__)
+
+# Every screened resume is kept here so the pool can be re-ranked against new JDs
+CANDIDATES_DB_PATH = os.getenv("CANDIDATES_DB_PATH", "candidates.sqlite3")
+CANDIDATE_STORE_ENABLED = os.getenv("CANDIDATE_STORE_ENABLED", "1").lower() in ("1", "true", "yes")
+# Stored candidates retrieved by full-text relevance before local ranking
+CANDIDATE_RANK_POOL = int(os.getenv("CANDIDATE_RANK_POOL", "1000"))
+# JD terms used in the full-text query
+CANDIDATE_QUERY_TERMS = 64
+
+def _fts_phrase(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+def jd_query_terms(jd: JDProfile) -> List[str]:
+    """The JD's canonical skills followed by its other distinctive words."""
+    terms = list(jd.skills)
+    for token in _tokenize_skills(jd.text):
+        token = token.strip(".")
+        if len(token) > 1 and token not in _STOPWORDS and token not in terms:
+            terms.append(token)
+    return terms[:CANDIDATE_QUERY_TERMS]
+
+class CandidateStore:
+    """
+    SQLite repository of extracted resumes keyed by the hash of their text, with
+    their canonical skills and every match they took part in. Text and skills are
+    indexed with FTS5 (BM25-ranked search); on SQLite builds without FTS5, search
+    falls back to substring matching and the pool to the most recent candidates.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS candidates (
+                id INTEGER PRIMARY KEY,
+                content_hash TEXT NOT NULL UNIQUE,
+                filename TEXT NOT NULL,
+                text TEXT NOT NULL,
+                skills TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS match_history (
+                candidate_id INTEGER NOT NULL,
+                jd_hash TEXT NOT NULL,
+                job_title TEXT NOT NULL,
+                score REAL NOT NULL,
+                remarks TEXT NOT NULL,
+                is_selected INTEGER NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS match_history_candidate ON match_history(candidate_id, created_at);
+            """
+        )
+        try:
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS candidates_fts USING fts5("
+                "text, skills, content='candidates', content_rowid='id', tokenize=\"unicode61 tokenchars '+#'\")"
+            )
+            self.fts = True
+        except sqlite3.OperationalError as e:
+            logger.warning(f"SQLite FTS5 not available ({e}), candidate search falls back to substring matching")
+            self.fts = False
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _upsert(self, conn: sqlite3.Connection, filename: str, text: str, now: float) -> int:
+        key = content_hash(text.encode("utf-8"))
+        row = conn.execute("SELECT id FROM candidates WHERE content_hash = ?", (key,)).fetchone()
+        if row is not None:
+            conn.execute("UPDATE candidates SET filename = ?, updated_at = ? WHERE id = ?", (filename, now, row[0]))
+            return row[0]
+        skills = json.dumps(extract_skills(text))
+        cur = conn.execute(
+            "INSERT INTO candidates (content_hash, filename, text, skills, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (key, filename, text, skills, now, now),
+        )
+        if self.fts:
+            conn.execute("INSERT INTO candidates_fts (rowid, text, skills) VALUES (?, ?, ?)", (cur.lastrowid, text, skills))
+        return cur.lastrowid
+
+    def upsert(self, filename: str, text: str) -> int:
+        """Store a resume (or refresh its filename if the same text is already stored) and return its id."""
+        with self._transaction() as conn:
+            return self._upsert(conn, filename, text, time.time())
+
+    def record_match(self, jd: JDProfile, texts: List[str], filenames: List[str],
+                     candidates: List[Dict[str, Any]]) -> List[int]:
+        """
+        Store every resume of a finished match with its outcome, in one transaction;
+        returns the candidate ids. Blocks, so async callers run it in a thread.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            ids = [self._upsert(conn, name, text, now) for name, text in zip(filenames, texts)]
+            conn.executemany(
+                "INSERT INTO match_history (candidate_id, jd_hash, job_title, score, remarks, is_selected, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (cid, jd.digest, jd.job_title, c["score"], c["remarks"], int(c["is_selected"]), now)
+                    for cid, c in zip(ids, candidates)
+                ],
+            )
+        return ids
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM candidates").fetchone()[0]
+
+    def search(self, terms: List[str], limit: int, match_all: bool = True) -> List[Dict[str, Any]]:
+        """
+        Candidates containing all (or with `match_all=False`, any) of `terms`, most
+        relevant first, with a highlighted snippet of the matching text.
+        """
+        if not terms:
+            return []
+        with self._lock:
+            if self.fts:
+                query = (" AND " if match_all else " OR ").join(_fts_phrase(t) for t in terms)
+                rows = self._conn.execute(
+                    "SELECT c.id, c.filename, c.skills, c.updated_at, "
+                    "snippet(candidates_fts, 0, '[', ']', '...', 16), bm25(candidates_fts) "
+                    "FROM candidates_fts JOIN candidates c ON c.id = candidates_fts.rowid "
+                    "WHERE candidates_fts MATCH ? ORDER BY bm25(candidates_fts) LIMIT ?",
+                    (query, limit),
+                ).fetchall()
+            else:
+                clauses = (" AND " if match_all else " OR ").join("instr(lower(text), ?) > 0" for _ in terms)
+                rows = self._conn.execute(
+                    f"SELECT id, filename, skills, updated_at, substr(text, 1, 200), 0 FROM candidates "
+                    f"WHERE {clauses} ORDER BY updated_at DESC LIMIT ?",
+                    (*[t.lower() for t in terms], limit),
+                ).fetchall()
+        return [
+            {
+                "candidate_id": row[0],
+                "filename": row[1],
+                "skills": json.loads(row[2]),
+                "last_seen": row[3],
+                "snippet": row[4],
+                "relevance": round(-row[5], 4),
+            }
+            for row in rows
+        ]
+
+    def pool(self, terms: List[str], limit: int) -> List[Tuple[int, str, str]]:
+        """(id, filename, text) of up to `limit` candidates most relevant to any of `terms`."""
+        with self._lock:
+            if self.fts and terms:
+                return self._conn.execute(
+                    "SELECT c.id, c.filename, c.text FROM candidates_fts JOIN candidates c ON c.id = candidates_fts.rowid "
+                    "WHERE candidates_fts MATCH ? ORDER BY bm25(candidates_fts) LIMIT ?",
+                    (" OR ".join(_fts_phrase(t) for t in terms), limit),
+                ).fetchall()
+            return self._conn.execute(
+                "SELECT id, filename, text FROM candidates ORDER BY updated_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+
+    def get(self, candidate_id: int) -> Optional[Dict[str, Any]]:
+        """A stored candidate with its text, skills and match history (newest first)."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, filename, text, skills, created_at, updated_at FROM candidates WHERE id = ?", (candidate_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            history = self._conn.execute(
+                "SELECT jd_hash, job_title, score, remarks, is_selected, created_at FROM match_history "
+                "WHERE candidate_id = ? ORDER BY created_at DESC",
+                (candidate_id,),
+            ).fetchall()
+        return {
+            "candidate_id": row[0],
+            "filename": row[1],
+            "text": row[2],
+            "skills": json.loads(row[3]),
+            "created_at": row[4],
+            "last_seen": row[5],
+            "matches": [
+                {"jd_hash": h[0], "job_title": h[1], "score": h[2], "remarks": h[3], "is_selected": bool(h[4]), "matched_at": h[5]}
+                for h in history
+            ],
+        }
+
+    def close(self) -> None:
+        self._conn.close()
+
+_candidate_store: Optional[CandidateStore] = None
+
+def get_candidate_store() -> Optional[CandidateStore]:
+    """The process-wide candidate store, or None when CANDIDATE_STORE_ENABLED is off."""
+    global _candidate_store
+    if not CANDIDATE_STORE_ENABLED:
+        return None
+    if _candidate_store is None:
+        _candidate_store = CandidateStore(CANDIDATES_DB_PATH)
+    return _candidate_store
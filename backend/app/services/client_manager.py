@@ -0,0 +1,110 @@
+import logging
+import os
+import threading
+import time
+from typing import Any, Optional
+from .lazy_imports import load_module, module_available
+
+logger = logging.getLogger(__name__)
+
+AI_API_KEY_ENV = "GEMINI_API_KEY"
+
+# Connection pool shared by every AI call in this process
+AI_MAX_CONNECTIONS = int(os.getenv("AI_MAX_CONNECTIONS", "20"))
+AI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("AI_MAX_KEEPALIVE_CONNECTIONS", "10"))
+AI_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("AI_KEEPALIVE_EXPIRY_SECONDS", "60"))
+
+# Backoff between attempts to build the client after a failure
+INIT_BACKOFF_BASE_SECONDS = 1.0
+INIT_BACKOFF_MAX_SECONDS = 60.0
+
+# The SDK itself is imported when the first client is built (see lazy_imports.py)
+AI_SERVICE_AVAILABLE = module_available("genai")
+if not AI_SERVICE_AVAILABLE:
+    logger.error("Google GenAI SDK (google-genai) is not installed")
+
+class AIClientManager:
+    """
+    Process-wide owner of the AI SDK client.
+    The client (and its pooled keep-alive HTTP connections) is built lazily on first
+    use and reused by every call. A failed build is retried with exponential backoff
+    instead of on every request; `aclose` releases the connections on shutdown.
+    """
+
+    def __init__(self):
+        self._client: Optional[Any] = None
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._retry_at = 0.0
+        self.last_error: Optional[str] = None
+
+    @property
+    def healthy(self) -> bool:
+        return self._client is not None
+
+    def status(self) -> str:
+        """Client state for health checks: ready, backoff (waiting to retry a failed build) or idle."""
+        if self._client is not None:
+            return "ready"
+        if time.monotonic() < self._retry_at:
+            return "backoff"
+        return "idle"
+
+    def _build(self) -> Any:
+        import httpx
+        genai = load_module("genai")
+        if genai is None:
+            raise RuntimeError("google-genai failed to import")
+        limits = httpx.Limits(
+            max_connections=AI_MAX_CONNECTIONS,
+            max_keepalive_connections=AI_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=AI_KEEPALIVE_EXPIRY_SECONDS,
+        )
+        # The client gets the API key from the environment variable automatically
+        return genai.Client(http_options={
+            "client_args": {"limits": limits},
+            "async_client_args": {"limits": limits},
+        })
+
+    def get(self) -> Optional[Any]:
+        """Return the shared client, or None if the SDK or API key is unavailable."""
+        if self._client is not None:
+            return self._client
+        if not AI_SERVICE_AVAILABLE:
+            logger.warning("AI service not available - SDK not installed")
+            return None
+        if not os.getenv(AI_API_KEY_ENV, ""):
+            logger.warning(f"{AI_API_KEY_ENV} not set in environment")
+            return None
+        with self._lock:
+            if self._client is not None:
+                return self._client
+            if time.monotonic() < self._retry_at:
+                return None
+            try:
+                self._client = self._build()
+            except Exception as e:
+                self._failures += 1
+                delay = min(INIT_BACKOFF_MAX_SECONDS, INIT_BACKOFF_BASE_SECONDS * 2 ** (self._failures - 1))
+                self._retry_at = time.monotonic() + delay
+                self.last_error = str(e)
+                logger.error(f"Failed to initialize AI client: {e} (retrying in {delay:.0f}s)")
+                return None
+            self._failures = 0
+            self.last_error = None
+            logger.info("AI client initialized successfully")
+            return self._client
+
+    async def aclose(self) -> None:
+        with self._lock:
+            client, self._client = self._client, None
+        if client is None:
+            return
+        try:
+            await client.aio.aclose()
+            client.close()
+            logger.info("AI client closed")
+        except Exception as e:
+            logger.warning(f"Error while closing AI client: {e}")
+
+client_manager = AIClientManager()
@@ -1,48 +1,342 @@
+import asyncio
+import hashlib
 import io
-from typing import Optional
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import weakref
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import BinaryIO, List, Optional, Union
 from fastapi import UploadFile
+from .lazy_imports import load_module, prewarm_modules
+from .cache import DiskBlobCache, LRUCache, TieredCache, content_hash
+from .metrics import extract_seconds, record_cache_lookup, timed
+from .scheduler import run_bounded
 
-async def _read_bytes(upload: UploadFile) -> bytes:
-    return await upload.read()
+logger = logging.getLogger(__name__)
 
-def _extract_pdf(data: bytes) -> str:
+# Extraction limits
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+MAX_PDF_PAGES = int(os.getenv("MAX_PDF_PAGES", "20"))
+EXTRACT_TIMEOUT_SECONDS = float(os.getenv("EXTRACT_TIMEOUT_SECONDS", "20"))
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Extracted-text cache, keyed by a hash of the uploaded bytes
+EXTRACT_CACHE_MAX_BYTES = int(os.getenv("EXTRACT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+EXTRACT_CACHE_DIR = os.getenv("EXTRACT_CACHE_DIR", "")  # empty = memory tier only
+EXTRACT_CACHE_DISK_MAX_BYTES = int(os.getenv("EXTRACT_CACHE_DISK_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# Streaming ingestion: uploads are read in chunks and hashed on the way in; anything
+# bigger than UPLOAD_SPOOL_MAX_BYTES is spooled to disk and parsed straight from there
+UPLOAD_CHUNK_BYTES = 64 * 1024
+UPLOAD_SPOOL_MAX_BYTES = int(os.getenv("UPLOAD_SPOOL_MAX_BYTES", str(256 * 1024)))
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR", "") or None  # None = system temp directory
+# Uploads of one request ingested and extracted at the same time (bounds memory for big batches)
+INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", str(max(1, EXTRACT_WORKERS) * 2)))
+
+class ExtractionError(Exception):
+    """Raised when an uploaded document cannot be turned into text."""
+
+    def __init__(self, filename: str, message: str):
+        super().__init__(f"{filename}: {message}")
+        self.filename = filename
+
+class DocumentTooLargeError(ExtractionError):
+    """Raised when an upload exceeds MAX_UPLOAD_BYTES."""
+
+def _too_large(filename: str) -> DocumentTooLargeError:
+    return DocumentTooLargeError(filename or "upload", f"file exceeds {MAX_UPLOAD_BYTES} bytes")
+
+@dataclass
+class IngestedFile:
+    """
+    An upload read to the end, with its SHA-256 and size. Small files are kept in
+    memory (`data`), larger ones in a spool file (`path`) that close() removes.
+    """
+    filename: str
+    digest: str
+    size: int
+    data: Optional[bytes] = None
+    path: Optional[str] = None
+
+    @property
+    def source(self) -> Union[bytes, str]:
+        """What the extraction worker gets: the bytes, or the spool path it opens itself."""
+        return self.path if self.path is not None else self.data
+
+    def read_bytes(self) -> bytes:
+        if self.path is None:
+            return self.data
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def close(self) -> None:
+        if self.path is not None:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+            self.path = None
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+# Pools killed because a document timed out; their other documents are re-submitted
+_killed_pools: "weakref.WeakSet[ProcessPoolExecutor]" = weakref.WeakSet()
+# Documents handed to the pool at once (one per worker), per event loop, so the
+# timeout clock of each starts when a worker is free instead of while it queues
+_dispatch_slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+# Per pool: one start-up call per worker (spawn and parser imports), awaited before
+# the first document's timeout starts
+_pool_started: "weakref.WeakKeyDictionary[ProcessPoolExecutor, List[Future]]" = weakref.WeakKeyDictionary()
+_text_cache: Optional[TieredCache] = None
+
+def get_extraction_cache() -> TieredCache:
+    global _text_cache
+    if _text_cache is None:
+        disk = DiskBlobCache(EXTRACT_CACHE_DIR, EXTRACT_CACHE_DISK_MAX_BYTES) if EXTRACT_CACHE_DIR else None
+        _text_cache = TieredCache(LRUCache(EXTRACT_CACHE_MAX_BYTES), disk)
+    return _text_cache
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn avoids forking a process that already runs the event loop and SDK threads
+            _pool = ProcessPoolExecutor(max_workers=max(1, EXTRACT_WORKERS), mp_context=multiprocessing.get_context("spawn"))
+            _pool_started[_pool] = [_pool.submit(_prewarm_worker, list(PARSER_MODULES)) for _ in range(max(1, EXTRACT_WORKERS))]
+            logger.info(f"Started extraction pool with {max(1, EXTRACT_WORKERS)} workers")
+        return _pool
+
+async def _wait_started(pool: ProcessPoolExecutor) -> None:
+    """Wait until every worker of `pool` has started and imported the parsers."""
+    await asyncio.gather(*(asyncio.wrap_future(f) for f in _pool_started.get(pool, [])))
+
+def _reset_pool(pool: ProcessPoolExecutor) -> None:
+    """
+    Kill the worker processes (e.g. one is stuck on a pathological file) and start
+    fresh on next use. Only the first caller for a pool does this; documents still
+    running in it fail with BrokenProcessPool and are re-submitted by _run_in_pool.
+    """
+    global _pool
+    with _pool_lock:
+        if pool in _killed_pools:
+            return
+        _killed_pools.add(pool)
+        if _pool is pool:
+            _pool = None
+    # _processes is None once the pool has shut down
+    for process in list((getattr(pool, "_processes", None) or {}).values()):
+        process.terminate()
+    pool.shutdown(wait=False)
+
+def _dispatch_slot() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    slots = _dispatch_slots.get(loop)
+    if slots is None:
+        slots = _dispatch_slots[loop] = asyncio.Semaphore(max(1, EXTRACT_WORKERS))
+    return slots
+
+def shutdown_extraction_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+async def read_upload_bytes(upload: UploadFile) -> bytes:
+    """The whole upload in memory (for callers that store it); oversized files are rejected before reading."""
+    if upload.size is not None and upload.size > MAX_UPLOAD_BYTES:
+        raise _too_large(upload.filename)
+    data = await upload.read(MAX_UPLOAD_BYTES + 1)
+    if len(data) > MAX_UPLOAD_BYTES:
+        raise _too_large(upload.filename)
+    return data
+
+async def ingest_upload(upload: UploadFile) -> IngestedFile:
+    """
+    Read `upload` in UPLOAD_CHUNK_BYTES chunks, hashing as it goes. Once it passes
+    UPLOAD_SPOOL_MAX_BYTES the content moves to a temporary file, so memory per upload
+    stays bounded. Raises DocumentTooLargeError as soon as the declared or the read
+    size passes MAX_UPLOAD_BYTES, without reading the rest.
+    """
+    filename = upload.filename or ""
+    if upload.size is not None and upload.size > MAX_UPLOAD_BYTES:
+        raise _too_large(filename)
+    digest = hashlib.sha256()
+    buffer = bytearray()
+    spool = None
+    size = 0
     try:
-        from pypdf import PdfReader
-    except Exception:
+        while True:
+            chunk = await upload.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > MAX_UPLOAD_BYTES:
+                raise _too_large(filename)
+            digest.update(chunk)
+            if spool is None and size > UPLOAD_SPOOL_MAX_BYTES:
+                # The extension is kept for parsers that go by it (textract)
+                spool = tempfile.NamedTemporaryFile(
+                    prefix="upload-", suffix=os.path.splitext(filename)[1], dir=UPLOAD_SPOOL_DIR, delete=False
+                )
+                spool.write(buffer)
+                buffer = bytearray()
+            if spool is not None:
+                spool.write(chunk)
+            else:
+                buffer += chunk
+    except BaseException:
+        if spool is not None:
+            spool.close()
+            os.unlink(spool.name)
+        raise
+    if spool is None:
+        return IngestedFile(filename, digest.hexdigest(), size, data=bytes(buffer))
+    spool.close()
+    return IngestedFile(filename, digest.hexdigest(), size, path=spool.name)
+
+# Parser modules; they are only imported inside the extraction worker processes
+PARSER_MODULES = ("pypdf", "docx", "textract")
+
+def _open_source(source: Union[bytes, str]) -> BinaryIO:
+    """A spooled upload is read straight from its file; BytesIO over bytes shares their buffer."""
+    return open(source, "rb") if isinstance(source, str) else io.BytesIO(source)
+
+def _extract_pdf(source: Union[bytes, str], max_pages: int = MAX_PDF_PAGES) -> str:
+    pypdf = load_module("pypdf")
+    if pypdf is None:
         return ""
-    reader = PdfReader(io.BytesIO(data))
-    parts = []
-    for page in reader.pages:
-        text = page.extract_text() or ""
-        parts.append(text)
-    return "\n".join(parts)
-
-def _extract_docx(data: bytes) -> str:
-    try:
-        import docx
-    except Exception:
+    with _open_source(source) as f:
+        reader = pypdf.PdfReader(f)
+        parts = []
+        for page in reader.pages[:max_pages]:
+            text = page.extract_text() or ""
+            parts.append(text)
+    # Form feeds mark page breaks so repeated page headers and footers can be told apart
+    return "\f".join(parts)
+
+def _extract_docx(source: Union[bytes, str]) -> str:
+    docx = load_module("docx")
+    if docx is None:
         return ""
-    d = docx.Document(io.BytesIO(data))
+    with _open_source(source) as f:
+        d = docx.Document(f)
     return "\n".join(p.text for p in d.paragraphs)
 
-def _extract_doc(data: bytes) -> str:
-    try:
-        import textract
-    except Exception:
+def _extract_doc(source: Union[bytes, str]) -> str:
+    textract = load_module("textract")
+    if textract is None:
         return ""
     try:
-        text = textract.process(io.BytesIO(data), extension='doc')
+        text = textract.process(source if isinstance(source, str) else io.BytesIO(source), extension='doc')
         return text.decode('utf-8', errors='ignore')
     except Exception:
         return ""
 
+def _extract_in_worker(kind: str, source: Union[bytes, str], max_pages: int) -> str:
+    """Entry point executed inside the worker processes; `source` is the document's bytes or a file path."""
+    if kind == "pdf":
+        return _extract_pdf(source, max_pages)
+    if kind == "docx":
+        return _extract_docx(source)
+    return _extract_doc(source)
+
+def _prewarm_worker(modules: List[str]) -> None:
+    """Executed inside a worker process: import the parsers before the first document arrives."""
+    prewarm_modules(modules)
+
+async def prewarm_extraction_pool(modules: List[str]) -> None:
+    """Start every extraction worker and import `modules` (PARSER_MODULES names) in each."""
+    loop = asyncio.get_running_loop()
+    pool = _get_pool()
+    # One task per worker; while all are busy the pool keeps spawning until it is full
+    await asyncio.gather(*(
+        loop.run_in_executor(pool, _prewarm_worker, modules) for _ in range(max(1, EXTRACT_WORKERS))
+    ))
+    logger.info(f"Extraction workers pre-warmed with {', '.join(modules)}")
+
+def _document_kind(filename: str) -> str:
+    filename = filename.lower()
+    for kind in ("pdf", "docx", "doc"):
+        if filename.endswith(f".{kind}"):
+            return kind
+    return "text"
+
+async def _run_in_pool(filename: str, kind: str, source: Union[bytes, str]) -> str:
+    """
+    Parse the document in a worker process. It is only handed over once the pool has
+    started and a worker is free, so EXTRACT_TIMEOUT_SECONDS bounds its own parsing
+    time, not worker start-up or time spent queued behind other documents. A timeout kills the pool; other documents that
+    were running in it are re-submitted to the new one.
+    """
+    loop = asyncio.get_running_loop()
+    crashes = 0
+    while True:
+        async with _dispatch_slot():
+            pool = _get_pool()
+            try:
+                await _wait_started(pool)
+                future = loop.run_in_executor(pool, _extract_in_worker, kind, source, MAX_PDF_PAGES)
+                return await asyncio.wait_for(future, timeout=EXTRACT_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                logger.error(f"Extraction of {filename} exceeded {EXTRACT_TIMEOUT_SECONDS}s, restarting worker pool")
+                _reset_pool(pool)
+                raise ExtractionError(filename, f"extraction timed out after {EXTRACT_TIMEOUT_SECONDS:g}s")
+            except (BrokenProcessPool, asyncio.CancelledError) as e:
+                if isinstance(e, asyncio.CancelledError) and asyncio.current_task().cancelling():
+                    raise
+                # The pool died under this document: killed for another document's
+                # timeout (re-submit), or crashed (re-submit once)
+                if pool not in _killed_pools:
+                    crashes += 1
+                    _reset_pool(pool)
+                if crashes > 1:
+                    raise ExtractionError(filename, "extraction worker crashed")
+                logger.warning(f"Extraction pool restarted while processing {filename}, retrying")
+            except Exception as e:
+                raise ExtractionError(filename, f"could not parse {kind.upper()} file ({e})")
+
 async def extract_text_from_upload(upload: UploadFile) -> str:
-    filename = (upload.filename or "").lower()
-    data = await _read_bytes(upload)
-    if filename.endswith(".pdf"):
-        return _extract_pdf(data)
-    if filename.endswith(".docx"):
-        return _extract_docx(data)
-    if filename.endswith(".doc"):
-        return _extract_doc(data)
-    return data.decode("utf-8", errors="ignore")
+    file = await ingest_upload(upload)
+    try:
+        return await extract_ingested(file)
+    finally:
+        file.close()
+
+async def extract_text_from_bytes(filename: str, data: bytes) -> str:
+    """Extract text from an already-read document; the file type comes from `filename`."""
+    if len(data) > MAX_UPLOAD_BYTES:
+        raise _too_large(filename)
+    return await extract_ingested(IngestedFile(filename, content_hash(data), len(data), data=data))
+
+async def extract_ingested(file: IngestedFile) -> str:
+    """Extract text from an ingested upload (cached by content hash); the file type comes from its filename."""
+    kind = _document_kind(file.filename)
+    if kind == "text":
+        return file.read_bytes().decode("utf-8", errors="ignore")
+    
+    cache = get_extraction_cache()
+    key = f"{file.digest}:{kind}:{MAX_PDF_PAGES}"
+    start = time.perf_counter()
+    text = await cache.get_async(key)
+    record_cache_lookup("extract", text is not None, time.perf_counter() - start)
+    if text is not None:
+        logger.info(f"Extraction cache hit for {file.filename}")
+        return text
+    with timed(extract_seconds, kind=kind):
+        text = await _run_in_pool(file.filename, kind, file.source)
+    await cache.set_async(key, text)
+    return text
+
+async def extract_texts_from_uploads(uploads: List[UploadFile]) -> List[str]:
+    """
+    Extract all uploads in parallel, INGEST_CONCURRENCY at a time so memory does not
+    grow with the batch size; results keep the order of `uploads`.
+    """
+    return await run_bounded([lambda u=u: extract_text_from_upload(u) for u in uploads], INGEST_CONCURRENCY)
@@ -0,0 +1,132 @@
+import logging
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Tuple
+from ..prompts.resume_matching import RESUME_MATCHING_SYSTEM, RESUME_MATCHING_USER_TEMPLATE
+from ..prompts.email_generation import (
+    INTERVIEW_EMAIL_SYSTEM, INTERVIEW_EMAIL_USER_TEMPLATE,
+    REJECTION_EMAIL_SYSTEM, REJECTION_EMAIL_USER_TEMPLATE
+)
+from .cache import content_hash
+from .prompt_budget import (
+    estimate_tokens, fit_text,
+    PROMPT_TOKENS_MATCH_JD, PROMPT_TOKENS_INTERVIEW_EMAIL, PROMPT_TOKENS_REJECTION_EMAIL,
+    INTERVIEW_EMAIL_WEIGHTS, REJECTION_EMAIL_WEIGHTS
+)
+from .skills import extract_skills
+
+logger = logging.getLogger(__name__)
+
+# Number of distinct JDs whose profiles are kept in memory
+JD_PROFILE_CACHE_SIZE = 32
+
+def extract_jd_metadata(jd_text: str) -> dict:
+    lines = jd_text.split('\n')
+    job_title = "Position"
+    company_name = "Our Company"
+
+    for i, line in enumerate(lines[:15]):
+        line_clean = line.strip().replace('#', '').strip()
+
+        if i == 0 and line_clean and len(line_clean) < 100:
+            job_title = line_clean
+
+        if any(keyword in line_clean.lower() for keyword in ['company:', 'at ', 'join ']):
+            words = line_clean.split()
+            for j, word in enumerate(words):
+                if word.lower() in ['at', 'join', 'company:'] and j + 1 < len(words):
+                    company_name = ' '.join(words[j+1:j+4]).strip('.,')
+                    break
+
+        if '**' in line and i < 5:
+            match = re.search(r'\*\*([^*]+)\*\*', line)
+            if match:
+                potential_company = match.group(1).strip()
+                if len(potential_company) < 50 and not any(x in potential_company.lower() for x in ['overview', 'description', 'responsibilities']):
+                    company_name = potential_company
+
+    return {"job_title": job_title, "company_name": company_name}
+
+@dataclass(frozen=True)
+class JDProfile:
+    """
+    Everything derived from a JD that the matching and email stages need, computed
+    once per distinct JD: metadata, canonical skills, the JD text trimmed to each
+    call type's budget and the matching prompt around the candidate list.
+    """
+    text: str
+    digest: str
+    job_title: str
+    company_name: str
+    skills: List[str]
+    match_text: str
+    interview_text: str
+    rejection_text: str
+    match_prompt_prefix: str
+    match_prompt_suffix: str
+    interview_resume_tokens: int
+    rejection_resume_tokens: int
+
+    def email_parts(self, selected: bool) -> Tuple[str, int]:
+        """JD text for an interview (`selected`) or rejection email prompt, and the tokens left for the resume."""
+        if selected:
+            return self.interview_text, self.interview_resume_tokens
+        return self.rejection_text, self.rejection_resume_tokens
+
+    def match_prompt(self, candidates_text: str) -> str:
+        return f"{self.match_prompt_prefix}{candidates_text}{self.match_prompt_suffix}"
+
+def _email_jd(clean_jd: str, fixed: str, budget: int, weights: Tuple[float, float]) -> Tuple[str, int]:
+    available = max(0, budget - estimate_tokens(fixed))
+    jd = fit_text(clean_jd, int(available * weights[0] / sum(weights)))
+    return jd, max(0, available - estimate_tokens(jd))
+
+def build_jd_profile(jd_text: str) -> JDProfile:
+    metadata = extract_jd_metadata(jd_text)
+    skills = extract_skills(jd_text)
+    match_text = fit_text(jd_text, PROMPT_TOKENS_MATCH_JD)
+    head, tail = RESUME_MATCHING_USER_TEMPLATE.split("{candidates}", 1)
+    clean_jd = jd_text.replace("*", "").replace("#", "")
+    interview_text, interview_tokens = _email_jd(
+        clean_jd, INTERVIEW_EMAIL_SYSTEM + INTERVIEW_EMAIL_USER_TEMPLATE,
+        PROMPT_TOKENS_INTERVIEW_EMAIL, INTERVIEW_EMAIL_WEIGHTS,
+    )
+    rejection_text, rejection_tokens = _email_jd(
+        clean_jd, REJECTION_EMAIL_SYSTEM + REJECTION_EMAIL_USER_TEMPLATE,
+        PROMPT_TOKENS_REJECTION_EMAIL, REJECTION_EMAIL_WEIGHTS,
+    )
+    return JDProfile(
+        text=jd_text,
+        digest=content_hash(jd_text.encode("utf-8")),
+        job_title=metadata["job_title"].replace("*", "").strip(),
+        company_name=metadata["company_name"].replace("*", "").strip(),
+        skills=skills,
+        match_text=match_text,
+        interview_text=interview_text,
+        rejection_text=rejection_text,
+        match_prompt_prefix=f"{RESUME_MATCHING_SYSTEM}\n\n" + head.format(jd_full_content=match_text, jd_skills=skills),
+        match_prompt_suffix=tail.format(),
+        interview_resume_tokens=interview_tokens,
+        rejection_resume_tokens=rejection_tokens,
+    )
+
+_profiles: "OrderedDict[str, JDProfile]" = OrderedDict()
+_profiles_lock = threading.Lock()
+
+def get_jd_profile(jd_text: str) -> JDProfile:
+    """Profile for `jd_text`, built on first use and cached by the JD's content hash."""
+    key = content_hash(jd_text.encode("utf-8"))
+    with _profiles_lock:
+        profile = _profiles.get(key)
+        if profile is not None:
+            _profiles.move_to_end(key)
+            return profile
+    profile = build_jd_profile(jd_text)
+    with _profiles_lock:
+        _profiles[key] = profile
+        while len(_profiles) > JD_PROFILE_CACHE_SIZE:
+            _profiles.popitem(last=False)
+    logger.info(f"Built JD profile for '{profile.job_title}' ({len(profile.skills)} skills)")
+    return profile
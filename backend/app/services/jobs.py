@@ -0,0 +1,418 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from .extract import ExtractionError, extract_text_from_bytes
+from .pipeline import match_texts
+
+logger = logging.getLogger(__name__)
+
+# Background screening jobs
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "jobs.sqlite3")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BACKOFF_SECONDS = float(os.getenv("JOB_RETRY_BACKOFF_SECONDS", "30"))
+# A running job is owned by one worker for this long, renewed while it runs; jobs
+# whose owner stopped renewing (crashed or killed) are picked up by another worker
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+# Finished jobs and their events are deleted this long after they finish
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", str(7 * 24 * 3600)))
+JOB_POLL_SECONDS = 1.0
+JOB_PURGE_INTERVAL_SECONDS = 3600.0
+# Failures that a retry cannot fix (unreadable or oversized documents)
+PERMANENT_ERRORS = (ExtractionError,)
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_SUCCEEDED = "succeeded"
+STATUS_FAILED = "failed"
+
+class JobStore:
+    """
+    SQLite-backed persistence for jobs, their uploaded files and progress events.
+    Uploads are stored as blobs so a job can be (re)processed after a restart, and
+    deleted once the job succeeds or fails for good. Running jobs carry an owner and
+    a lease expiry, so several processes can share the file. The methods block;
+    async callers run them in a thread.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                jd_text TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                run_after REAL NOT NULL DEFAULT 0,
+                error TEXT,
+                result TEXT,
+                owner TEXT,
+                lease_until REAL,
+                resumes INTEGER,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, run_after);
+            CREATE TABLE IF NOT EXISTS job_files (
+                job_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                role TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                data BLOB NOT NULL,
+                PRIMARY KEY (job_id, position)
+            );
+            CREATE TABLE IF NOT EXISTS job_events (
+                job_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                event TEXT NOT NULL,
+                PRIMARY KEY (job_id, seq)
+            );
+            """
+        )
+        # Files created before leases existed
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column, kind in (("owner", "TEXT"), ("lease_until", "REAL"), ("resumes", "INTEGER")):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def create(self, jd_text: Optional[str], jd_file: Optional[Tuple[str, bytes]], resumes: List[Tuple[str, bytes]]) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        files = ([("jd", *jd_file)] if jd_file else []) + [("resume", name, data) for name, data in resumes]
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, jd_text, resumes, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, STATUS_QUEUED, jd_text, len(resumes), now, now),
+            )
+            conn.executemany(
+                "INSERT INTO job_files (job_id, position, role, filename, data) VALUES (?, ?, ?, ?, ?)",
+                [(job_id, i, role, name, data) for i, (role, name, data) in enumerate(files)],
+            )
+        return job_id
+
+    def claim_next(self, owner: str) -> Optional[str]:
+        """
+        Move the oldest runnable job to running under `owner` and return its id: a
+        queued job past its run_after, or a running one whose lease expired. The
+        UPDATE re-checks that condition, so a job is claimed by one worker only.
+        """
+        runnable = "((status = ? AND run_after <= ?) OR (status = ? AND COALESCE(lease_until, 0) < ?))"
+        with self._lock:
+            for _ in range(3):
+                now = time.time()
+                args = (STATUS_QUEUED, now, STATUS_RUNNING, now)
+                row = self._conn.execute(
+                    f"SELECT id FROM jobs WHERE {runnable} ORDER BY created_at LIMIT 1", args
+                ).fetchone()
+                if row is None:
+                    return None
+                cur = self._conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, owner = ?, lease_until = ?, updated_at = ? "
+                    f"WHERE id = ? AND {runnable}",
+                    (STATUS_RUNNING, owner, now + JOB_LEASE_SECONDS, now, row[0], *args),
+                )
+                if cur.rowcount == 1:
+                    return row[0]
+                # Another worker claimed it between the SELECT and the UPDATE
+        return None
+
+    def renew(self, job_id: str, owner: str) -> bool:
+        """Extend `owner`'s lease on a running job; False if it no longer holds it."""
+        now = time.time()
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE jobs SET lease_until = ?, updated_at = ? WHERE id = ? AND owner = ? AND status = ?",
+                (now + JOB_LEASE_SECONDS, now, job_id, owner, STATUS_RUNNING),
+            )
+            return cur.rowcount == 1
+
+    def jd_text(self, job_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT jd_text FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def files(self, job_id: str) -> List[Tuple[str, str, bytes]]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT role, filename, data FROM job_files WHERE job_id = ? ORDER BY position", (job_id,)
+            ).fetchall()
+
+    def finish(self, job_id: str, owner: str, result: Dict[str, Any]) -> None:
+        """Store the result and delete the job's uploads."""
+        with self._transaction() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = NULL, lease_until = NULL, updated_at = ? "
+                "WHERE id = ? AND owner = ?",
+                (STATUS_SUCCEEDED, json.dumps(result), time.time(), job_id, owner),
+            )
+            if cur.rowcount:
+                conn.execute("DELETE FROM job_files WHERE job_id = ?", (job_id,))
+
+    def fail(self, job_id: str, owner: str, error: str, retry_at: Optional[float]) -> None:
+        """Record a failed attempt; the job is queued again if `retry_at` is given, else its uploads are deleted."""
+        status = STATUS_QUEUED if retry_at is not None else STATUS_FAILED
+        with self._transaction() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, run_after = ?, lease_until = NULL, updated_at = ? "
+                "WHERE id = ? AND owner = ?",
+                (status, error, retry_at or 0, time.time(), job_id, owner),
+            )
+            if cur.rowcount and retry_at is None:
+                conn.execute("DELETE FROM job_files WHERE job_id = ?", (job_id,))
+
+    def add_events(self, job_id: str, events: List[Dict[str, Any]]) -> None:
+        """Append `events` to the job's progress, in order, in one transaction."""
+        if not events:
+            return
+        with self._transaction() as conn:
+            last = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM job_events WHERE job_id = ?", (job_id,)).fetchone()[0]
+            conn.executemany(
+                "INSERT INTO job_events (job_id, seq, event) VALUES (?, ?, ?)",
+                [(job_id, last + i, json.dumps(event)) for i, event in enumerate(events, start=1)],
+            )
+
+    def add_event(self, job_id: str, event: Dict[str, Any]) -> None:
+        self.add_events(job_id, [event])
+
+    def purge_finished(self, older_than: float) -> int:
+        """Delete jobs that finished before `older_than` (epoch seconds), with their events and files."""
+        with self._transaction() as conn:
+            ids = [row[0] for row in conn.execute(
+                "SELECT id FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (STATUS_SUCCEEDED, STATUS_FAILED, older_than),
+            ).fetchall()]
+            for table, column in (("job_events", "job_id"), ("job_files", "job_id"), ("jobs", "id")):
+                conn.executemany(f"DELETE FROM {table} WHERE {column} = ?", [(i,) for i in ids])
+        return len(ids)
+
+    def events(self, job_id: str, after: int = 0) -> List[Tuple[int, Dict[str, Any]]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, event FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq", (job_id, after)
+            ).fetchall()
+        return [(seq, json.loads(event)) for seq, event in rows]
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, status, attempts, error, result, created_at, updated_at FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            # Progress counts only the events of the current attempt
+            start = self._conn.execute(
+                "SELECT COALESCE(MAX(seq), 0) FROM job_events WHERE job_id = ? AND event LIKE '{\"event\": \"attempt\"%'",
+                (job_id,),
+            ).fetchone()[0]
+            counts = self._conn.execute(
+                "SELECT "
+                "(SELECT COALESCE(resumes, (SELECT COUNT(*) FROM job_files WHERE job_id = jobs.id AND role = 'resume')) "
+                "FROM jobs WHERE id = ?), "
+                "(SELECT COUNT(*) FROM job_events WHERE job_id = ? AND seq > ? AND event LIKE '{\"event\": \"score\"%'), "
+                "(SELECT COUNT(*) FROM job_events WHERE job_id = ? AND seq > ? AND event LIKE '{\"event\": \"email\"%')",
+                (job_id, job_id, start, job_id, start),
+            ).fetchone()
+        return {
+            "job_id": row[0],
+            "status": row[1],
+            "attempts": row[2],
+            "error": row[3],
+            "result": json.loads(row[4]) if row[4] else None,
+            "created_at": row[5],
+            "updated_at": row[6],
+            "progress": {"resumes": counts[0], "scored": counts[1], "emailed": counts[2]},
+        }
+
+    def close(self) -> None:
+        self._conn.close()
+
+class _EventWriter:
+    """Appends a job's progress events from a background task: in order, batched, off the event loop."""
+
+    def __init__(self, store: JobStore, job_id: str):
+        self.store = store
+        self.job_id = job_id
+        self._pending: List[Dict[str, Any]] = []
+        self._wakeup = asyncio.Event()
+        self._closed = False
+        self._task = asyncio.create_task(self._run())
+
+    def add(self, event: Dict[str, Any]) -> None:
+        self._pending.append(event)
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            batch, self._pending = self._pending, []
+            try:
+                await asyncio.to_thread(self.store.add_events, self.job_id, batch)
+            except Exception as e:
+                logger.error(f"Failed to store {len(batch)} events of job {self.job_id}: {e}")
+            if self._closed and not self._pending:
+                return
+
+    async def close(self) -> None:
+        """Write the remaining events and stop."""
+        self._closed = True
+        self._wakeup.set()
+        await self._task
+
+class JobQueue:
+    """
+    Runs queued jobs on JOB_WORKERS background tasks.
+    A job that raises, or whose result has resumes the model failed to score, is
+    retried up to JOB_MAX_ATTEMPTS times with exponential backoff; documents that
+    cannot be extracted (PERMANENT_ERRORS) fail at once. Scores that did succeed are
+    memoized by ai_match_resumes, so a retry only re-scores the failures.
+    Running jobs are leased to this queue and the lease is renewed while they run;
+    jobs of a process that died are taken over once their lease expires.
+    """
+
+    def __init__(self, store: JobStore, workers: int = JOB_WORKERS):
+        self.store = store
+        self.workers = max(1, workers)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    async def start(self) -> None:
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(n)) for n in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._purge()))
+        logger.info(f"Started {self.workers} job workers as {self.owner}")
+
+    async def stop(self) -> None:
+        # Jobs cancelled mid-run keep their lease and are taken over once it expires
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, jd_text: Optional[str], jd_file: Optional[Tuple[str, bytes]], resumes: List[Tuple[str, bytes]]) -> str:
+        job_id = await asyncio.to_thread(self.store.create, jd_text, jd_file, resumes)
+        logger.info(f"Queued job {job_id} with {len(resumes)} resumes")
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job_id
+
+    async def _worker(self, n: int) -> None:
+        while True:
+            try:
+                job_id = await asyncio.to_thread(self.store.claim_next, self.owner)
+                if job_id is not None:
+                    await self._run(job_id)
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job worker {n} failed: {e}", exc_info=True)
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=JOB_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _purge(self) -> None:
+        """Delete finished jobs older than JOB_RETENTION_SECONDS, every JOB_PURGE_INTERVAL_SECONDS."""
+        while True:
+            try:
+                purged = await asyncio.to_thread(self.store.purge_finished, time.time() - JOB_RETENTION_SECONDS)
+                if purged:
+                    logger.info(f"Purged {purged} finished jobs")
+            except Exception as e:
+                logger.error(f"Purging finished jobs failed: {e}")
+            await asyncio.sleep(JOB_PURGE_INTERVAL_SECONDS)
+
+    async def _heartbeat(self, job_id: str) -> None:
+        while True:
+            await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+            try:
+                if not await asyncio.to_thread(self.store.renew, job_id, self.owner):
+                    logger.warning(f"Lost the lease on job {job_id}; another worker may take it over")
+                    return
+            except Exception as e:
+                logger.warning(f"Failed to renew the lease on job {job_id}: {e}")
+
+    async def _run(self, job_id: str) -> None:
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        events = _EventWriter(self.store, job_id)
+        try:
+            await self._attempt(job_id, events)
+        finally:
+            heartbeat.cancel()
+            await events.close()
+
+    async def _attempt(self, job_id: str, events: _EventWriter) -> None:
+        job = await asyncio.to_thread(self.store.get, job_id)
+        logger.info(f"Worker processing job {job_id} (attempt {job['attempts']})")
+        events.add({"event": "attempt", "attempt": job["attempts"]})
+        try:
+            jd_text = await asyncio.to_thread(self.store.jd_text, job_id)
+            files = await asyncio.to_thread(self.store.files, job_id)
+            extracted = await asyncio.gather(*(extract_text_from_bytes(name, data) for _, name, data in files))
+            filenames, texts = [], []
+            for (role, name, _), text in zip(files, extracted):
+                if role == "jd":
+                    jd_text = text
+                else:
+                    filenames.append(name)
+                    texts.append(text)
+            events.add({
+                "event": "extracted",
+                "jd_chars": len(jd_text or ""),
+                "resumes": [{"index": i, "filename": f, "chars": len(t)} for i, (f, t) in enumerate(zip(filenames, texts))],
+            })
+            result = await match_texts(jd_text or "", texts, filenames, events.add)
+            if result["ai_failures"] and job["attempts"] < JOB_MAX_ATTEMPTS:
+                raise RuntimeError(f"AI failed to score {result['ai_failures']} resumes")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            retry_at = None
+            if job["attempts"] < JOB_MAX_ATTEMPTS and not isinstance(e, PERMANENT_ERRORS):
+                retry_at = time.time() + JOB_RETRY_BACKOFF_SECONDS * 2 ** (job["attempts"] - 1)
+            logger.warning(f"Job {job_id} attempt {job['attempts']} failed: {e}" + (" (will retry)" if retry_at else ""))
+            events.add({"event": "error", "detail": str(e), "will_retry": retry_at is not None})
+            # Events first, so a client following the job sees them before the status changes
+            await events.close()
+            await asyncio.to_thread(self.store.fail, job_id, self.owner, str(e), retry_at)
+            return
+        events.add({"event": "result", **result})
+        await events.close()
+        await asyncio.to_thread(self.store.finish, job_id, self.owner, result)
+        logger.info(f"Job {job_id} completed")
+
+_job_queue: Optional[JobQueue] = None
+
+def get_job_queue() -> JobQueue:
+    global _job_queue
+    if _job_queue is None:
+        _job_queue = JobQueue(JobStore(JOBS_DB_PATH))
+    return _job_queue
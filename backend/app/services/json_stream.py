@@ -0,0 +1,262 @@
+import json
+import logging
+from typing import Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_LITERALS = {"true": "true", "false": "false", "null": "null", "True": "true", "False": "false", "None": "null"}
+_BARE_STOP = set(",:[]{}\"\n")
+_ESCAPES = set('"\\/bfnrtu')
+# Deeper containers are dropped so json.loads never hits the recursion limit
+MAX_JSON_DEPTH = 64
+
+def _bare_value(word: str) -> str:
+    """JSON for an unquoted token: numbers and literals as they are, anything else as a string."""
+    if word in _LITERALS:
+        return _LITERALS[word]
+    try:
+        float(word)
+        return word
+    except ValueError:
+        return json.dumps(word)
+
+def repair_json(text: str) -> str:
+    """
+    Turn the first JSON value in a model response into valid JSON in one linear pass.
+    Handles prose or code fences around the value, unterminated strings, missing
+    closing brackets, trailing and doubled commas, missing commas between values,
+    raw newlines in strings, unquoted keys and values, Python literals and dangling
+    keys. Anything after the value is ignored. Text without a value gives "null".
+    Containers nested deeper than MAX_JSON_DEPTH are dropped.
+    """
+    n = len(text)
+    i = 0
+    while i < n and text[i] not in "[{":
+        i += 1
+    if i == n:
+        return "null"
+
+    out: List[str] = []
+    stack: List[str] = []
+    # What the innermost container expects next: "key", "colon", "value" or "comma"
+    expect = "value"
+
+    def _drop_trailing_comma() -> None:
+        j = len(out) - 1
+        while j >= 0 and out[j].isspace():
+            j -= 1
+        if j >= 0 and out[j] == ",":
+            del out[j]
+
+    def _last_token() -> str:
+        for piece in reversed(out):
+            if not piece.isspace():
+                return piece
+        return ""
+
+    def _close_dangling() -> None:
+        if stack and stack[-1] == "{" and expect == "colon":
+            out.append(":null")
+        elif stack and expect == "value" and _last_token() == ":":
+            out.append("null")
+
+    def _after_value() -> str:
+        return "comma" if stack else "done"
+
+    while i < n and expect != "done":
+        ch = text[i]
+        if ch.isspace():
+            out.append(ch)
+            i += 1
+        elif ch == '"':
+            if expect == "comma":
+                out.append(",")
+                expect = "key" if stack[-1] == "{" else "value"
+            j = i + 1
+            chars = ['"']
+            while j < n:
+                c = text[j]
+                if c == "\\":
+                    # Keep valid escapes; a lone or invalid backslash becomes a literal one
+                    if j + 1 < n and text[j + 1] in _ESCAPES:
+                        chars.append(text[j:j + 2])
+                        j += 2
+                    else:
+                        chars.append("\\\\")
+                        j += 1
+                    continue
+                if c == '"':
+                    break
+                chars.append("\\n" if c == "\n" else "\\r" if c == "\r" else "\\t" if c == "\t" else c)
+                j += 1
+            chars.append('"')
+            out.append("".join(chars))
+            i = j + 1
+            expect = "colon" if expect == "key" else _after_value()
+        elif ch in "[{":
+            if len(stack) >= MAX_JSON_DEPTH:
+                i += 1
+                continue
+            if expect == "comma":
+                out.append(",")
+            elif expect in ("key", "colon"):
+                # A container where an object key belongs: treat it as that key's value
+                out.append('"":' if expect == "key" else ":")
+            out.append(ch)
+            stack.append(ch)
+            expect = "key" if ch == "{" else "value"
+            i += 1
+        elif ch in "]}":
+            opener = "[" if ch == "]" else "{"
+            if opener in stack:
+                # Close any containers left open inside this one first
+                while stack:
+                    _close_dangling()
+                    _drop_trailing_comma()
+                    top = stack.pop()
+                    out.append("]" if top == "[" else "}")
+                    expect = "comma"
+                    if top == opener:
+                        break
+                expect = _after_value()
+            i += 1
+        elif ch == ",":
+            if expect == "comma":
+                out.append(",")
+                expect = "key" if stack[-1] == "{" else "value"
+            i += 1
+        elif ch == ":":
+            if expect == "colon":
+                out.append(":")
+                expect = "value"
+            i += 1
+        else:
+            j = i
+            while j < n and text[j] not in _BARE_STOP:
+                j += 1
+            word = text[i:j].strip()
+            i = max(j, i + 1)
+            if not word or expect == "comma":
+                # Annotations after a value (e.g. `"Docker" is missing,`) are noise
+                continue
+            if expect == "key":
+                out.append(json.dumps(word))
+                expect = "colon"
+            elif expect == "colon":
+                continue
+            else:
+                out.append(_bare_value(word))
+                expect = _after_value()
+
+    while stack:
+        _close_dangling()
+        _drop_trailing_comma()
+        out.append("]" if stack.pop() == "[" else "}")
+        expect = "comma"
+    return "".join(out).strip()
+
+def parse_json(text: str) -> Any:
+    """Parse model output as JSON, repairing it when it is not valid as-is. Raises ValueError."""
+    stripped = text.strip()
+    try:
+        return json.loads(stripped)
+    except (ValueError, RecursionError):
+        pass
+    return json.loads(repair_json(stripped))
+
+class JSONStreamParser:
+    """
+    Incremental parser for a model response that should be a JSON array.
+    `feed` takes text chunks as they arrive and returns the array elements completed
+    by that chunk, each parsed (and repaired if needed) on its own; `close` returns
+    whatever the truncated tail still yields. If the response is a single object
+    instead, it is returned as one element. Elements that cannot be recovered are
+    skipped and counted in `errors`. Work is linear in the input: every character
+    is scanned once and every element is parsed at most twice.
+    """
+
+    def __init__(self):
+        self._top: Optional[str] = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._buf: List[str] = []
+        self._done = False
+        self.errors = 0
+
+    def _flush(self, items: List[Any]) -> None:
+        text = "".join(self._buf).strip()
+        self._buf = []
+        if not text:
+            return
+        try:
+            if self._top == "{":
+                items.append(parse_json(text))
+            else:
+                # Bracketing the element also recovers values missing the comma between them
+                items.extend(parse_json(f"[{text}]"))
+        except ValueError:
+            self.errors += 1
+            logger.debug(f"Skipping unparseable element: {text[:80]}")
+
+    def feed(self, chunk: str) -> List[Any]:
+        items: List[Any] = []
+        for ch in chunk:
+            if self._done:
+                break
+            if self._top is None:
+                if ch in "[{":
+                    self._top = ch
+                    self._depth = 1
+                    if ch == "{":
+                        self._buf.append(ch)
+                continue
+            if self._in_string:
+                self._buf.append(ch)
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            if ch == '"':
+                self._in_string = True
+                self._buf.append(ch)
+            elif ch in "[{":
+                self._depth += 1
+                self._buf.append(ch)
+            elif ch in "]}":
+                self._depth -= 1
+                if self._depth <= 0:
+                    if self._top == "{":
+                        self._buf.append(ch)
+                    self._flush(items)
+                    self._done = True
+                    continue
+                self._buf.append(ch)
+                if self._top == "[" and self._depth == 1:
+                    # A container element just closed; no need to wait for the comma
+                    self._flush(items)
+            elif ch == "," and self._top == "[" and self._depth == 1:
+                self._flush(items)
+            else:
+                self._buf.append(ch)
+        return items
+
+    def close(self) -> List[Any]:
+        items: List[Any] = []
+        if not self._done:
+            if self._in_string:
+                # Terminate a string cut off by the end of the stream
+                if self._escape:
+                    self._buf.pop()
+                self._buf.append('"')
+            self._flush(items)
+            self._done = True
+        return items
+
+def parse_json_array(text: str) -> List[Any]:
+    """Every recoverable element of a (possibly truncated or malformed) JSON array response."""
+    parser = JSONStreamParser()
+    return parser.feed(text) + parser.close()
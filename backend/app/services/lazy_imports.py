@@ -0,0 +1,84 @@
+import importlib
+import importlib.util
+import logging
+import os
+import time
+from types import ModuleType
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Heavy dependencies imported on first use instead of at startup, by registry name
+LAZY_MODULES = {
+    "genai": "google.genai",
+    "numpy": "numpy",
+    "pypdf": "pypdf",
+    "docx": "docx",
+    "textract": "textract",
+}
+# Registry names imported in the background at startup ("all" for every one; empty = none)
+PREWARM_MODULES = os.getenv("PREWARM_MODULES", "")
+
+_loaded: Dict[str, ModuleType] = {}
+_failed: Dict[str, str] = {}
+_available: Dict[str, bool] = {}
+
+def module_available(name: str) -> bool:
+    """Whether the module is installed, checked without importing it."""
+    if name in _loaded:
+        return True
+    if name not in _available:
+        try:
+            _available[name] = importlib.util.find_spec(LAZY_MODULES[name]) is not None
+        except (ImportError, ValueError):
+            _available[name] = False
+    return _available[name]
+
+def load_module(name: str) -> Optional[ModuleType]:
+    """
+    The module registered as `name`, imported on first call, or None when it is
+    not installed or fails to import (logged once; later calls return None at once).
+    """
+    module = _loaded.get(name)
+    if module is not None:
+        return module
+    if name in _failed:
+        return None
+    start = time.perf_counter()
+    try:
+        module = importlib.import_module(LAZY_MODULES[name])
+    except Exception as e:
+        _failed[name] = str(e)
+        logger.warning(f"Optional module {LAZY_MODULES[name]} unavailable: {e}")
+        return None
+    _loaded[name] = module
+    logger.info(f"Imported {LAZY_MODULES[name]} in {(time.perf_counter() - start) * 1000:.0f}ms")
+    return module
+
+def prewarm_names() -> List[str]:
+    """Registry names listed in PREWARM_MODULES (unknown names are ignored)."""
+    if PREWARM_MODULES.strip().lower() == "all":
+        return list(LAZY_MODULES)
+    names = [n.strip().lower() for n in PREWARM_MODULES.split(",") if n.strip()]
+    for name in names:
+        if name not in LAZY_MODULES:
+            logger.warning(f"Unknown module '{name}' in PREWARM_MODULES, ignoring it")
+    return [n for n in names if n in LAZY_MODULES]
+
+def prewarm_modules(names: List[str]) -> None:
+    """Import `names` now (blocking; run it in a thread) so no request pays for it."""
+    for name in names:
+        if module_available(name):
+            load_module(name)
+
+def module_status() -> Dict[str, str]:
+    """loaded, failed, available (installed, not imported yet) or missing, per registry name."""
+    status = {}
+    for name in LAZY_MODULES:
+        if name in _loaded:
+            status[name] = "loaded"
+        elif name in _failed:
+            status[name] = "failed"
+        else:
+            status[name] = "available" if module_available(name) else "missing"
+    return status
@@ -1,26 +1,26 @@
+from collections import Counter
 from dataclasses import dataclass
-from typing import List
+from typing import Dict, List, Optional, Tuple
+import math
 import re
+from .skills import extract_skills
+
+# Weights of the two local signals in the pre-ranking score
+PRERANK_SKILL_WEIGHT = 0.6
+PRERANK_BM25_WEIGHT = 0.4
+
+_STOPWORDS = {
+    "a","an","and","are","as","at","be","by","for","from","has","have","in","is","it","its","of","on",
+    "or","our","that","the","their","this","to","we","will","with","you","your","years","experience",
+    "role","team","work","ability","strong","skills","including","using","about","who","what",
+}
 
 def _tokenize_skills(text: str) -> List[str]:
     parts = re.split(r"[^a-zA-Z0-9+#\.]+", text.lower())
     return [p for p in parts if p]
 
 def _extract_skills(text: str) -> List[str]:
-    keywords = [
-        "python","java","javascript","typescript","react","node","fastapi","django","flask",
-        "aws","gcp","azure","docker","kubernetes","sql","nosql","postgres","mysql","mongodb",
-        "nlp","ml","ai","pytorch","tensorflow","sklearn","spacy","transformers",
-        "c++","c#","go","rust","php","html","css","tailwind","next.js","nextjs","shadcn"
-    ]
-    set_kw = set(keywords)
-    seen = set()
-    result = []
-    for tok in _tokenize_skills(text):
-        if tok in set_kw and tok not in seen:
-            seen.add(tok)
-            result.append(tok)
-    return result
+    return extract_skills(text)
 
 def _normalize_must_have(skills_csv: str) -> List[str]:
     return [s.strip().lower() for s in skills_csv.split(',') if s.strip()]
@@ -31,8 +31,9 @@ class MatchItem:
     missing_skills: List[str]
     remarks: str
 
-async def score_resumes_against_jd(jd_text: str, resumes_text: List[str]) -> List[MatchItem]:
-    jd_skills = set(_extract_skills(jd_text))
+async def score_resumes_against_jd(jd_text: str, resumes_text: List[str],
+                                   jd_skills: Optional[List[str]] = None) -> List[MatchItem]:
+    jd_skills = set(jd_skills if jd_skills is not None else _extract_skills(jd_text))
     items: List[MatchItem] = []
     for txt in resumes_text:
         res_skills = set(_extract_skills(txt))
@@ -43,3 +44,42 @@ async def score_resumes_against_jd(jd_text: str, resumes_text: List[str]) -> Lis
         remarks = "strong in " + ", ".join(sorted(list(present))[:3]) if present else "no key skills matched"
         items.append(MatchItem(score=score, missing_skills=missing, remarks=remarks))
     return items
+
+def _bm25_scores(query: List[str], docs: List[List[str]], k1: float = 1.5, b: float = 0.75) -> List[float]:
+    """Okapi BM25 score of every tokenized document against the query terms."""
+    n = len(docs)
+    if n == 0:
+        return []
+    doc_freq: Counter = Counter()
+    for tokens in docs:
+        doc_freq.update(set(tokens))
+    avg_len = sum(len(t) for t in docs) / n or 1.0
+    idf: Dict[str, float] = {
+        term: math.log(1 + (n - doc_freq[term] + 0.5) / (doc_freq[term] + 0.5))
+        for term in set(query) if doc_freq[term]
+    }
+    scores = []
+    for tokens in docs:
+        tf = Counter(tokens)
+        norm = k1 * (1 - b + b * len(tokens) / avg_len)
+        scores.append(sum(w * tf[t] * (k1 + 1) / (tf[t] + norm) for t, w in idf.items() if tf[t]))
+    return scores
+
+async def prerank_resumes(jd_text: str, resumes_text: List[str], top_k: int,
+                          jd_skills: Optional[List[str]] = None) -> Tuple[List[int], List[MatchItem]]:
+    """
+    Fast first-stage ranking of all resumes without any AI call.
+    Combines skill overlap (score_resumes_against_jd) with BM25 relevance of the
+    resume to the JD's terms. Returns the indices of the top_k resumes (best first,
+    ties in upload order) and a local MatchItem for every resume. Pass `jd_skills`
+    when the JD's skills are already known.
+    """
+    items = await score_resumes_against_jd(jd_text, resumes_text, jd_skills)
+    query = [t for t in _tokenize_skills(jd_text) if t not in _STOPWORDS and len(t) > 1]
+    bm25 = _bm25_scores(query, [_tokenize_skills(txt) for txt in resumes_text])
+    best_bm25 = max(bm25, default=0.0) or 1.0
+    
+    for item, relevance in zip(items, bm25):
+        item.score = round(PRERANK_SKILL_WEIGHT * item.score + PRERANK_BM25_WEIGHT * 100.0 * relevance / best_bm25, 2)
+    order = sorted(range(len(items)), key=lambda i: (-items[i].score, i))
+    return order[:top_k], items
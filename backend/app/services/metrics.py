@@ -0,0 +1,171 @@
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# In-process metrics, exposed in the Prometheus text format on GET /metrics
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1").lower() in ("1", "true", "yes")
+# Add a Server-Timing header with per-stage durations to every (non-streamed) response
+METRICS_TIMING_HEADER = os.getenv("METRICS_TIMING_HEADER", "0").lower() in ("1", "true", "yes")
+METRICS_PREFIX = "recruitment_ai"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Histogram buckets (seconds), wide enough for slow model calls
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+def _labels(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class Counter:
+    """Monotonic count per label set."""
+    kind = "counter"
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        if not METRICS_ENABLED:
+            return
+        key = _labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(k)} {_format_value(v)}" for k, v in items]
+
+class Histogram:
+    """Cumulative bucket counts, sum and count per label set."""
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets) + (math.inf,)
+        self._values: Dict[Labels, List[float]] = {}  # bucket counts..., sum, count
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        if not METRICS_ENABLED:
+            return
+        key = _labels(labels)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[i] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        lines = []
+        for key, row in items:
+            for bound, count in zip(self.buckets, row):
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', _format_value(bound)))} {_format_value(count)}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(row[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {_format_value(row[-1])}")
+        return lines
+
+_registry: List[object] = []
+
+def _register(metric):
+    _registry.append(metric)
+    return metric
+
+http_request_seconds = _register(Histogram(
+    f"{METRICS_PREFIX}_http_request_seconds", "HTTP request latency by route and status."))
+stage_seconds = _register(Histogram(
+    f"{METRICS_PREFIX}_stage_seconds", "Latency of each match pipeline stage."))
+extract_seconds = _register(Histogram(
+    f"{METRICS_PREFIX}_extract_document_seconds", "Text extraction time per document, by type (cache hits excluded)."))
+ai_call_seconds = _register(Histogram(
+    f"{METRICS_PREFIX}_ai_call_seconds", "Model call latency by call type and outcome, including retries and queueing."))
+ai_tokens = _register(Counter(
+    f"{METRICS_PREFIX}_ai_tokens_total", "Prompt and response tokens by call type (provider usage, else estimated)."))
+ai_errors = _register(Counter(
+    f"{METRICS_PREFIX}_ai_errors_total", "Model calls that failed after all retries, by call type and error."))
+ai_retries = _register(Counter(
+    f"{METRICS_PREFIX}_ai_retries_total", "Retried model call attempts, by error."))
+cache_lookup_seconds = _register(Histogram(
+    f"{METRICS_PREFIX}_cache_lookup_seconds", "Cache lookup latency by cache.",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5)))
+cache_lookups = _register(Counter(
+    f"{METRICS_PREFIX}_cache_lookups_total", "Cache lookups by cache and result (hit or miss)."))
+fallbacks = _register(Counter(
+    f"{METRICS_PREFIX}_fallbacks_total", "Results produced without the model (templates, placeholders) or repaired, by reason."))
+
+# Per-request stage durations (ms) for the Server-Timing header; None outside a timed request
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+def start_request_timings() -> Dict[str, float]:
+    """Collect stage durations for the current request (and the tasks it starts)."""
+    timings: Dict[str, float] = {}
+    _request_timings.set(timings)
+    return timings
+
+def add_request_timing(name: str, seconds: float) -> None:
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds * 1000
+
+def server_timing_header(timings: Dict[str, float]) -> str:
+    return ", ".join(f"{name};dur={ms:.1f}" for name, ms in timings.items())
+
+@contextmanager
+def timed(histogram: Histogram, timing_name: Optional[str] = None, **labels: str) -> Iterator[None]:
+    """
+    Observe the duration of the block in `histogram` (also when it raises), and add
+    it to the request's Server-Timing entry `timing_name` if one is given.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        histogram.observe(elapsed, **labels)
+        if timing_name:
+            add_request_timing(timing_name, elapsed)
+
+def stage(name: str):
+    """Timer for one match pipeline stage, reported in metrics and Server-Timing."""
+    return timed(stage_seconds, name, stage=name)
+
+def record_cache_lookup(cache: str, hit: bool, seconds: float) -> None:
+    cache_lookups.inc(cache=cache, result="hit" if hit else "miss")
+    cache_lookup_seconds.observe(seconds, cache=cache)
+
+def render() -> str:
+    """Every metric in the Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,216 @@
+import asyncio
+import logging
+import os
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+from fastapi import UploadFile
+from .extract import extract_texts_from_uploads
+from .ai_client import (
+    ai_match_resumes, generate_candidate_emails, rank_candidates, template_rejection_email, MatchAIItem,
+    AI_ERROR_REMARKS
+)
+from .matching import prerank_resumes
+from .jd_profile import get_jd_profile
+from .candidates import get_candidate_store
+from .metrics import stage
+from .prompt_budget import without_page_breaks
+
+logger = logging.getLogger(__name__)
+
+# Only this many locally pre-ranked resumes are scored by AI; 0 scores every resume with AI
+PRERANK_TOP_K = int(os.getenv("PRERANK_TOP_K", "25"))
+# Local pre-ranking signal next to skill overlap: "keyword" (BM25) or "semantic" (embeddings)
+PRERANK_METHOD = os.getenv("PRERANK_METHOD", "keyword").lower()
+# "ai" scores the shortlist with the model; "semantic" scores every resume by embedding similarity only
+MATCH_MODE = os.getenv("MATCH_MODE", "ai").lower()
+# Minimum AI score for an interview invitation
+SELECTION_THRESHOLD = 50
+
+Emit = Callable[[Dict[str, Any]], None]
+
+def get_prerank() -> Callable[..., Awaitable[Any]]:
+    """The local pre-ranking function for PRERANK_METHOD; semantic.py (and numpy) load on first use."""
+    if PRERANK_METHOD == "semantic":
+        from .semantic import semantic_prerank
+        return semantic_prerank
+    return prerank_resumes
+
+def _no_emit(event: Dict[str, Any]) -> None:
+    pass
+
+async def run_match_pipeline(
+    jd_text: Optional[str],
+    jd_file: Optional[UploadFile],
+    resumes: List[UploadFile],
+    emit: Emit = _no_emit,
+) -> Dict[str, Any]:
+    """
+    Extract the uploads, then score and email every candidate (see match_texts).
+    Emits an "extracted" event once all documents are parsed.
+    """
+    filenames = [f.filename or f"resume_{i}" for i, f in enumerate(resumes)]
+    uploads = ([jd_file] if jd_file else []) + resumes
+    logger.info(f"Extracting text from {len(uploads)} files in parallel")
+    with stage("extract"):
+        extracted = await extract_texts_from_uploads(uploads)
+    if jd_file:
+        jd_text = extracted.pop(0)
+        logger.info(f"Extracted {len(jd_text)} characters from JD file: {jd_file.filename}")
+    texts = extracted
+    for filename, resume_text in zip(filenames, texts):
+        logger.info(f"Extracted {len(resume_text)} characters from {filename}")
+    emit({
+        "event": "extracted",
+        "jd_chars": len(jd_text or ""),
+        "resumes": [{"index": i, "filename": f, "chars": len(t)} for i, (f, t) in enumerate(zip(filenames, texts))],
+    })
+    return await match_texts(jd_text or "", texts, filenames, emit)
+
+async def match_texts(jd_text: str, texts: List[str], filenames: List[str], emit: Emit = _no_emit) -> Dict[str, Any]:
+    """
+    Score already-extracted resumes against the JD and generate their emails.
+    Emits "score" and "email" events per candidate as they complete, and returns
+    the full result (jd_text, candidates, best_index) plus "ai_failures", the
+    number of resumes the model failed to score. Each stage is timed in metrics.
+    """
+    # Parsed once here and shared by every matching and email call below
+    with stage("jd_profile"):
+        jd = get_jd_profile(jd_text)
+    shortlist = list(range(len(texts)))
+    local_items = []
+    with stage("prerank"):
+        if MATCH_MODE == "semantic":
+            from .semantic import semantic_match_resumes
+            local_items = await semantic_match_resumes(jd_text, texts, jd_skills=jd.skills)
+            shortlist = sorted(shortlist, key=lambda i: (-local_items[i].score, i))[:PRERANK_TOP_K or None]
+            logger.info(f"Scored {len(texts)} resumes semantically, {len(shortlist)} shortlisted for AI emails")
+        elif 0 < PRERANK_TOP_K < len(texts):
+            shortlist, local_items = await get_prerank()(jd_text, texts, PRERANK_TOP_K, jd_skills=jd.skills)
+            logger.info(f"Pre-ranked {len(texts)} resumes locally, sending top {len(shortlist)} to AI")
+    ai_scored = set(shortlist)
+
+    results: List[MatchAIItem] = [None] * len(texts)
+
+    def _scored(i: int, item: MatchAIItem, by_ai: bool) -> None:
+        results[i] = item
+        emit({
+            "event": "score",
+            "index": i,
+            "filename": filenames[i],
+            "score": item.score,
+            "missing_skills": item.missing_skills,
+            "remarks": item.remarks,
+            "ai_scored": by_ai,
+        })
+
+    for i, item in enumerate(local_items):
+        if i not in ai_scored:
+            _scored(i, MatchAIItem(
+                filename=filenames[i],
+                score=item.score,
+                missing_skills=item.missing_skills,
+                remarks=f"Not shortlisted for AI review (local pre-screen: {item.remarks})",
+            ), False)
+
+    if MATCH_MODE == "semantic":
+        for i in shortlist:
+            item = local_items[i]
+            _scored(i, MatchAIItem(
+                filename=filenames[i],
+                score=item.score,
+                missing_skills=item.missing_skills,
+                remarks=f"Semantic match: {item.remarks}",
+            ), False)
+        ai_failures = 0
+    else:
+        logger.info("Starting AI matching process")
+        with stage("ai_match"):
+            await ai_match_resumes(
+                jd,
+                [texts[i] for i in shortlist],
+                [filenames[i] for i in shortlist],
+                on_result=lambda j, item: _scored(shortlist[j], item, True),
+            )
+        ai_failures = sum(1 for i in shortlist if results[i].remarks == AI_ERROR_REMARKS)
+        logger.info(f"AI matching completed with {len(shortlist)} results ({ai_failures} failed)")
+
+    # AI-scored candidates always rank above the ones only scored locally
+    ranks = rank_candidates([r.score for r in results], [0 if i in ai_scored else 1 for i in range(len(results))])
+    best_index = ranks.index(1)
+    logger.info(f"Best candidate index: {best_index} with score {results[best_index].score}")
+
+    selections = [r.score >= SELECTION_THRESHOLD and i in ai_scored for i, r in enumerate(results)]
+    emails: List[dict] = [{} for _ in texts]
+
+    def _emailed(i: int, email: dict) -> None:
+        emails[i] = email
+        emit({"event": "email", "index": i, "filename": filenames[i], "is_selected": selections[i], "email": email})
+
+    for i, is_selected in enumerate(selections):
+        logger.info(f"Generating email for candidate {i}: {filenames[i]} (score: {results[i].score}, selected: {is_selected})")
+        if i not in ai_scored:
+            # Candidates screened out locally get a template rejection instead of an AI call
+            _emailed(i, template_rejection_email(jd, filenames[i]))
+    with stage("emails"):
+        await generate_candidate_emails(
+            jd,
+            [texts[i] for i in shortlist],
+            [filenames[i] for i in shortlist],
+            [selections[i] for i in shortlist],
+            on_email=lambda j, email: _emailed(shortlist[j], email),
+        )
+
+    candidates = [
+        {
+            "filename": r.filename or filenames[i],
+            "score": r.score,
+            "missing_skills": r.missing_skills,
+            "remarks": r.remarks,
+            "email": emails[i],
+            "is_selected": selections[i],
+            "rank": ranks[i],
+        }
+        for i, r in enumerate(results)
+    ]
+    with stage("store"):
+        store = get_candidate_store()
+        if store is not None:
+            # Keep the resumes and their outcome so the pool can be re-ranked for later openings
+            try:
+                ids = await asyncio.to_thread(store.record_match, jd, texts, filenames, candidates)
+                for candidate, candidate_id in zip(candidates, ids):
+                    candidate["candidate_id"] = candidate_id
+            except Exception as e:
+                logger.warning(f"Could not store candidates: {e}")
+    logger.info("Match process completed successfully")
+    return {"jd_text": without_page_breaks(jd_text), "candidates": candidates, "best_index": best_index, "ai_failures": ai_failures}
+
+async def stream_match_events(
+    jd_text: Optional[str],
+    jd_file: Optional[UploadFile],
+    resumes: List[UploadFile],
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Run the pipeline in the background and yield its progress events as they happen,
+    ending with a "result" event. Exceptions from the pipeline are re-raised after
+    the events emitted before the failure; closing the iterator cancels the pipeline.
+    """
+    queue: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue()
+
+    async def _run() -> None:
+        try:
+            result = await run_match_pipeline(jd_text, jd_file, resumes, queue.put_nowait)
+            queue.put_nowait({"event": "result", **result})
+        finally:
+            queue.put_nowait(None)
+
+    task = asyncio.ensure_future(_run())
+    try:
+        while True:
+            event = await queue.get()
+            if event is None:
+                break
+            yield event
+        await task
+    finally:
+        if not task.done():
+            task.cancel()
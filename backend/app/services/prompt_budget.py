@@ -0,0 +1,206 @@
+import logging
+import os
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Prompt token budgets; documents are cleaned and trimmed least relevant sections first
+PROMPT_TOKENS_MATCH_JD = int(os.getenv("PROMPT_TOKENS_MATCH_JD", "2000"))  # JD in a matching call
+PROMPT_TOKENS_MATCH_RESUME = int(os.getenv("PROMPT_TOKENS_MATCH_RESUME", "1500"))  # each resume in a matching call
+PROMPT_TOKENS_INTERVIEW_EMAIL = int(os.getenv("PROMPT_TOKENS_INTERVIEW_EMAIL", "2000"))  # whole prompt
+PROMPT_TOKENS_REJECTION_EMAIL = int(os.getenv("PROMPT_TOKENS_REJECTION_EMAIL", "1600"))  # whole prompt
+# Share of the email budget left after the instructions that the JD may use; the resume gets the rest
+INTERVIEW_EMAIL_WEIGHTS = (2.0, 1.0)
+REJECTION_EMAIL_WEIGHTS = (8.0, 1.0)
+
+# Section relevance when a document has to be trimmed: lower goes first
+PRIORITY_LOW = 1
+PRIORITY_NORMAL = 2
+PRIORITY_HIGH = 3
+# Least body text a trimmed section keeps under its header; shorter remainders drop the section
+MIN_SECTION_CHARS = 80
+
+# Header keywords of resume and JD sections, by how much the model needs them
+SECTION_PRIORITIES: Dict[str, int] = {
+    "experience": PRIORITY_HIGH, "work experience": PRIORITY_HIGH, "professional experience": PRIORITY_HIGH,
+    "employment": PRIORITY_HIGH, "employment history": PRIORITY_HIGH, "work history": PRIORITY_HIGH,
+    "projects": PRIORITY_HIGH, "skills": PRIORITY_HIGH, "technical skills": PRIORITY_HIGH,
+    "responsibilities": PRIORITY_HIGH, "requirements": PRIORITY_HIGH, "qualifications": PRIORITY_HIGH,
+    "must have": PRIORITY_HIGH, "key responsibilities": PRIORITY_HIGH, "what you will do": PRIORITY_HIGH,
+    "summary": PRIORITY_NORMAL, "profile": PRIORITY_NORMAL, "objective": PRIORITY_NORMAL,
+    "education": PRIORITY_NORMAL, "certifications": PRIORITY_NORMAL, "achievements": PRIORITY_NORMAL,
+    "nice to have": PRIORITY_NORMAL, "preferred qualifications": PRIORITY_NORMAL,
+    "interests": PRIORITY_LOW, "hobbies": PRIORITY_LOW, "references": PRIORITY_LOW,
+    "declaration": PRIORITY_LOW, "personal details": PRIORITY_LOW, "personal information": PRIORITY_LOW,
+    "languages": PRIORITY_LOW, "activities": PRIORITY_LOW, "extracurricular activities": PRIORITY_LOW,
+    "about us": PRIORITY_LOW, "about the company": PRIORITY_LOW, "benefits": PRIORITY_LOW,
+    "perks": PRIORITY_LOW, "what we offer": PRIORITY_LOW, "how to apply": PRIORITY_LOW,
+    "equal opportunity": PRIORITY_LOW,
+}
+
+_CONTACT_PATTERNS = [
+    re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+"),  # emails
+    re.compile(r"(?:https?://|www\.)\S+|\b(?:linkedin|github)\.com/\S*", re.IGNORECASE),  # URLs, profiles
+]
+# Phone numbers: digit groups joined by spaces, dots or dashes (optional +country code and
+# (area code)), or one unbroken run; matches need 10-15 digits and no year range in them
+_PHONE_CANDIDATE = re.compile(
+    r"(?<![\w-])(?:\+\d{1,3}[\s.-]?)?(?:\(\d{2,5}\)[\s.-]?)?\d{2,5}(?:[\s.-]\d{2,5}){1,4}(?![\w-])"
+    r"|(?<![\w-])\+?\d{10,15}(?![\w-])"
+)
+_YEAR_RANGE = re.compile(r"(?:19|20)\d\d\s*[-\u2013]\s*(?:19|20)\d\d")
+# Lines at the top or bottom of a page that are checked for repeated headers and footers
+PAGE_EDGE_LINES = 2
+_BOILERPLATE_LINE = re.compile(
+    r"^(page \d+( of \d+)?|curriculum vitae|resume|cv|references (are )?available (up)?on request\.?"
+    r"|i hereby declare.*|.*equal opportunity employer.*)$",
+    re.IGNORECASE,
+)
+_HEADER_STRIP = re.compile(r"^[#*_\s]+|[#*_:\s]+$")
+# Longest section header in characters, and in words unless it is exactly a section name
+HEADER_MAX_CHARS = 40
+HEADER_MAX_WORDS = 4
+
+def without_page_breaks(text: str) -> str:
+    """`text` with the form feeds extraction puts between PDF pages turned into line breaks."""
+    return text.replace("\f", "\n")
+
+def estimate_tokens(text: str) -> int:
+    """Cheap local token estimate (~4 characters per token)."""
+    return len(text) // 4 + 1
+
+def _remove_phone(match: "re.Match") -> str:
+    number = match.group()
+    if not 10 <= sum(c.isdigit() for c in number) <= 15 or _YEAR_RANGE.search(number):
+        return number
+    return ""
+
+def _normalize_line(line: str) -> str:
+    return re.sub(r"[ \t]+", " ", line).strip(" |,;")
+
+def _page_furniture(pages: List[List[str]]) -> set:
+    """Lines (lowercased) found at the top or bottom of more than one page: running headers and footers."""
+    counts: Dict[str, int] = {}
+    for page in pages:
+        content = [line for line in page if line]
+        edges = {line.lower() for line in content[:PAGE_EDGE_LINES] + content[-PAGE_EDGE_LINES:]}
+        for key in edges:
+            counts[key] = counts.get(key, 0) + 1
+    return {key for key, count in counts.items() if count > 1}
+
+def clean_document(text: str) -> str:
+    """
+    Remove what the model never needs: contact details, boilerplate lines and the
+    headers and footers repeated on every page of a PDF (pages are split at form feeds;
+    the first copy is kept). Whitespace runs and blank lines are collapsed.
+    """
+    for pattern in _CONTACT_PATTERNS:
+        text = pattern.sub("", text)
+    text = _PHONE_CANDIDATE.sub(_remove_phone, text)
+    pages = [[_normalize_line(raw) for raw in page.splitlines()] for page in text.split("\f")]
+    furniture = _page_furniture(pages) if len(pages) > 1 else set()
+    seen = set()
+    lines: List[str] = []
+    for page in pages:
+        content = [line for line in page if line]
+        edges = set(content[:PAGE_EDGE_LINES] + content[-PAGE_EDGE_LINES:])
+        for line in page:
+            if _BOILERPLATE_LINE.match(line):
+                continue
+            key = line.lower()
+            if key in furniture and line in edges:
+                if key in seen:
+                    continue
+                seen.add(key)
+            if line or (lines and lines[-1]):
+                lines.append(line)
+    return "\n".join(lines).strip()
+
+def _header_priority(line: str) -> Tuple[bool, int]:
+    """
+    Whether `line` looks like a section header, and that section's priority.
+    A line that is exactly a known section name is a header. Otherwise only short
+    lines set off as headers (a markdown heading, a trailing colon or all caps)
+    count, so body lines that merely start or end with a keyword stay body text.
+    """
+    name = _HEADER_STRIP.sub("", line).lower()
+    if not name or len(name) > HEADER_MAX_CHARS:
+        return False, PRIORITY_NORMAL
+    if name in SECTION_PRIORITIES:
+        return True, SECTION_PRIORITIES[name]
+    marked = line.strip()
+    if len(name.split()) > HEADER_MAX_WORDS or not (marked.startswith("#") or marked.endswith(":") or marked.isupper()):
+        return False, PRIORITY_NORMAL
+    for keyword, priority in SECTION_PRIORITIES.items():
+        if name.startswith(keyword) or name.endswith(keyword):
+            return True, priority
+    return True, PRIORITY_NORMAL
+
+@dataclass
+class Section:
+    lines: List[str]
+    priority: int
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.lines)
+
+def split_sections(text: str) -> List[Section]:
+    """Split a document at its section headers; the text before the first header is its own section."""
+    sections = [Section([], PRIORITY_NORMAL)]
+    for line in text.splitlines():
+        is_header, priority = _header_priority(line) if line else (False, 0)
+        if is_header:
+            sections.append(Section([line], priority))
+        else:
+            sections[-1].lines.append(line)
+    return [s for s in sections if any(s.lines)]
+
+def _max_chars(max_tokens: int) -> int:
+    """Longest text estimate_tokens() counts as at most `max_tokens`."""
+    return max_tokens * 4 - 1
+
+def _truncate(text: str, max_chars: int) -> str:
+    """The head of `text` up to `max_chars`, cut at a word boundary when one is close."""
+    if len(text) <= max_chars:
+        return text
+    head = text[:max_chars]
+    space = max(head.rfind(" "), head.rfind("\n"))
+    if space > max_chars * 0.8:
+        head = head[:space]
+    return head.rstrip()
+
+def fit_text(text: str, max_tokens: int) -> str:
+    """
+    Trim `text` to at most `max_tokens`. Text that fits is returned as is; otherwise it
+    is cleaned and whole sections are dropped least relevant first (later ones before
+    earlier ones of the same priority). The section that crosses the budget keeps its
+    head, cut at character level. Surviving sections stay in document order.
+    """
+    limit = _max_chars(max_tokens)
+    if limit <= 0:
+        return ""
+    if len(text.strip()) <= limit:
+        return without_page_breaks(text.strip())
+    cleaned = clean_document(text)
+    if len(cleaned) <= limit:
+        return cleaned
+    sections = split_sections(cleaned)
+    order = sorted(range(len(sections)), key=lambda i: (sections[i].priority, -i))
+    for i in order:
+        excess = len("\n".join(s.text for s in sections if s.lines)) - limit
+        if excess <= 0:
+            break
+        section = sections[i]
+        keep = len(section.text) - excess
+        header = section.lines[0] if _header_priority(section.lines[0])[0] else ""
+        if keep <= len(header) + (MIN_SECTION_CHARS if header else 0):
+            # Drop the whole section rather than leave a header without its body
+            section.lines = []
+        else:
+            section.lines = _truncate(section.text, keep).splitlines()
+    trimmed = "\n".join(s.text for s in sections if s.lines)
+    logger.debug(f"Trimmed document from {estimate_tokens(cleaned)} to {estimate_tokens(trimmed)} tokens")
+    return trimmed
@@ -0,0 +1,378 @@
+import ast
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional, get_args, get_origin
+from pydantic import BaseModel, TypeAdapter
+from ..prompts.email_generation import BATCH_EMAIL_USER_TEMPLATE
+from ..prompts.resume_matching import RESUME_MATCHING_USER_TEMPLATE
+from .client_manager import (
+    client_manager, AI_SERVICE_AVAILABLE, AI_API_KEY_ENV,
+    AI_MAX_CONNECTIONS, AI_MAX_KEEPALIVE_CONNECTIONS, AI_KEEPALIVE_EXPIRY_SECONDS
+)
+from .skills import extract_skills
+
+logger = logging.getLogger(__name__)
+
+# Which backend serves every model call: gemini, mock (offline stand-in) or openai (OpenAI-compatible HTTP server)
+AI_PROVIDER = os.getenv("AI_PROVIDER", "gemini").lower()
+_DEFAULT_MODELS = {"gemini": "gemini-2.5-flash", "mock": "mock", "openai": "local-model"}
+AI_MODEL = os.getenv("AI_MODEL", _DEFAULT_MODELS.get(AI_PROVIDER, _DEFAULT_MODELS["gemini"]))
+
+# Mock provider: simulated latency per call (mean +/- uniform jitter) and injected failures
+AI_MOCK_LATENCY_MS = float(os.getenv("AI_MOCK_LATENCY_MS", "200"))
+AI_MOCK_JITTER_MS = float(os.getenv("AI_MOCK_JITTER_MS", "0"))
+AI_MOCK_FAILURE_RATE = float(os.getenv("AI_MOCK_FAILURE_RATE", "0"))  # share of calls failing with a 503
+AI_MOCK_RATE_LIMIT_RATE = float(os.getenv("AI_MOCK_RATE_LIMIT_RATE", "0"))  # share of calls failing with a 429
+AI_MOCK_SEED = int(os.getenv("AI_MOCK_SEED", "0"))
+MOCK_RETRY_AFTER_SECONDS = 1.0
+MOCK_STREAM_CHUNK_CHARS = 40
+MOCK_STREAM_CHUNK_SECONDS = 0.005
+
+# OpenAI-compatible server (vLLM, llama.cpp, Ollama, LM Studio, ...)
+AI_OPENAI_BASE_URL = os.getenv("AI_OPENAI_BASE_URL", "http://localhost:11434/v1")
+AI_OPENAI_API_KEY = os.getenv("AI_OPENAI_API_KEY", "")
+
+@dataclass
+class ProviderResponse:
+    """
+    Text of a model response and, for structured calls, its schema-validated value.
+    Token counts are set when the provider reports usage.
+    """
+    text: str
+    parsed: Any = None
+    prompt_tokens: Optional[int] = None
+    response_tokens: Optional[int] = None
+
+class ProviderError(Exception):
+    """A failed provider call; `code` (HTTP status) and `retry_after` drive the retry policy."""
+
+    def __init__(self, message: str, code: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.code = code
+        self.retry_after = retry_after
+
+def _parse_structured(text: str, schema: Any) -> Any:
+    """`text` validated against `schema`, or None (the caller then repairs the text)."""
+    if schema is None:
+        return None
+    try:
+        return TypeAdapter(schema).validate_json(text)
+    except ValueError:
+        return None
+
+class AIProvider:
+    """
+    Transport for model calls. `config` uses the Gemini generation-config keys
+    (response_mime_type, response_schema, temperature, max_output_tokens); other
+    providers translate them. Errors worth retrying carry an HTTP-like `code`.
+    """
+    name = "base"
+
+    def __init__(self, model: str):
+        self.model = model
+
+    def available(self) -> bool:
+        return True
+
+    def unavailable_reason(self) -> str:
+        return ""
+
+    def status(self) -> str:
+        """Provider state for health checks."""
+        return "ready"
+
+    async def generate(self, prompt: str, config: Optional[Dict[str, Any]] = None) -> Any:
+        """One complete response, exposing `text` and (for structured calls) `parsed`."""
+        raise NotImplementedError
+
+    async def open_stream(self, prompt: str, config: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """Start a streamed response; errors opening it are raised here, then text chunks are iterated."""
+        raise NotImplementedError
+
+    async def aclose(self) -> None:
+        pass
+
+class GeminiProvider(AIProvider):
+    """Google Gemini through the shared, pooled SDK client."""
+    name = "gemini"
+
+    def available(self) -> bool:
+        return client_manager.get() is not None
+
+    def unavailable_reason(self) -> str:
+        return f"{AI_API_KEY_ENV} not configured" if AI_SERVICE_AVAILABLE else "google-genai not installed"
+
+    def status(self) -> str:
+        return client_manager.status()
+
+    def _client(self) -> Any:
+        client = client_manager.get()
+        if client is None:
+            raise ProviderError(f"AI service not available - {self.unavailable_reason()}")
+        return client
+
+    def _kwargs(self, prompt: str, config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        kwargs: Dict[str, Any] = {"model": self.model, "contents": prompt}
+        if config is not None:
+            kwargs["config"] = config
+        return kwargs
+
+    async def generate(self, prompt: str, config: Optional[Dict[str, Any]] = None) -> Any:
+        return await self._client().aio.models.generate_content(**self._kwargs(prompt, config))
+
+    async def open_stream(self, prompt: str, config: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        stream = await self._client().aio.models.generate_content_stream(**self._kwargs(prompt, config))
+
+        async def _chunks() -> AsyncIterator[str]:
+            async for chunk in stream:
+                if chunk.text:
+                    yield chunk.text
+
+        return _chunks()
+
+    async def aclose(self) -> None:
+        await client_manager.aclose()
+
+class MockProvider(AIProvider):
+    """
+    Deterministic offline stand-in for load tests, benchmarks and CI.
+    Responses are derived from the prompt alone: structured calls get schema-valid
+    values (one list item per "Filename:" in the prompt, scores from skill overlap
+    with the JD), free-text calls a markdown JD. Latency and 429/503 failures are
+    injected from a seeded RNG as configured by the AI_MOCK_* settings.
+    """
+    name = "mock"
+
+    def __init__(self, model: str):
+        super().__init__(model)
+        self._rng = random.Random(AI_MOCK_SEED)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    async def _simulate(self) -> None:
+        with self._lock:
+            self.calls += 1
+            jitter = self._rng.uniform(-AI_MOCK_JITTER_MS, AI_MOCK_JITTER_MS)
+            roll = self._rng.random()
+        await asyncio.sleep(max(0.0, AI_MOCK_LATENCY_MS + jitter) / 1000)
+        if roll < AI_MOCK_RATE_LIMIT_RATE:
+            raise ProviderError("Mock rate limit exceeded", code=429, retry_after=MOCK_RETRY_AFTER_SECONDS)
+        if roll < AI_MOCK_RATE_LIMIT_RATE + AI_MOCK_FAILURE_RATE:
+            raise ProviderError("Mock server error", code=503)
+
+    def respond(self, prompt: str, config: Optional[Dict[str, Any]] = None) -> ProviderResponse:
+        schema = (config or {}).get("response_schema")
+        if schema is None:
+            return ProviderResponse(_mock_markdown(prompt))
+        adapter = TypeAdapter(schema)
+        value = adapter.validate_python(_mock_value(schema, prompt))
+        return ProviderResponse(adapter.dump_json(value).decode(), value)
+
+    async def generate(self, prompt: str, config: Optional[Dict[str, Any]] = None) -> Any:
+        await self._simulate()
+        return self.respond(prompt, config)
+
+    async def open_stream(self, prompt: str, config: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        await self._simulate()
+        text = self.respond(prompt, config).text
+
+        async def _chunks() -> AsyncIterator[str]:
+            for start in range(0, len(text), MOCK_STREAM_CHUNK_CHARS):
+                await asyncio.sleep(MOCK_STREAM_CHUNK_SECONDS)
+                yield text[start:start + MOCK_STREAM_CHUNK_CHARS]
+
+        return _chunks()
+
+def _mock_markdown(prompt: str) -> str:
+    digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+    skills = extract_skills(prompt)[:8] or ["communication"]
+    lines = [f"# Job Description {digest}", "", "## Overview", "Mock job description generated offline.", "",
+             "## Requirements"]
+    lines += [f"- Hands-on experience with {skill}" for skill in skills]
+    return "\n".join(lines)
+
+def _mock_jd_skills(head: str) -> List[str]:
+    """Skills the prompt lists as required (the matching prompt's REQUIRED SKILLS line), else those in its text."""
+    match = re.search(r"^REQUIRED SKILLS: (\[.*\])$", head, flags=re.MULTILINE)
+    if match:
+        try:
+            return [str(s) for s in ast.literal_eval(match.group(1))]
+        except (ValueError, SyntaxError):
+            pass
+    return extract_skills(head)
+
+def _mock_item(model: Any, jd_skills: List[str], block: str, filename: str) -> Dict[str, Any]:
+    have = set(extract_skills(block))
+    missing = [s for s in jd_skills if s not in have]
+    score = round(100 * (len(jd_skills) - len(missing)) / max(1, len(jd_skills)))
+    values: Dict[str, Any] = {}
+    for field, info in model.model_fields.items():
+        annotation = info.annotation
+        if field == "filename":
+            values[field] = filename
+        elif annotation in (int, float):
+            values[field] = score
+        elif get_origin(annotation) in (list, List):
+            values[field] = missing
+        else:
+            values[field] = f"Mock {field} for {filename}" if filename else f"Mock {field}"
+    return values
+
+def _template_tail(template: str) -> str:
+    """Literal start of the text a prompt template puts after its {candidates} list."""
+    return template.split("{candidates}", 1)[1].strip().split("{", 1)[0]
+
+# The instructions after the candidate list name skills of their own (ML, MLOps, AWS),
+# so the last candidate's block must end where they begin
+_CANDIDATE_LIST_TAILS = tuple(_template_tail(t) for t in (RESUME_MATCHING_USER_TEMPLATE, BATCH_EMAIL_USER_TEMPLATE))
+
+def _strip_candidate_tail(prompt: str) -> str:
+    last = prompt.rfind("\nFilename: ")
+    if last < 0:
+        return prompt
+    for tail in _CANDIDATE_LIST_TAILS:
+        cut = prompt.rfind(f"\n{tail}", last)
+        if cut >= 0:
+            return prompt[:cut]
+    return prompt
+
+def _mock_value(schema: Any, prompt: str) -> Any:
+    parts = re.split(r"^Filename: (.+)$", _strip_candidate_tail(prompt), flags=re.MULTILINE)
+    jd_skills = _mock_jd_skills(parts[0])
+    if get_origin(schema) is list:
+        model = get_args(schema)[0]
+        # parts = [head, filename, block, filename, block, ...]
+        return [_mock_item(model, jd_skills, parts[i + 1], parts[i].strip()) for i in range(1, len(parts), 2)]
+    if isinstance(schema, type) and issubclass(schema, BaseModel):
+        return _mock_item(schema, jd_skills, prompt, "")
+    return None
+
+class OpenAICompatibleProvider(AIProvider):
+    """
+    Chat-completions adapter for a locally hosted OpenAI-compatible server.
+    Structured calls request a JSON-schema response format; servers that ignore it
+    still work because malformed JSON is repaired by the caller.
+    """
+    name = "openai"
+
+    def __init__(self, model: str, base_url: str = AI_OPENAI_BASE_URL, api_key: str = AI_OPENAI_API_KEY):
+        super().__init__(model)
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self._http: Optional[Any] = None
+        self._lock = threading.Lock()
+
+    def status(self) -> str:
+        return "ready" if self._http is not None else "idle"
+
+    def _client(self) -> Any:
+        with self._lock:
+            if self._http is None:
+                import httpx
+                self._http = httpx.AsyncClient(
+                    base_url=self.base_url,
+                    headers={"Authorization": f"Bearer {self.api_key}"} if self.api_key else {},
+                    limits=httpx.Limits(
+                        max_connections=AI_MAX_CONNECTIONS,
+                        max_keepalive_connections=AI_MAX_KEEPALIVE_CONNECTIONS,
+                        keepalive_expiry=AI_KEEPALIVE_EXPIRY_SECONDS,
+                    ),
+                    timeout=None,  # callers enforce their own timeouts
+                )
+                logger.info(f"OpenAI-compatible client initialized for {self.base_url}")
+            return self._http
+
+    def _body(self, prompt: str, config: Optional[Dict[str, Any]], stream: bool) -> Dict[str, Any]:
+        config = config or {}
+        body: Dict[str, Any] = {"model": self.model, "messages": [{"role": "user", "content": prompt}], "stream": stream}
+        if "temperature" in config:
+            body["temperature"] = config["temperature"]
+        if "max_output_tokens" in config:
+            body["max_tokens"] = config["max_output_tokens"]
+        schema = config.get("response_schema")
+        if schema is not None:
+            body["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {"name": "response", "schema": TypeAdapter(schema).json_schema()},
+            }
+        elif config.get("response_mime_type") == "application/json":
+            body["response_format"] = {"type": "json_object"}
+        return body
+
+    @staticmethod
+    async def _raise_for_status(response: Any) -> None:
+        if response.status_code < 400:
+            return
+        await response.aread()
+        retry_after = response.headers.get("retry-after")
+        try:
+            retry_after = float(retry_after) if retry_after else None
+        except ValueError:
+            retry_after = None
+        raise ProviderError(f"HTTP {response.status_code}: {response.text[:200]}", response.status_code, retry_after)
+
+    async def generate(self, prompt: str, config: Optional[Dict[str, Any]] = None) -> Any:
+        response = await self._client().post("/chat/completions", json=self._body(prompt, config, False))
+        await self._raise_for_status(response)
+        body = response.json()
+        text = body["choices"][0]["message"].get("content") or ""
+        usage = body.get("usage") or {}
+        return ProviderResponse(
+            text, _parse_structured(text, (config or {}).get("response_schema")),
+            usage.get("prompt_tokens"), usage.get("completion_tokens"),
+        )
+
+    async def open_stream(self, prompt: str, config: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        client = self._client()
+        request = client.build_request("POST", "/chat/completions", json=self._body(prompt, config, True))
+        response = await client.send(request, stream=True)
+        try:
+            await self._raise_for_status(response)
+        except Exception:
+            await response.aclose()
+            raise
+
+        async def _chunks() -> AsyncIterator[str]:
+            # Server-sent events: "data: {json}" lines, ended by "data: [DONE]"
+            try:
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    choices = json.loads(data).get("choices") or [{}]
+                    delta = (choices[0].get("delta") or {}).get("content")
+                    if delta:
+                        yield delta
+            finally:
+                await response.aclose()
+
+        return _chunks()
+
+    async def aclose(self) -> None:
+        with self._lock:
+            http, self._http = self._http, None
+        if http is not None:
+            await http.aclose()
+            logger.info("OpenAI-compatible client closed")
+
+_PROVIDERS = {"gemini": GeminiProvider, "mock": MockProvider, "openai": OpenAICompatibleProvider}
+_provider: Optional[AIProvider] = None
+
+def get_provider() -> AIProvider:
+    """The process-wide provider selected by AI_PROVIDER (unknown names fall back to gemini)."""
+    global _provider
+    if _provider is None:
+        if AI_PROVIDER not in _PROVIDERS:
+            logger.warning(f"Unknown AI_PROVIDER '{AI_PROVIDER}', using gemini")
+        _provider = _PROVIDERS.get(AI_PROVIDER, GeminiProvider)(AI_MODEL)
+        logger.info(f"AI provider: {_provider.name} (model {_provider.model})")
+    return _provider
@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, TypeVar, Union
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# How often callers queued behind a half-open circuit check the probe's outcome
+PROBE_POLL_SECONDS = 0.5
+
+class RateLimiter:
+    """
+    Async token buckets limiting how many calls, and how many tokens, may start per minute.
+    A rate of 0 or less disables that bucket. Waiters are served in arrival order.
+    `pause` holds every caller back, e.g. while the provider asks clients to back off.
+    """
+
+    def __init__(self, requests_per_minute: float, burst: Optional[int] = None, tokens_per_minute: float = 0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.capacity = float(burst if burst is not None else max(1, int(requests_per_minute / 6)))
+        self.token_capacity = float(tokens_per_minute)
+        self._tokens = self.capacity
+        self._budget = self.token_capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.requests_per_minute > 0 or self.tokens_per_minute > 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.requests_per_minute / 60.0)
+        self._budget = min(self.token_capacity, self._budget + elapsed * self.tokens_per_minute / 60.0)
+        self._updated = now
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _wait_time(self, tokens: float) -> float:
+        """Seconds until a call of `tokens` tokens may start; 0 means now."""
+        wait = self._paused_until - time.monotonic()
+        if self.requests_per_minute > 0 and self._tokens < 1.0:
+            wait = max(wait, (1.0 - self._tokens) / (self.requests_per_minute / 60.0))
+        if self.tokens_per_minute > 0 and self._budget < tokens:
+            wait = max(wait, (tokens - self._budget) / (self.tokens_per_minute / 60.0))
+        return wait
+
+    async def acquire(self, tokens: float = 0) -> None:
+        """Wait until a call estimated at `tokens` (prompt + output) tokens may start."""
+        if not self.enabled and time.monotonic() >= self._paused_until:
+            return
+        # A call larger than the whole bucket only has to wait for a full one
+        tokens = min(tokens, self.token_capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                wait = self._wait_time(tokens)
+                if wait <= 0:
+                    if self.requests_per_minute > 0:
+                        self._tokens -= 1.0
+                    if self.tokens_per_minute > 0:
+                        self._budget -= tokens
+                    return
+                logger.debug(f"Rate limit reached, waiting {wait:.2f}s")
+                await asyncio.sleep(wait)
+
+class CircuitOpenError(Exception):
+    """Raised when the provider circuit is open for longer than the caller is willing to wait."""
+
+class CircuitBreaker:
+    """
+    Stops calling a provider after `failure_threshold` consecutive failures.
+    While open, callers queue until `reset_seconds` have passed; then a single probe
+    call is let through (half-open) and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if self._probing or time.monotonic() >= self._opened_at + self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    async def wait(self, max_wait: float) -> None:
+        """Wait until a call may be made; raises CircuitOpenError if that takes longer than `max_wait`."""
+        if self.failure_threshold <= 0:
+            return
+        deadline = time.monotonic() + max_wait
+        while self._opened_at is not None:
+            now = time.monotonic()
+            if not self._probing and now >= self._opened_at + self.reset_seconds:
+                self._probing = True
+                return
+            retry_at = now + PROBE_POLL_SECONDS if self._probing else self._opened_at + self.reset_seconds
+            if retry_at > deadline:
+                raise CircuitOpenError(f"circuit open after {self._failures} consecutive failures")
+            await asyncio.sleep(retry_at - now)
+
+    def record_success(self) -> None:
+        if self._opened_at is not None:
+            logger.info("Circuit closed after a successful call")
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._probing or (self._opened_at is None and self._failures >= self.failure_threshold > 0):
+            logger.warning(f"Circuit opened after {self._failures} consecutive failures, pausing calls for {self.reset_seconds:g}s")
+            self._opened_at = time.monotonic()
+        self._probing = False
+
+    def release_probe(self) -> None:
+        """Give up the half-open probe without an outcome (e.g. the probe was cancelled)."""
+        self._probing = False
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Full-jitter exponential backoff: a random delay up to min(cap, base * 2**attempt)."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+_rate_limiters: Dict[str, RateLimiter] = {}
+
+_circuit_breakers: Dict[str, CircuitBreaker] = {}
+
+def get_rate_limiter(provider: str, requests_per_minute: float, tokens_per_minute: float = 0) -> RateLimiter:
+    """Return the process-wide limiter for `provider`, creating it on first use."""
+    limiter = _rate_limiters.get(provider)
+    if limiter is None:
+        limiter = RateLimiter(requests_per_minute, tokens_per_minute=tokens_per_minute)
+        _rate_limiters[provider] = limiter
+    return limiter
+
+def get_circuit_breaker(provider: str, failure_threshold: int, reset_seconds: float) -> CircuitBreaker:
+    """Return the process-wide circuit breaker for `provider`, creating it on first use."""
+    breaker = _circuit_breakers.get(provider)
+    if breaker is None:
+        breaker = CircuitBreaker(failure_threshold, reset_seconds)
+        _circuit_breakers[provider] = breaker
+    return breaker
+
+async def run_bounded(factories: Sequence[Callable[[], Awaitable[T]]],
+                      limit: Union[int, asyncio.Semaphore]) -> List[T]:
+    """
+    Run the coroutines produced by `factories` concurrently, at most `limit` at a time.
+    `limit` may also be a semaphore shared with other fan-outs, so nested ones stay
+    under one cap. Results are returned in the same order as `factories`, regardless
+    of completion order. If any of them fails (or the caller is cancelled), the
+    remaining ones are cancelled.
+    """
+    semaphore = limit if isinstance(limit, asyncio.Semaphore) else asyncio.Semaphore(max(1, limit))
+
+    async def _run(factory: Callable[[], Awaitable[T]]) -> T:
+        async with semaphore:
+            return await factory()
+
+    tasks = [asyncio.ensure_future(_run(f)) for f in factories]
+    try:
+        return list(await asyncio.gather(*tasks))
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
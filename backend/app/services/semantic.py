@@ -0,0 +1,313 @@
+import asyncio
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from collections import Counter
+from typing import Any, List, Optional, Tuple
+import numpy as np
+from .cache import content_hash
+from .matching import MatchItem, score_resumes_against_jd
+from .prompt_budget import clean_document, split_sections, PRIORITY_LOW
+from .skills import extract_skills
+
+logger = logging.getLogger(__name__)
+
+# "hashing" (built in, no model download) or a sentence-transformers model name, e.g. all-MiniLM-L6-v2
+SEMANTIC_MODEL = os.getenv("SEMANTIC_MODEL", "hashing")
+SEMANTIC_INDEX_DIR = os.getenv("SEMANTIC_INDEX_DIR", "semantic_index")
+SEMANTIC_INDEX_MAX_BYTES = int(os.getenv("SEMANTIC_INDEX_MAX_BYTES", str(256 * 1024 * 1024)))
+SEMANTIC_CHUNK_WORDS = int(os.getenv("SEMANTIC_CHUNK_WORDS", "40"))
+# Share of the semantic score in the pre-ranking score; the rest is skill overlap
+PRERANK_SEMANTIC_WEIGHT = float(os.getenv("PRERANK_SEMANTIC_WEIGHT", "0.5"))
+
+SEMANTIC_HASH_DIM = 1024
+SEMANTIC_MAX_REQUIREMENTS = 50  # JD lines compared against each resume
+SEMANTIC_MAX_CHUNKS = 100  # chunks embedded per resume
+SEMANTIC_BATCH_ROWS = 4096  # resume chunks per similarity matrix product
+SEMANTIC_ENCODE_BATCH = 32  # texts per sentence-transformers forward pass
+
+_WORD_RE = re.compile(r"[a-z0-9+#]+")
+_BULLET_RE = re.compile(r"^[\s\-*•#>\d.)]+")
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "in", "is", "it", "its",
+    "of", "on", "or", "our", "that", "the", "their", "this", "to", "we", "will", "with", "you", "your",
+}
+
+class HashingEmbedder:
+    """
+    Model-free embedding: signed feature hashing of word stems, stem bigrams and
+    canonical skill names, L2-normalised. Catches shared vocabulary and inflections
+    ("developed"/"development") and skill aliases, not true paraphrases.
+    """
+    # Cosine at which a JD requirement counts as covered by a resume chunk
+    match_threshold = 0.3
+
+    def __init__(self, dim: int = SEMANTIC_HASH_DIM):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    @staticmethod
+    def _features(text: str) -> List[str]:
+        stems = [w[:6] for w in _WORD_RE.findall(text.lower()) if w not in _STOPWORDS]
+        features = stems + [f"{a} {b}" for a, b in zip(stems, stems[1:])]
+        # Skills weigh double so aliases ("k8s", "Kubernetes") land on the same features
+        features += [f"skill:{s}" for s in extract_skills(text)] * 2
+        return features
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, count in Counter(self._features(text)).items():
+                h = zlib.crc32(feature.encode("utf-8"))
+                out[row, h % self.dim] += (1.0 if h & 0x80000000 else -1.0) * (1.0 + math.log(count))
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.maximum(norms, 1e-12)
+
+class SentenceTransformerEmbedder:
+    """Local CPU sentence-transformers model (optional dependency)."""
+    match_threshold = 0.5
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+        self._model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self._model.get_sentence_embedding_dimension()
+        self.name = f"st-{re.sub(r'[^A-Za-z0-9_.-]+', '_', model_name)}-{self.dim}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = self._model.encode(
+            texts, batch_size=SEMANTIC_ENCODE_BATCH, normalize_embeddings=True, convert_to_numpy=True
+        )
+        return vectors.astype(np.float32, copy=False)
+
+_embedder: Optional[Any] = None
+_embedder_lock = threading.Lock()
+
+def get_embedder() -> Any:
+    """The configured embedder, loaded once; falls back to hashing if the model cannot be loaded."""
+    global _embedder
+    with _embedder_lock:
+        if _embedder is None:
+            if SEMANTIC_MODEL == "hashing":
+                _embedder = HashingEmbedder()
+            else:
+                try:
+                    _embedder = SentenceTransformerEmbedder(SEMANTIC_MODEL)
+                except Exception as e:
+                    logger.warning(f"Could not load embedding model {SEMANTIC_MODEL} ({e}), using hashing embeddings")
+                    _embedder = HashingEmbedder()
+            logger.info(f"Semantic matching uses {_embedder.name} embeddings")
+        return _embedder
+
+class VectorIndex:
+    """
+    On-disk store of resume chunk embeddings, keyed by resume content hash.
+    Vectors are appended to a float32 file read through a NumPy memmap; each
+    document's row range lives in SQLite, whose write transaction also serialises
+    appends between processes. When the file would exceed `max_bytes` the index
+    starts over (rows are overwritten from the beginning).
+    """
+
+    def __init__(self, directory: str, dim: int, max_bytes: int = SEMANTIC_INDEX_MAX_BYTES):
+        os.makedirs(directory, exist_ok=True)
+        self.dim = dim
+        self.max_rows = max(1, max_bytes // (dim * 4))
+        self._path = os.path.join(directory, "vectors.f32")
+        self._lock = threading.Lock()
+        self._map: Optional[np.memmap] = None
+        self._conn = sqlite3.connect(os.path.join(directory, "index.sqlite3"), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS docs (key TEXT PRIMARY KEY, start INTEGER NOT NULL, count INTEGER NOT NULL)")
+        if not os.path.exists(self._path):
+            open(self._path, "wb").close()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            row = self._conn.execute("SELECT start, count FROM docs WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            start, count = row
+            if self._map is None or self._map.shape[0] < start + count:
+                # The file grew (here or in another process) since it was mapped
+                rows = os.path.getsize(self._path) // (self.dim * 4)
+                self._map = np.memmap(self._path, dtype=np.float32, mode="r", shape=(rows, self.dim)) if rows else None
+            if self._map is None or self._map.shape[0] < start + count:
+                return None
+            return np.array(self._map[start:start + count])
+
+    def add(self, key: str, vectors: np.ndarray) -> None:
+        count = len(vectors)
+        if count == 0 or count > self.max_rows:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                start = self._conn.execute("SELECT COALESCE(MAX(start + count), 0) FROM docs").fetchone()[0]
+                if start + count > self.max_rows:
+                    logger.info(f"Semantic index is full ({start} rows), starting over")
+                    self._conn.execute("DELETE FROM docs")
+                    start = 0
+                with open(self._path, "r+b") as f:
+                    f.seek(start * self.dim * 4)
+                    f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+                self._conn.execute("INSERT OR REPLACE INTO docs (key, start, count) VALUES (?, ?, ?)", (key, start, count))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def close(self) -> None:
+        self._conn.close()
+
+_index: Optional[VectorIndex] = None
+
+def get_vector_index() -> VectorIndex:
+    global _index
+    embedder = get_embedder()
+    with _embedder_lock:
+        if _index is None:
+            _index = VectorIndex(os.path.join(SEMANTIC_INDEX_DIR, embedder.name), embedder.dim)
+        return _index
+
+def _clean_line(line: str) -> str:
+    return _BULLET_RE.sub("", line).strip()
+
+def _split_words(line: str) -> List[str]:
+    words = line.split()
+    return [" ".join(words[i:i + SEMANTIC_CHUNK_WORDS]) for i in range(0, len(words), SEMANTIC_CHUNK_WORDS)]
+
+def jd_requirements(jd_text: str) -> Tuple[List[str], List[float]]:
+    """
+    The JD lines a resume is compared against, weighted by their section's priority.
+    Low-priority sections (benefits, about us) and header-like lines are skipped.
+    """
+    lines: List[str] = []
+    weights: List[float] = []
+    for section in split_sections(clean_document(jd_text)):
+        if section.priority <= PRIORITY_LOW:
+            continue
+        for line in section.lines:
+            for part in _split_words(_clean_line(line)):
+                if len(part.split()) >= 3:
+                    lines.append(part)
+                    weights.append(float(section.priority))
+    if not lines and jd_text.strip():
+        lines = _split_words(jd_text)[:SEMANTIC_MAX_REQUIREMENTS]
+        return lines, [1.0] * len(lines)
+    return lines[:SEMANTIC_MAX_REQUIREMENTS], weights[:SEMANTIC_MAX_REQUIREMENTS]
+
+def resume_chunks(text: str) -> List[str]:
+    """Consecutive lines of the cleaned resume grouped into chunks of about SEMANTIC_CHUNK_WORDS words."""
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+    for line in clean_document(text).splitlines():
+        for part in _split_words(_clean_line(line)):
+            current.append(part)
+            size += len(part.split())
+            if size >= SEMANTIC_CHUNK_WORDS:
+                chunks.append(" ".join(current))
+                current, size = [], 0
+    if current:
+        chunks.append(" ".join(current))
+    return chunks[:SEMANTIC_MAX_CHUNKS]
+
+def _resume_vectors(resumes_text: List[str]) -> List[np.ndarray]:
+    """Chunk embeddings of every resume, from the index or embedded in one batch and indexed."""
+    embedder = get_embedder()
+    index = get_vector_index()
+    keys = [content_hash(f"{SEMANTIC_CHUNK_WORDS}:{txt}".encode("utf-8")) for txt in resumes_text]
+    vectors: List[Optional[np.ndarray]] = [index.get(key) for key in keys]
+    missing = [i for i, v in enumerate(vectors) if v is None]
+    if missing:
+        chunks = [resume_chunks(resumes_text[i]) for i in missing]
+        flat = [c for doc in chunks for c in doc]
+        embedded = embedder.embed(flat) if flat else np.zeros((0, embedder.dim), dtype=np.float32)
+        offset = 0
+        for i, doc in zip(missing, chunks):
+            vectors[i] = embedded[offset:offset + len(doc)]
+            offset += len(doc)
+            index.add(keys[i], vectors[i])
+    logger.info(f"Semantic vectors: {len(resumes_text) - len(missing)} resumes from index, {len(missing)} embedded")
+    return vectors
+
+def semantic_similarity(jd_text: str, resumes_text: List[str]) -> List[Tuple[float, int, str]]:
+    """
+    Per resume: coverage score (0-100), number of JD requirements covered and the
+    best-covered requirement. Each requirement takes its best cosine similarity over
+    the resume's chunks (batched matrix products over all resumes); the score is the
+    priority-weighted mean of min(similarity / threshold, 1).
+    """
+    embedder = get_embedder()
+    requirements, weights = jd_requirements(jd_text)
+    if not requirements:
+        return [(0.0, 0, "") for _ in resumes_text]
+    req = embedder.embed(requirements)
+    w = np.array(weights, dtype=np.float32)
+    vectors = _resume_vectors(resumes_text)
+
+    best = np.zeros((len(resumes_text), len(requirements)), dtype=np.float32)
+    batch: List[int] = []
+    rows = 0
+
+    def _flush() -> None:
+        block = np.concatenate([vectors[i] for i in batch])
+        sims = block @ req.T
+        offsets = np.cumsum([0] + [len(vectors[i]) for i in batch[:-1]])
+        best[batch] = np.maximum.reduceat(sims, offsets, axis=0)
+
+    for i, v in enumerate(vectors):
+        if not len(v):
+            continue
+        batch.append(i)
+        rows += len(v)
+        if rows >= SEMANTIC_BATCH_ROWS:
+            _flush()
+            batch, rows = [], 0
+    if batch:
+        _flush()
+
+    coverage = np.minimum(np.maximum(best, 0.0) / embedder.match_threshold, 1.0)
+    scores = 100.0 * (coverage @ w) / w.sum()
+    covered = (best >= embedder.match_threshold).sum(axis=1)
+    top = best.argmax(axis=1)
+    return [
+        (round(float(scores[i]), 2), int(covered[i]), requirements[top[i]] if len(vectors[i]) else "")
+        for i in range(len(resumes_text))
+    ]
+
+def _remarks(covered: int, total: int, closest: str) -> str:
+    remarks = f"covers {covered} of {total} JD requirements"
+    if closest:
+        remarks += f", closest to \"{closest[:80]}\""
+    return remarks
+
+async def semantic_match_resumes(jd_text: str, resumes_text: List[str],
+                                 jd_skills: Optional[List[str]] = None) -> List[MatchItem]:
+    """
+    Score resumes by embedding similarity alone, without any AI call. Missing skills
+    come from skill overlap. Embedding and scoring run in a worker thread.
+    """
+    items = await score_resumes_against_jd(jd_text, resumes_text, jd_skills)
+    total = len(jd_requirements(jd_text)[0])
+    similarities = await asyncio.to_thread(semantic_similarity, jd_text, resumes_text)
+    for item, (score, covered, closest) in zip(items, similarities):
+        item.score = score
+        item.remarks = _remarks(covered, total, closest)
+    return items
+
+async def semantic_prerank(jd_text: str, resumes_text: List[str], top_k: int,
+                           jd_skills: Optional[List[str]] = None) -> Tuple[List[int], List[MatchItem]]:
+    """
+    Drop-in alternative to matching.prerank_resumes that blends skill overlap with
+    semantic similarity (PRERANK_SEMANTIC_WEIGHT) instead of BM25.
+    """
+    items = await score_resumes_against_jd(jd_text, resumes_text, jd_skills)
+    similarities = await asyncio.to_thread(semantic_similarity, jd_text, resumes_text)
+    for item, (score, _, _) in zip(items, similarities):
+        item.score = round((1 - PRERANK_SEMANTIC_WEIGHT) * item.score + PRERANK_SEMANTIC_WEIGHT * score, 2)
+    order = sorted(range(len(items)), key=lambda i: (-items[i].score, i))
+    return order[:top_k], items
@@ -0,0 +1,81 @@
+import json
+import logging
+import os
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TAXONOMY_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "skills.json")
+SKILL_TAXONOMY_PATH = os.getenv("SKILL_TAXONOMY_PATH", DEFAULT_TAXONOMY_PATH)
+
+# "/" separates skills ("Python/Django", "AWS/GCP"); "shadcn/ui" matches through its "shadcn ui" alias
+_TOKEN_RE = re.compile(r"[a-z0-9+#.]+")
+
+def _tokenize(text: str) -> List[str]:
+    # A trailing period ("Python.") is sentence noise, not part of the skill
+    tokens = (t.rstrip(".") for t in _TOKEN_RE.findall(text.lower()))
+    return [t for t in tokens if t]
+
+class SkillMatcher:
+    """
+    Multi-word skill matcher compiled once from a taxonomy of canonical names and aliases.
+    Phrases are stored in a token trie; `extract` scans the text in one pass, taking the
+    longest phrase starting at each token, and reports canonical names in first-seen order.
+    """
+
+    def __init__(self, taxonomy: Dict[str, List[str]]):
+        self.canonical = list(taxonomy)
+        self._trie: Dict[str, dict] = {}
+        self.max_phrase_len = 1
+        for canonical, aliases in taxonomy.items():
+            for phrase in [canonical, *aliases]:
+                tokens = _tokenize(phrase)
+                if not tokens:
+                    continue
+                node = self._trie
+                for tok in tokens:
+                    node = node.setdefault(tok, {})
+                node[None] = canonical
+                self.max_phrase_len = max(self.max_phrase_len, len(tokens))
+
+    def extract(self, text: str) -> List[str]:
+        tokens = _tokenize(text)
+        seen = set()
+        out: List[str] = []
+        i = 0
+        while i < len(tokens):
+            node = self._trie
+            match: Optional[str] = None
+            length = 0
+            for j in range(i, min(i + self.max_phrase_len, len(tokens))):
+                node = node.get(tokens[j])
+                if node is None:
+                    break
+                if None in node:
+                    match, length = node[None], j - i + 1
+            if match is None:
+                i += 1
+                continue
+            if match not in seen:
+                seen.add(match)
+                out.append(match)
+            i += length
+        return out
+
+def load_taxonomy(path: str) -> Dict[str, List[str]]:
+    """Load a {canonical skill: [aliases]} JSON taxonomy; canonical names are lowercased."""
+    with open(path, encoding="utf-8") as fh:
+        raw = json.load(fh)
+    return {str(k).strip().lower(): [str(a).strip().lower() for a in v] for k, v in raw.items()}
+
+@lru_cache(maxsize=1)
+def get_skill_matcher() -> SkillMatcher:
+    taxonomy = load_taxonomy(SKILL_TAXONOMY_PATH)
+    logger.info(f"Loaded {len(taxonomy)} skills from {SKILL_TAXONOMY_PATH}")
+    return SkillMatcher(taxonomy)
+
+def extract_skills(text: str) -> List[str]:
+    """Canonical skills mentioned in `text`, in order of first appearance."""
+    return get_skill_matcher().extract(text)
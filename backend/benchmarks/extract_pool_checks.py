@@ -0,0 +1,107 @@
+"""
+Checks for the extraction worker pool (app/services/extract.py) under more documents than workers.
+
+Run from backend/:  python -m benchmarks.extract_pool_checks
+
+The timeout is scaled to the measured parse time of one synthetic PDF, then:
+
+1. queued      one worker, four documents that each parse well within the timeout but
+               not all four together: every one must succeed without a pool restart.
+2. timeout     two workers, five normal documents and one that parses past the timeout:
+               only the slow one fails (with ExtractionError), the others are
+               re-submitted after the restart and succeed; nothing raises CancelledError.
+3. reset       resetting an already killed pool is a no-op.
+
+Exits 1 when a check fails.
+"""
+import asyncio
+import sys
+import time
+from typing import List
+
+from app.services import extract
+from app.services.extract import ExtractionError, extract_text_from_bytes, shutdown_extraction_pool
+from benchmarks.match_pipeline import _pdf_bytes
+
+# Lines of a normal document; the slow one has SLOW_FACTOR times as many
+DOC_LINES = 4000
+SLOW_FACTOR = 6
+# Timeout as a multiple of one document's parse time
+TIMEOUT_FACTOR = 2.0
+
+def _pdf(tag: str, lines: int) -> bytes:
+    return _pdf_bytes([f"{tag} line {i}: built data pipelines with Python and AWS" for i in range(lines)],
+                      lines_per_page=max(1, lines // extract.MAX_PDF_PAGES))
+
+def _count_resets() -> List[int]:
+    resets = [0]
+    reset = extract._reset_pool
+
+    def _counting(pool):
+        resets[0] += 1
+        reset(pool)
+
+    extract._reset_pool = _counting
+    return resets
+
+async def _parse_seconds() -> float:
+    await extract_text_from_bytes("warmup.pdf", _pdf("warmup", 10))
+    start = time.perf_counter()
+    await extract_text_from_bytes("probe.pdf", _pdf("probe", DOC_LINES))
+    return time.perf_counter() - start
+
+async def _extract_all(files) -> List[object]:
+    return await asyncio.gather(*(extract_text_from_bytes(name, data) for name, data in files),
+                                return_exceptions=True)
+
+def _queued(timeout: float) -> List[str]:
+    extract.EXTRACT_WORKERS = 1
+    resets = _count_resets()
+    results = asyncio.run(_extract_all([(f"q{i}.pdf", _pdf(f"q{i}", DOC_LINES)) for i in range(4)]))
+    shutdown_extraction_pool()
+    problems = [f"{type(r).__name__}: {r}" for r in results if isinstance(r, BaseException)]
+    if resets[0]:
+        problems.append(f"pool restarted {resets[0]} times")
+    return problems
+
+def _timeout(timeout: float) -> List[str]:
+    extract.EXTRACT_WORKERS = 2
+    files = [(f"t{i}.pdf", _pdf(f"t{i}", DOC_LINES)) for i in range(5)]
+    files.insert(1, ("slow.pdf", _pdf("slow", DOC_LINES * SLOW_FACTOR)))
+    results = asyncio.run(_extract_all(files))
+    shutdown_extraction_pool()
+    problems = []
+    for (name, _), result in zip(files, results):
+        failed = isinstance(result, BaseException)
+        if name == "slow.pdf" and not (isinstance(result, ExtractionError) and "timed out" in str(result)):
+            problems.append(f"slow.pdf: expected a timeout, got {type(result).__name__}")
+        elif name != "slow.pdf" and failed:
+            problems.append(f"{name}: {type(result).__name__}: {result}")
+    return problems
+
+def _reset(timeout: float) -> List[str]:
+    pool = extract._get_pool()
+    try:
+        extract._reset_pool(pool)
+        extract._reset_pool(pool)
+    except Exception as e:
+        return [f"second reset raised {type(e).__name__}: {e}"]
+    return [] if extract._get_pool() is not pool else ["pool was not replaced"]
+
+def main() -> None:
+    extract.EXTRACT_WORKERS = 1
+    seconds = asyncio.run(_parse_seconds())
+    shutdown_extraction_pool()
+    extract.EXTRACT_TIMEOUT_SECONDS = timeout = max(0.5, seconds * TIMEOUT_FACTOR)
+    print(f"one document parses in {seconds:.2f}s, timeout {timeout:.2f}s")
+
+    failures = 0
+    for name, case in (("queued", _queued), ("timeout", _timeout), ("reset", _reset)):
+        problems = case(timeout)
+        failures += bool(problems)
+        print(f"{'FAIL' if problems else 'ok':5}{name}" + "".join(f"\n     {p}" for p in problems))
+    shutdown_extraction_pool()
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Fuzz and timing checks for the JSON repair parser (app/services/json_stream.py).
+
+Run from backend/:  python -m benchmarks.json_stream_fuzz [--cases N] [--seed S]
+
+1. Mutates valid matching responses the way models break them (fences, prose,
+   truncation, trailing/missing commas, unquoted values, Python literals, raw
+   newlines) and checks that parsing never raises anything but ValueError and that
+   every element before a truncation point is recovered.
+2. Times repair_json/parse_json_array on growing and pathological inputs and fails
+   if the time per character grows with input size (i.e. the parser is not linear).
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from typing import Callable, List
+
+from app.services.json_stream import JSONStreamParser, parse_json, parse_json_array, repair_json
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+# Allowed growth of time-per-character between the smallest and largest input
+MAX_SLOWDOWN = 4.0
+
+def _result(i: int) -> dict:
+    return {
+        "filename": f"resume_{i}.pdf",
+        "score": random.randint(0, 100),
+        "missing_skills": random.sample(["Docker", "Kubernetes", "AWS", "Go", "SQL"], k=random.randint(0, 3)),
+        "remarks": random.choice(["Strong backend fit.", "Lacks cloud \"ops\" experience.", "Good, but junior\\entry level."]),
+    }
+
+def _mutations() -> List[Callable[[str], str]]:
+    return [
+        lambda s: f"```json\n{s}\n```",
+        lambda s: f"Here are the results:\n{s}\nLet me know if you need more.",
+        lambda s: s.replace("}", "},", 1).replace("]", ",]", 1),
+        lambda s: s.replace("}, {", "} {"),
+        lambda s: s.replace('"score"', "score"),
+        lambda s: s.replace("true", "True").replace("null", "None"),
+        lambda s: s.replace(". ", ".\n"),
+        lambda s: s.replace('", "', '" is missing, "'),
+    ]
+
+def fuzz(cases: int) -> int:
+    failures = 0
+    mutations = _mutations()
+    for case in range(cases):
+        items = [_result(i) for i in range(random.randint(1, 12))]
+        text = json.dumps(items)
+        for mutate in random.sample(mutations, k=random.randint(0, 3)):
+            text = mutate(text)
+        cut = random.randint(1, len(text)) if random.random() < 0.5 else len(text)
+        text = text[:cut]
+        try:
+            parsed = parse_json_array(text)
+            parse_json(text)
+        except ValueError:
+            parsed = []
+        except Exception as e:  # anything else is a parser bug
+            failures += 1
+            print(f"case {case}: {type(e).__name__}: {e}\n  input: {text[:200]!r}")
+            continue
+        # Streaming in random chunk sizes must give the same elements as parsing at once
+        parser = JSONStreamParser()
+        streamed, pos = [], 0
+        while pos < len(text):
+            step = random.randint(1, 64)
+            streamed += parser.feed(text[pos:pos + step])
+            pos += step
+        streamed += parser.close()
+        if streamed != parsed:
+            failures += 1
+            print(f"case {case}: streamed elements differ from one-shot parse\n  input: {text[:200]!r}")
+        # Every object that was complete before the cut must come back with its filename
+        complete = text.count("}")
+        recovered = [p for p in parsed if isinstance(p, dict) and "filename" in p]
+        if len(recovered) < min(complete, len(items)) - 1:
+            failures += 1
+            print(f"case {case}: recovered {len(recovered)} of {complete} complete objects\n  input: {text[:200]!r}")
+    return failures
+
+def _inputs(size: int) -> dict:
+    one = json.dumps(_result(0))
+    return {
+        "valid array": "[" + ", ".join([one] * (size // len(one))) + "]",
+        "truncated array": ("[" + ", ".join([one] * (size // len(one))))[: size - 7],
+        "deep nesting": "[" * size,
+        "unterminated string": '["' + "x" * size,
+        "escapes": '["' + "\\" * size,
+        "bare words": "[" + "word " * (size // 5),
+        "commas": "[" + "," * size + "]",
+        "closers": "[1" + "}" * size,
+    }
+
+def _time(fn: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+def bench() -> int:
+    failures = 0
+    rows = {}
+    for size in SIZES:
+        for name, text in _inputs(size).items():
+            elapsed = min(_time(lambda: repair_json(text)) for _ in range(3))
+            elapsed_stream = min(_time(lambda: parse_json_array(text)) for _ in range(3))
+            rows.setdefault(name, []).append((size, elapsed, elapsed_stream))
+    print(f"{'input':<22}" + "".join(f"{size:>22,}" for size in SIZES))
+    for name, timings in rows.items():
+        print(f"{name:<22}" + "".join(f"{t * 1000:>10.1f}/{s * 1000:>8.1f} ms" for _, t, s in timings))
+        (small, t0, s0), (large, t1, s1) = timings[1], timings[-1]
+        for label, a, b in (("repair_json", t0, t1), ("parse_json_array", s0, s1)):
+            slowdown = (b / large) / max(a / small, 1e-9)
+            if slowdown > MAX_SLOWDOWN:
+                failures += 1
+                print(f"  {label} on {name!r} is superlinear: {slowdown:.1f}x slower per character at {large:,}")
+    return failures
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    random.seed(args.seed)
+    failures = fuzz(args.cases)
+    print(f"fuzz: {args.cases} cases, {failures} failures")
+    failures += bench()
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+"""
+End-to-end benchmark of the /api/match pipeline.
+
+Run from backend/:  python -m benchmarks.match_pipeline [--sizes 1 10 100 1000] [--check]
+
+Generates synthetic JD and resume corpora (PDF, DOCX and TXT in small, medium and
+large sizes), drives the FastAPI app in-process over ASGI with the mock AI
+provider (AI_PROVIDER=mock, latency from --latency-ms), and reports per stage:
+
+  http        multipart parsing, response validation and serialization (request minus pipeline)
+  extract     text extraction of the uploads (extract_texts_from_uploads)
+  prerank     local pre-ranking (skill overlap + BM25 or semantic)
+  ai_match    AI scoring of the shortlist (ai_match_resumes)
+  emails      email fan-out (generate_candidate_emails)
+  total       the whole request as seen by the client
+
+p50/p95/p99 latency over --reps runs per size (every run uploads freshly generated
+documents, so no cache is hit), throughput in resumes per second and, from one
+extra run under tracemalloc, the peak memory allocated in each stage. Extraction
+runs in worker processes, so its parsing memory is not included.
+
+Thresholds: --check compares the p95 latency and peak memory of every stage with
+benchmarks/match_thresholds.json and exits 1 on a regression;
+--write-thresholds stores the current results (with THRESHOLD_HEADROOM) there.
+Thresholds are machine dependent; regenerate them on the machine that tracks them.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+SIZES = [1, 10, 100, 1000]
+DEFAULT_REPS = {1: 10, 10: 5, 100: 3, 1000: 1}
+STAGES = ["http", "extract", "prerank", "ai_match", "emails", "total"]
+THRESHOLDS_PATH = os.path.join(os.path.dirname(__file__), "match_thresholds.json")
+# Thresholds are written this much above the measured values
+THRESHOLD_HEADROOM = 2.0
+# Smallest thresholds written, so tiny stages don't fail on timer noise
+MIN_THRESHOLD_MS = 25.0
+MIN_THRESHOLD_MB = 1.0
+
+FORMATS = ["pdf", "docx", "txt"]
+# Bullet points per experience entry and number of entries, per document size
+DOC_SIZES = {"small": (3, 1), "medium": (5, 3), "large": (8, 8)}
+
+_VERBS = ["Built", "Designed", "Led", "Maintained", "Optimised", "Migrated", "Automated", "Shipped", "Scaled", "Tested"]
+_OBJECTS = ["REST APIs", "data pipelines", "CI/CD workflows", "customer dashboards", "payment services",
+            "search features", "internal tooling", "mobile apps", "reporting jobs", "auth flows"]
+_OUTCOMES = ["cutting latency by 40%", "for 2M monthly users", "with 99.9% uptime", "saving 10 hours a week",
+             "across three teams", "ahead of schedule", "reducing costs by 25%", "in a regulated environment"]
+
+def _configure_env(tmp: str, latency_ms: float) -> None:
+    """Settings for an isolated, cache-free run; must happen before the app is imported."""
+    os.environ.setdefault("AI_PROVIDER", "mock")
+    os.environ["AI_MOCK_LATENCY_MS"] = str(latency_ms)
+    os.environ.setdefault("AI_CACHE_BACKEND", "none")
+    os.environ.setdefault("JOBS_DB_PATH", os.path.join(tmp, "jobs.sqlite3"))
+    os.environ.setdefault("CANDIDATES_DB_PATH", os.path.join(tmp, "candidates.sqlite3"))
+    os.environ.setdefault("SEMANTIC_INDEX_DIR", os.path.join(tmp, "semantic_index"))
+    os.environ.setdefault("EXTRACT_CACHE_DIR", "")
+
+# --- synthetic corpora ---
+
+def _resume_lines(rng: random.Random, skills: List[str], size: str, tag: str) -> List[str]:
+    bullets, entries = DOC_SIZES[size]
+    name = f"Candidate {tag}"
+    own = rng.sample(skills, k=rng.randint(3, 12))
+    lines = [name, f"Software engineer ({tag})", "", "SUMMARY",
+             f"Engineer with {rng.randint(1, 15)} years of experience in {', '.join(own[:3])}.", "",
+             "SKILLS", ", ".join(own), "", "EXPERIENCE"]
+    for entry in range(entries):
+        lines.append(f"Company {rng.randint(1, 500)} - Engineer ({2010 + entry} - {2011 + entry})")
+        for _ in range(bullets):
+            lines.append(f"- {rng.choice(_VERBS)} {rng.choice(_OBJECTS)} with {rng.choice(own)} {rng.choice(_OUTCOMES)}")
+    lines += ["", "EDUCATION", f"B.Sc. Computer Science, University {rng.randint(1, 90)}"]
+    return lines
+
+def _jd_text(rng: random.Random, skills: List[str]) -> str:
+    required = rng.sample(skills, k=8)
+    lines = ["# Senior Backend Engineer", "**Acme Corp**", "", "## Responsibilities"]
+    lines += [f"- {rng.choice(_VERBS)} {rng.choice(_OBJECTS)} {rng.choice(_OUTCOMES)}" for _ in range(6)]
+    lines += ["", "## Requirements"] + [f"- Strong experience with {s}" for s in required]
+    lines += ["", "## Benefits", "- Remote friendly", "- Learning budget"]
+    return "\n".join(lines)
+
+def _pdf_bytes(lines: List[str], lines_per_page: int = 50) -> bytes:
+    """Minimal text PDF (Helvetica, one text object per page) that pypdf can extract."""
+    def _escape(text: str) -> str:
+        return text.encode("latin-1", "replace").decode("latin-1").replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+    objects: List[bytes] = []
+    page_ids = [4 + 2 * i for i in range(len(pages))]
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    objects.append(f"<< /Type /Pages /Kids [{' '.join(f'{p} 0 R' for p in page_ids)}] /Count {len(pages)} >>".encode())
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for page_id, page in zip(page_ids, pages):
+        text = "BT /F1 10 Tf 12 TL 50 780 Td " + " ".join(f"({_escape(line)}) '" for line in page) + " ET"
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] /Resources << /Font << /F1 3 0 R >> >> "
+            f"/Contents {page_id + 1} 0 R >>".encode()
+        )
+        stream = text.encode("latin-1")
+        objects.append(b"<< /Length " + str(len(stream)).encode() + b" >>\nstream\n" + stream + b"\nendstream")
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(f"{number} 0 obj\n".encode() + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    for offset in offsets:
+        out.write(f"{offset:010d} 00000 n \n".encode())
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return out.getvalue()
+
+def _docx_bytes(lines: List[str]) -> bytes:
+    from docx import Document
+    document = Document()
+    for line in lines:
+        document.add_paragraph(line)
+    out = io.BytesIO()
+    document.save(out)
+    return out.getvalue()
+
+def make_corpus(n: int, seed: int, skills: List[str]) -> Tuple[str, List[Tuple[str, bytes, str]]]:
+    """A JD and `n` resume uploads (filename, bytes, content type), mixed formats and sizes."""
+    rng = random.Random(seed)
+    files = []
+    for i in range(n):
+        fmt = FORMATS[i % len(FORMATS)]
+        size = rng.choice(list(DOC_SIZES))
+        lines = _resume_lines(rng, skills, size, f"{seed}-{i}")
+        if fmt == "pdf":
+            files.append((f"resume_{i}.pdf", _pdf_bytes(lines), "application/pdf"))
+        elif fmt == "docx":
+            files.append((f"resume_{i}.docx", _docx_bytes(lines),
+                          "application/vnd.openxmlformats-officedocument.wordprocessingml.document"))
+        else:
+            files.append((f"resume_{i}.txt", "\n".join(lines).encode("utf-8"), "text/plain"))
+    return _jd_text(rng, skills), files
+
+# --- stage instrumentation ---
+
+class StageRecorder:
+    """
+    Collects the duration of every stage call and, while tracemalloc runs, the peak
+    memory allocated during it. Peaks are folded into every open stage before a
+    nested stage resets the tracemalloc peak, so outer stages still see them.
+    """
+
+    def __init__(self):
+        self.durations: Dict[str, List[float]] = {stage: [] for stage in STAGES + ["pipeline"]}
+        self.peaks: Dict[str, float] = {}
+        self._open: List[List[Any]] = []  # [stage, base bytes, max bytes]
+
+    def _fold(self) -> None:
+        if not tracemalloc.is_tracing():
+            return
+        _, peak = tracemalloc.get_traced_memory()
+        for entry in self._open:
+            entry[2] = max(entry[2], peak - entry[1])
+
+    def enter(self, stage: str) -> None:
+        self._fold()
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+            self._open.append([stage, tracemalloc.get_traced_memory()[0], 0])
+
+    def exit(self, stage: str, elapsed: float) -> None:
+        self.durations[stage].append(elapsed)
+        if tracemalloc.is_tracing():
+            self._fold()
+            for i in range(len(self._open) - 1, -1, -1):
+                if self._open[i][0] == stage:
+                    self.peaks[stage] = max(self.peaks.get(stage, 0.0), self._open.pop(i)[2] / 2 ** 20)
+                    break
+
+# Recorder the instrumented stages report to
+_active: List[StageRecorder] = [StageRecorder()]
+
+def _wrap(stage: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+    async def _timed(*args, **kwargs):
+        recorder = _active[0]
+        recorder.enter(stage)
+        start = time.perf_counter()
+        try:
+            return await fn(*args, **kwargs)
+        finally:
+            recorder.exit(stage, time.perf_counter() - start)
+    return _timed
+
+def _instrument() -> None:
+    """Time the pipeline's stages by wrapping the functions it calls (once per process)."""
+    from app.routers import match as match_router
+    from app.services import pipeline
+
+    pipeline.extract_texts_from_uploads = _wrap("extract", pipeline.extract_texts_from_uploads)
+    get_prerank = pipeline.get_prerank
+    pipeline.get_prerank = lambda: _wrap("prerank", get_prerank())
+    pipeline.ai_match_resumes = _wrap("ai_match", pipeline.ai_match_resumes)
+    pipeline.generate_candidate_emails = _wrap("emails", pipeline.generate_candidate_emails)
+    match_router.run_match_pipeline = _wrap("pipeline", match_router.run_match_pipeline)
+
+# --- driver ---
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * q
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+async def _request(client: Any, recorder: StageRecorder, jd_text: str, files: List[Tuple[str, bytes, str]]) -> None:
+    recorder.enter("total")
+    start = time.perf_counter()
+    response = await client.post(
+        "/api/match", data={"jd_text": jd_text}, files=[("resumes", f) for f in files], timeout=None
+    )
+    response.json()
+    recorder.exit("total", time.perf_counter() - start)
+    if response.status_code != 200:
+        raise RuntimeError(f"/api/match returned {response.status_code}: {response.text[:200]}")
+
+async def bench_size(client: Any, n: int, reps: int, concurrency: int, memory: bool,
+                     skills: List[str], seed: int) -> Dict[str, Any]:
+    recorder = _active[0] = StageRecorder()
+    corpora = [make_corpus(n, seed + rep, skills) for rep in range(reps)]
+    wall_start = time.perf_counter()
+    for start in range(0, reps, concurrency):
+        await asyncio.gather(*(_request(client, recorder, jd, files) for jd, files in corpora[start:start + concurrency]))
+    wall = time.perf_counter() - wall_start
+    recorder.durations["http"] = [t - p for t, p in zip(recorder.durations["total"], recorder.durations["pipeline"])]
+
+    peaks: Dict[str, float] = {}
+    if memory:
+        mem_recorder = _active[0] = StageRecorder()
+        jd, files = make_corpus(n, seed + reps, skills)
+        tracemalloc.start()
+        try:
+            await _request(client, mem_recorder, jd, files)
+        finally:
+            tracemalloc.stop()
+        peaks = mem_recorder.peaks
+
+    stages = {}
+    for stage in STAGES:
+        samples = recorder.durations[stage]
+        stages[stage] = {
+            "calls": len(samples),
+            "p50_ms": round(_percentile(samples, 0.50) * 1000, 2),
+            "p95_ms": round(_percentile(samples, 0.95) * 1000, 2),
+            "p99_ms": round(_percentile(samples, 0.99) * 1000, 2),
+            "mean_ms": round(statistics.fmean(samples) * 1000, 2) if samples else 0.0,
+            "peak_mb": round(peaks[stage], 2) if stage in peaks else None,
+        }
+    return {
+        "resumes": n,
+        "requests": reps,
+        "concurrency": concurrency,
+        "wall_seconds": round(wall, 3),
+        "throughput_resumes_per_s": round(n * reps / wall, 2),
+        "throughput_requests_per_s": round(reps / wall, 3),
+        "stages": stages,
+    }
+
+def print_report(result: Dict[str, Any]) -> None:
+    print(f"\n== {result['resumes']} resumes: {result['requests']} requests (concurrency {result['concurrency']}), "
+          f"{result['throughput_resumes_per_s']} resumes/s, {result['throughput_requests_per_s']} requests/s")
+    print(f"{'stage':<10}{'calls':>7}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}{'peak MB':>10}")
+    for stage, row in result["stages"].items():
+        peak = f"{row['peak_mb']:.2f}" if row["peak_mb"] is not None else "-"
+        print(f"{stage:<10}{row['calls']:>7}{row['p50_ms']:>11.1f}{row['p95_ms']:>11.1f}{row['p99_ms']:>11.1f}{peak:>10}")
+
+def check_thresholds(results: List[Dict[str, Any]], thresholds: Dict[str, Any]) -> List[str]:
+    failures = []
+    for result in results:
+        limits = thresholds.get(str(result["resumes"]), {})
+        for stage, limit in limits.items():
+            row = result["stages"].get(stage)
+            if row is None:
+                continue
+            if "p95_ms" in limit and row["p95_ms"] > limit["p95_ms"]:
+                failures.append(f"{result['resumes']} resumes / {stage}: p95 {row['p95_ms']} ms > {limit['p95_ms']} ms")
+            if "peak_mb" in limit and row["peak_mb"] is not None and row["peak_mb"] > limit["peak_mb"]:
+                failures.append(f"{result['resumes']} resumes / {stage}: peak {row['peak_mb']} MB > {limit['peak_mb']} MB")
+    return failures
+
+def thresholds_from(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    thresholds: Dict[str, Any] = {}
+    for result in results:
+        limits = {}
+        for stage, row in result["stages"].items():
+            if not row["calls"]:
+                continue
+            limit = {"p95_ms": round(max(MIN_THRESHOLD_MS, row["p95_ms"] * THRESHOLD_HEADROOM), 1)}
+            if row["peak_mb"] is not None:
+                limit["peak_mb"] = round(max(MIN_THRESHOLD_MB, row["peak_mb"] * THRESHOLD_HEADROOM), 2)
+            limits[stage] = limit
+        thresholds[str(result["resumes"])] = limits
+    return thresholds
+
+async def run(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    import httpx
+    from app.main import app
+    from app.routers.match import MAX_RESUMES_PER_REQUEST
+    from app.services.extract import shutdown_extraction_pool
+    from app.services.skills import load_taxonomy, SKILL_TAXONOMY_PATH
+
+    # Sizes run against the deployed limit; one above it would only measure the rejection
+    if max(args.sizes) > MAX_RESUMES_PER_REQUEST:
+        sys.exit(f"--sizes up to {max(args.sizes)} exceed MAX_RESUMES_PER_REQUEST ({MAX_RESUMES_PER_REQUEST})")
+    _instrument()
+    skills = list(load_taxonomy(SKILL_TAXONOMY_PATH))
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Warm-up: worker processes, imports and the skill matcher are not part of any measurement
+        jd, files = make_corpus(3, args.seed - 1, skills)
+        await _request(client, StageRecorder(), jd, files)
+        for n in args.sizes:
+            reps = args.reps or DEFAULT_REPS.get(n, 1)
+            result = await bench_size(client, n, reps, args.concurrency, not args.no_memory, skills, args.seed + 1000 * n)
+            print_report(result)
+            results.append(result)
+    shutdown_extraction_pool()
+    return results
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="resumes per request")
+    parser.add_argument("--reps", type=int, default=0, help="requests per size (default depends on size)")
+    parser.add_argument("--concurrency", type=int, default=1, help="requests in flight at once")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="simulated latency of each AI call")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--check", action="store_true", help=f"fail on regressions against {THRESHOLDS_PATH}")
+    parser.add_argument("--write-thresholds", action="store_true", help=f"store these results in {THRESHOLDS_PATH}")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _configure_env(tmp, args.latency_ms)
+        results = asyncio.run(run(args))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"latency_ms": args.latency_ms, "results": results}, f, indent=2)
+    if args.write_thresholds:
+        with open(THRESHOLDS_PATH, "w") as f:
+            json.dump(thresholds_from(results), f, indent=2)
+            f.write("\n")
+        print(f"\nWrote thresholds to {THRESHOLDS_PATH}")
+    if args.check:
+        with open(THRESHOLDS_PATH) as f:
+            failures = check_thresholds(results, json.load(f))
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        print(f"\nThreshold check: {len(failures)} regressions")
+        sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
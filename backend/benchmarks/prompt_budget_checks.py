@@ -0,0 +1,106 @@
+"""
+Checks for prompt trimming (app/services/prompt_budget.py).
+
+Run from backend/:  python -m benchmarks.prompt_budget_checks
+
+Each case trims a document to a token budget and checks that the result fits the
+budget, finds section headers without taking body lines for them, keeps the text
+the model needs (the head of a single-paragraph document, repeated role titles,
+date ranges) and loses only contact details, boilerplate and page headers and footers. Exits 1 when a check fails.
+"""
+import sys
+from typing import Callable, List, Tuple
+
+from app.services.prompt_budget import clean_document, estimate_tokens, fit_text, split_sections
+
+def _single_paragraph() -> List[str]:
+    text = " ".join(f"Python FastAPI engineer building ML services {i}." for i in range(200))
+    fitted = fit_text(text, 500)
+    return [
+        *_fits(fitted, 500),
+        *_check(fitted.startswith("Python FastAPI engineer"), "head of the paragraph kept"),
+        *_check(len(fitted) > 1800, f"only {len(fitted)} chars kept of a 2000-char budget"),
+    ]
+
+def _short_lines() -> List[str]:
+    text = "\n".join(f"- skill {i}" for i in range(2000))
+    fitted = fit_text(text, 1500)
+    return [*_fits(fitted, 1500), *_check(estimate_tokens(fitted) > 1400, "budget not used")]
+
+def _sections() -> List[str]:
+    text = "\n".join([
+        "EXPERIENCE", *[f"Built data pipeline {i} on AWS with Python and Spark." for i in range(60)],
+        "HOBBIES", *[f"Chess, hiking and photography {i}." for i in range(60)],
+    ])
+    fitted = fit_text(text, 700)
+    return [
+        *_fits(fitted, 700),
+        *_check("EXPERIENCE" in fitted and "pipeline 0 " in fitted, "experience kept"),
+        *_check("HOBBIES" not in fitted, "hobbies dropped before experience"),
+    ]
+
+def _headers() -> List[str]:
+    text = "\n".join([
+        "Jane Doe", "TECHNICAL SKILLS", "Python, AWS",
+        "Experience with Kubernetes is a plus", "Mentored juniors on communication skills",
+        "Languages:", "English",
+        "## Hobbies and interests", "Chess",
+        "Skills", "Go",
+    ])
+    headers = [section.lines[0] for section in split_sections(text)[1:]]
+    return _check(headers == ["TECHNICAL SKILLS", "Languages:", "## Hobbies and interests", "Skills"],
+                  f"headers found: {headers}")
+
+def _fits_unchanged() -> List[str]:
+    text = "Software Engineer\nAcme (2015 - 2019) (2019 - 2021)\nSoftware Engineer\nGlobex"
+    return _check(fit_text(text, 1000) == text, "text within budget returned unchanged")
+
+def _clean_keeps_experience() -> List[str]:
+    text = "Software Engineer\nAcme (2015 - 2019) (2019 - 2021)\nSoftware Engineer\nGlobex 2019-2021"
+    cleaned = clean_document(text)
+    return [
+        *_check(cleaned.count("Software Engineer") == 2, "repeated role title kept"),
+        *_check("(2015 - 2019) (2019 - 2021)" in cleaned and "2019-2021" in cleaned, "date ranges kept"),
+    ]
+
+def _clean_removes_contacts() -> List[str]:
+    text = "Jane Doe\n+91 98765 43210 | (415) 555-0134 | 415.555.0134 | 9876543210\njane@example.com\nSummary"
+    cleaned = clean_document(text)
+    return _check(cleaned.split() == ["Jane", "Doe", "Summary"], f"contacts left in {cleaned!r}")
+
+def _clean_page_furniture() -> List[str]:
+    pages = [f"Jane Doe - Resume\nSoftware Engineer\nBody of page {i}\nConfidential" for i in range(3)]
+    cleaned = clean_document("\f".join(pages))
+    return [
+        *_check(cleaned.count("Jane Doe - Resume") == 1, "running header kept once"),
+        *_check(cleaned.count("Confidential") == 1, "running footer kept once"),
+        *_check(cleaned.count("Body of page") == 3, "page bodies kept"),
+    ]
+
+def _fits(text: str, max_tokens: int) -> List[str]:
+    return _check(estimate_tokens(text) <= max_tokens, f"{estimate_tokens(text)} tokens for a {max_tokens} budget")
+
+def _check(ok: bool, message: str) -> List[str]:
+    return [] if ok else [message]
+
+CASES: List[Tuple[str, Callable[[], List[str]]]] = [
+    ("single paragraph", _single_paragraph),
+    ("many short lines", _short_lines),
+    ("sections by priority", _sections),
+    ("section headers", _headers),
+    ("fits unchanged", _fits_unchanged),
+    ("clean keeps experience", _clean_keeps_experience),
+    ("clean removes contacts", _clean_removes_contacts),
+    ("clean page headers", _clean_page_furniture),
+]
+
+def main() -> None:
+    failures = 0
+    for name, case in CASES:
+        problems = case()
+        failures += bool(problems)
+        print(f"{'FAIL' if problems else 'ok':5}{name}" + "".join(f"\n     {p}" for p in problems))
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
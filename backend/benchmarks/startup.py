@@ -0,0 +1,135 @@
+"""
+Cold-start benchmark: how long a fresh worker takes to import the app and answer /health.
+
+Run from backend/:  python -m benchmarks.startup [--runs 5] [--prewarm] [--check]
+
+Each run starts a new process, so nothing is shared between runs:
+
+  import      `import app.main` in a fresh interpreter (interpreter startup excluded)
+  health      from spawning `uvicorn app.main:app` until GET /health first returns 200
+
+The import runs also list which lazily loaded modules (app/services/lazy_imports.py)
+were imported anyway; none should be. --prewarm starts the servers with
+PREWARM_MODULES=all to show that pre-warming does not delay /health. --check exits 1
+when a lazy module was imported at startup or the p50 of either timing is over its
+budget (--max-import-ms, --max-health-ms).
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEALTH_POLL_SECONDS = 0.005
+HEALTH_TIMEOUT_SECONDS = 30.0
+
+IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app.main
+from app.services.lazy_imports import LAZY_MODULES
+elapsed = time.perf_counter() - start
+print(json.dumps({"ms": elapsed * 1000, "eager": [n for n, m in LAZY_MODULES.items() if m in sys.modules]}))
+"""
+
+def _env(tmp: str, prewarm: bool) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": BACKEND_DIR,
+        "AI_PROVIDER": "mock",
+        "PREWARM_MODULES": "all" if prewarm else "",
+        # Keep every on-disk store out of the working tree
+        "JOBS_DB_PATH": os.path.join(tmp, "jobs.sqlite3"),
+        "CANDIDATES_DB_PATH": os.path.join(tmp, "candidates.sqlite3"),
+        "AI_CACHE_PATH": os.path.join(tmp, "ai_cache.sqlite3"),
+        "SEMANTIC_INDEX_DIR": os.path.join(tmp, "semantic_index"),
+    })
+    return env
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def measure_import(env: Dict[str, str], cwd: str) -> Tuple[float, List[str]]:
+    out = subprocess.run([sys.executable, "-c", IMPORT_PROBE], env=env, cwd=cwd,
+                         capture_output=True, text=True, check=True)
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    return result["ms"], result["eager"]
+
+def _healthy(port: int) -> bool:
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+    try:
+        conn.request("GET", "/health")
+        return conn.getresponse().status == 200
+    except OSError:
+        return False
+    finally:
+        conn.close()
+
+def measure_health(env: Dict[str, str], cwd: str) -> float:
+    port = _free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while not _healthy(port):
+            if server.poll() is not None:
+                raise RuntimeError(f"server exited with code {server.returncode}")
+            if time.perf_counter() - start > HEALTH_TIMEOUT_SECONDS:
+                raise RuntimeError(f"/health not ready after {HEALTH_TIMEOUT_SECONDS:g}s")
+            time.sleep(HEALTH_POLL_SECONDS)
+        return (time.perf_counter() - start) * 1000
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--prewarm", action="store_true", help="start the servers with PREWARM_MODULES=all")
+    parser.add_argument("--max-import-ms", type=float, default=1000.0)
+    parser.add_argument("--max-health-ms", type=float, default=2500.0)
+    parser.add_argument("--check", action="store_true", help="exit 1 on eager imports or p50 over budget")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = _env(tmp, args.prewarm)
+        imports, health, eager = [], [], set()
+        for _ in range(args.runs):
+            ms, loaded = measure_import(env, tmp)
+            imports.append(ms)
+            eager.update(loaded)
+            health.append(measure_health(env, tmp))
+
+    print(f"{'':10}{'p50 ms':>10}{'min ms':>10}{'max ms':>10}   ({args.runs} runs, prewarm {'on' if args.prewarm else 'off'})")
+    for name, values in (("import", imports), ("health", health)):
+        print(f"{name:10}{statistics.median(values):10.1f}{min(values):10.1f}{max(values):10.1f}")
+    print(f"lazy modules imported at startup: {', '.join(sorted(eager)) or 'none'}")
+
+    if args.check:
+        failures = []
+        if eager:
+            failures.append(f"eagerly imported: {', '.join(sorted(eager))}")
+        if statistics.median(imports) > args.max_import_ms:
+            failures.append(f"import p50 {statistics.median(imports):.0f} ms > {args.max_import_ms:g} ms")
+        if statistics.median(health) > args.max_health_ms:
+            failures.append(f"health p50 {statistics.median(health):.0f} ms > {args.max_health_ms:g} ms")
+        for failure in failures:
+            print(f"FAIL {failure}")
+        sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
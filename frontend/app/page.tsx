@@ -14,6 +14,7 @@ type Candidate = {
   remarks: string
   email: EmailData
   is_selected: boolean
+  rank: number
 }
 
 type MatchResponse = {
@@ -24,11 +25,14 @@ type MatchResponse = {
 
 type ToastType = 'error' | 'success' | 'info'
 
+const MAX_RESUMES = 500
+
 export default function Page() {
   const [jdText, setJdText] = useState('')
   const [jdFile, setJdFile] = useState<File | null>(null)
   const [resumes, setResumes] = useState<File[]>([])
   const [loading, setLoading] = useState(false)
+  const [progress, setProgress] = useState('')
   const [result, setResult] = useState<MatchResponse | null>(null)
   const [activeTab, setActiveTab] = useState<'manual' | 'upload' | 'generate'>('manual')
   const [toast, setToast] = useState<{ text: string; type: ToastType } | null>(null)
@@ -89,7 +93,7 @@ export default function Page() {
 
   const onSelectResumes = (e: React.ChangeEvent<HTMLInputElement>) => {
     const files = Array.from(e.target.files || [])
-    const selected = files.slice(0, 10)
+    const selected = files.slice(0, MAX_RESUMES)
     setResumes(selected)
     notify(`${selected.length} resume(s) selected`, 'info')
   }
@@ -101,6 +105,7 @@ export default function Page() {
     }
 
     setLoading(true)
+    setProgress('')
     setResult(null)
     setSelectedCandidate(null)
     setEditedEmails({})
@@ -112,17 +117,41 @@ export default function Page() {
       resumes.forEach(f => form.append('resumes', f))
       
       const base = process.env.NEXT_PUBLIC_API_BASE
-      const resp = await fetch(`${base}/api/match`, { 
+      const resp = await fetch(`${base}/api/match/stream`, { 
         method: 'POST', 
         body: form 
       })
       
-      if (!resp.ok) {
+      if (!resp.ok || !resp.body) {
         const error = await resp.json().catch(() => ({ detail: 'Unknown error' }))
         throw new Error(error.detail || 'Failed to process')
       }
       
-      const data: MatchResponse = await resp.json()
+      // NDJSON progress events, ending with the full result
+      const reader = resp.body.getReader()
+      const decoder = new TextDecoder()
+      let buffer = ''
+      let scored = 0
+      let emailed = 0
+      let data: MatchResponse | null = null
+      while (true) {
+        const { done, value } = await reader.read()
+        if (done) break
+        buffer += decoder.decode(value, { stream: true })
+        const lines = buffer.split('\n')
+        buffer = lines.pop() || ''
+        for (const line of lines) {
+          if (!line.trim()) continue
+          const event = JSON.parse(line)
+          if (event.event === 'extracted') setProgress(`Extracted ${event.resumes.length} resume(s)`)
+          else if (event.event === 'score') setProgress(`Scored ${++scored}/${resumes.length}`)
+          else if (event.event === 'email') setProgress(`Emails ${++emailed}/${resumes.length}`)
+          else if (event.event === 'error') throw new Error(event.detail || 'Failed to process')
+          else if (event.event === 'result') data = event as MatchResponse
+        }
+      }
+      if (!data) throw new Error('Connection closed before results were ready')
+      
       setResult(data)
       setSelectedCandidate(data.best_index)
       notify('AI matching completed successfully', 'success')
@@ -142,20 +171,46 @@ export default function Page() {
     setLoading(true)
     try {
       const base = process.env.NEXT_PUBLIC_API_BASE
-      const resp = await fetch(`${base}/api/generate_jd`, {
+      const resp = await fetch(`${base}/api/generate_jd/stream`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify(genFields)
       })
       
-      if (!resp.ok) {
+      if (!resp.ok || !resp.body) {
         const error = await resp.json().catch(() => ({ detail: 'Unknown error' }))
         throw new Error(error.detail || 'Failed to generate')
       }
       
-      const data = await resp.json()
-      setJdText(data.jd_text)
+      // NDJSON chunk events; the JD is shown as it is written and kept only once "done" arrives
+      const previous = jdText
+      setJdText('')
       setActiveTab('manual')
+      const reader = resp.body.getReader()
+      const decoder = new TextDecoder()
+      let buffer = ''
+      let text = ''
+      let complete = false
+      try {
+        while (true) {
+          const { done, value } = await reader.read()
+          if (done) break
+          buffer += decoder.decode(value, { stream: true })
+          const lines = buffer.split('\n')
+          buffer = lines.pop() || ''
+          for (const line of lines) {
+            if (!line.trim()) continue
+            const event = JSON.parse(line)
+            if (event.event === 'chunk') setJdText(text += event.text)
+            else if (event.event === 'error') throw new Error(event.detail || 'Failed to generate')
+            else if (event.event === 'done') complete = true
+          }
+        }
+        if (!complete) throw new Error('Connection closed before the JD was complete')
+      } catch (err) {
+        setJdText(previous)
+        throw err
+      }
       notify('AI generated JD successfully', 'success')
     } catch (err: any) {
       notify(err.message || 'Error generating JD. Check backend logs.', 'error')
@@ -301,7 +356,7 @@ export default function Page() {
             <div className="card">
               <h2 className="text-xl md:text-2xl font-semibold mb-4 flex items-center gap-2">
                 <span className="w-2 h-2 bg-primary rounded-full"></span>
-                Resumes (up to 10)
+                Resumes (up to {MAX_RESUMES})
               </h2>
               <div className="border-2 border-dashed border-gray-700 rounded-lg p-6 md:p-8 text-center hover:border-primary transition-all">
                 <input
@@ -332,7 +387,7 @@ export default function Page() {
               >
                 {loading ? (
                   <span className="flex items-center justify-center gap-2">
-                    <span className="animate-spin">⚙️</span> AI Processing...
+                    <span className="animate-spin">⚙️</span> AI Processing... {progress}
                   </span>
                 ) : (
                   '🚀 Match with AI'